@@ -0,0 +1,299 @@
+"""
+Result records for the analysis core.
+Analyses are slotted records instead of dicts and tuples: a slotted object
+has no per-instance __dict__, so a cache or batch holding many analyses
+keeps a fraction of the memory. Records also read like the dicts they
+replace (``analysis['tone']``, ``.get()``, ``dict(analysis)``), and
+to_json() writes them, and any dicts and lists around them, straight to
+JSON bytes without building intermediate dicts.
+
+Explanations are prose rendered from a syllable's codes (tone, consonant
+class, vowel length, syllable type and rule) only when they are read.
+They are left out of to_dict() and to_json() unless ``verbose=True``.
+
+Records are treated as immutable once built, so the analysis cache hands
+out the cached record itself; with_fields() returns a copy carrying extra
+request-specific fields such as the translation.
+"""
+
+import json
+from json.encoder import encode_basestring
+
+class Record:
+    """Base class for result records.
+
+    ``_fields`` lists the fields in output order, ``_optional`` those left
+    out when None and ``_verbose`` those only written in verbose output.
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _optional = frozenset()
+    _verbose = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._json_keys = [(name, encode_basestring(name) + ':') for name in cls._fields]
+
+    def keys(self, verbose=False):
+        """Return the names of the fields present, like dict.keys()."""
+        keys = [name for name in self._fields
+                if (verbose or name not in self._verbose)
+                and (name not in self._optional or getattr(self, name) is not None)]
+        extra = getattr(self, 'extra', None)
+        if extra:
+            keys.extend(extra)
+        return keys
+
+    def __getitem__(self, key):
+        extra = getattr(self, 'extra', None)
+        if extra and key in extra:
+            return extra[key]
+        if key in self._fields:
+            value = getattr(self, key)
+            if value is not None or key not in self._optional:
+                return value
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self, verbose=False):
+        """Return the record as plain dicts and lists, e.g. for CSV rows or templates."""
+        return {key: to_plain(self[key], verbose) for key in self.keys(verbose)}
+
+    def write_json(self, parts, verbose=False):
+        separator = '{'
+        optional = self._optional
+        skipped = () if verbose else self._verbose
+        for name, key in self._json_keys:
+            if name in skipped:
+                continue
+            value = getattr(self, name)
+            if value is None and name in optional:
+                continue
+            parts.append(separator)
+            parts.append(key)
+            write_json(value, parts, verbose)
+            separator = ','
+        extra = getattr(self, 'extra', None)
+        if extra:
+            for name, value in extra.items():
+                parts.append(separator)
+                parts.append(encode_basestring(name) + ':')
+                write_json(value, parts, verbose)
+                separator = ','
+        parts.append('{}' if separator == '{' else '}')
+
+class VowelPositioning(Record):
+    """Where a vowel symbol is written relative to its consonant, and in which order it is spoken."""
+
+    __slots__ = ('position', 'description', 'visual_order', 'pronunciation_order')
+    _fields = __slots__
+
+    def __init__(self, position, description, visual_order, pronunciation_order):
+        self.position = position
+        self.description = description
+        self.visual_order = visual_order
+        self.pronunciation_order = pronunciation_order
+
+class Vowel(Record):
+    """A vowel found in a syllable. ``info`` is the shared rule-table entry (type, name, description)."""
+
+    __slots__ = ('char', 'info', 'type', 'position', 'positioning')
+    _fields = __slots__
+    _optional = frozenset(['position', 'positioning'])
+
+    def __init__(self, char, info, type, position=None, positioning=None):
+        self.char = char
+        self.info = info
+        self.type = type
+        self.position = position
+        self.positioning = positioning
+
+class ToneResult(Record):
+    """What determine_tone() returns.
+
+    A single-syllable word carries its SyllableAnalysis in ``syllable`` and a
+    multi-syllable word its syllables in ``syllables``; a word that could not
+    be analyzed has neither, only a ``message``.
+    """
+
+    __slots__ = ('tone', 'syllable', 'syllables', 'message')
+    _fields = ('tone', 'explanation', 'is_multi_syllable', 'consonant_class', 'vowel_length',
+               'syllable_type', 'rule', 'syllables')
+    _optional = frozenset(['consonant_class', 'vowel_length', 'syllable_type', 'rule', 'syllables'])
+    _verbose = frozenset(['explanation'])
+
+    def __init__(self, tone, syllable=None, syllables=None, message=None):
+        self.tone = tone
+        self.syllable = syllable
+        self.syllables = syllables
+        self.message = message
+
+    @property
+    def is_multi_syllable(self):
+        return self.syllables is not None
+
+    @property
+    def explanation(self):
+        if self.message is not None:
+            return self.message
+        if self.syllables is not None:
+            tones = ' + '.join(syllable.tone for syllable in self.syllables)
+            return f"Multi-syllable word with {len(self.syllables)} syllables: {tones}"
+        return self.syllable.explanation
+
+    @property
+    def consonant_class(self):
+        return self.syllable.consonant_class if self.syllable is not None else None
+
+    @property
+    def vowel_length(self):
+        return self.syllable.vowel_length if self.syllable is not None else None
+
+    @property
+    def syllable_type(self):
+        return self.syllable.syllable_type if self.syllable is not None else None
+
+    @property
+    def rule(self):
+        return self.syllable.rule if self.syllable is not None else None
+
+class RomanizationAnalysis(Record):
+    """Syllable count and the function of 'อ', as read from the romanization."""
+
+    __slots__ = ('syllable_count', 'o_function')
+    _fields = __slots__
+
+    def __init__(self, syllable_count, o_function):
+        self.syllable_count = syllable_count
+        self.o_function = o_function
+
+class WordAnalysis(Record):
+    """Full offline analysis of a word, as returned by analyze_thai_word().
+
+    ``extra`` holds request-specific fields added by with_fields(); they are
+    written after the analysis fields.
+    """
+
+    __slots__ = ('word', 'result', 'romanized', 'phonetic_ipa', 'phonetic_reading',
+                 'romanization_analysis', 'timed_out_stages', 'extra')
+    _fields = ('word', 'tone', 'explanation', 'is_multi_syllable', 'consonant_class', 'vowel_length',
+               'syllable_type', 'rule', 'romanized', 'phonetic_ipa', 'phonetic_reading',
+               'romanization_analysis', 'syllables', 'timed_out_stages')
+    _optional = frozenset(['consonant_class', 'vowel_length', 'syllable_type', 'rule', 'syllables',
+                           'timed_out_stages'])
+    _verbose = frozenset(['explanation'])
+
+    def __init__(self, word, result, romanized, phonetic_ipa, phonetic_reading, romanization_analysis,
+                 timed_out_stages=None, extra=None):
+        self.word = word
+        self.result = result
+        self.romanized = romanized
+        self.phonetic_ipa = phonetic_ipa
+        self.phonetic_reading = phonetic_reading
+        self.romanization_analysis = romanization_analysis
+        self.timed_out_stages = timed_out_stages
+        self.extra = extra
+
+    # The tone fields come from the word's ToneResult
+    tone = property(lambda self: self.result.tone)
+    explanation = property(lambda self: self.result.explanation)
+    is_multi_syllable = property(lambda self: self.result.is_multi_syllable)
+    consonant_class = property(lambda self: self.result.consonant_class)
+    vowel_length = property(lambda self: self.result.vowel_length)
+    syllable_type = property(lambda self: self.result.syllable_type)
+    rule = property(lambda self: self.result.rule)
+    syllables = property(lambda self: self.result.syllables)
+
+    def with_fields(self, **fields):
+        """Return a copy with ``fields`` added; the record itself is left untouched."""
+        copy = WordAnalysis.__new__(WordAnalysis)
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.extra = dict(self.extra, **fields) if self.extra else fields
+        return copy
+
+def with_fields(result, **fields):
+    """Add ``fields`` to an analysis record or a plain dict result, returning a new one."""
+    if isinstance(result, WordAnalysis):
+        return result.with_fields(**fields)
+    return dict(result, **fields)
+
+def to_plain(value, verbose=False):
+    """Convert records, and the dicts, lists and tuples holding them, to plain dicts and lists."""
+    if isinstance(value, Record):
+        return value.to_dict(verbose)
+    if isinstance(value, dict):
+        return {key: to_plain(item, verbose) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item, verbose) for item in value]
+    return value
+
+# JSON serialization
+# ==================
+
+_scalar_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+def write_json(value, parts, verbose=False):
+    """Append the JSON text of ``value`` to the list ``parts``, one piece at a time."""
+    value_type = type(value)
+    if value_type is str:
+        parts.append(encode_basestring(value))
+    elif value is None:
+        parts.append('null')
+    elif value_type is bool:
+        parts.append('true' if value else 'false')
+    elif isinstance(value, Record):
+        value.write_json(parts, verbose)
+    elif isinstance(value, dict):
+        separator = '{'
+        for key, item in value.items():
+            parts.append(separator)
+            # Like json.dumps, non-string keys (numbers, True, None) become strings
+            parts.append(encode_basestring(key if isinstance(key, str) else _scalar_encoder.encode(key)))
+            parts.append(':')
+            write_json(item, parts, verbose)
+            separator = ','
+        parts.append('{}' if separator == '{' else '}')
+    elif isinstance(value, (list, tuple)):
+        separator = '['
+        for item in value:
+            parts.append(separator)
+            write_json(item, parts, verbose)
+            separator = ','
+        parts.append('[]' if separator == '[' else ']')
+    else:
+        # Numbers, and anything else the json module knows how to encode
+        parts.append(_scalar_encoder.encode(value))
+
+def to_json(value, verbose=False):
+    """Serialize ``value`` (records, dicts, lists and scalars) to compact UTF-8 JSON bytes.
+
+    Explanations are only rendered and written when ``verbose`` is true.
+    """
+    parts = []
+    write_json(value, parts, verbose)
+    return ''.join(parts).encode('utf-8')
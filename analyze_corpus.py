@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Command-line corpus analyzer.
+Reads Thai words (one per line) from a file or stdin, analyzes them on a
+pool of worker processes and writes one JSONL or CSV record per word with
+the time it took. Imports only the analysis core, not the web app.
+
+    python analyze_corpus.py words.txt -o results.jsonl
+    python analyze_corpus.py words.txt -o results.csv --workers 8
+    python analyze_corpus.py words.txt -o results.jsonl --resume
+    python analyze_corpus.py words.txt -o results.jsonl --verbose   # with explanations
+    cat words.txt | python analyze_corpus.py - > results.jsonl
+
+With --resume, words already written to the output file are skipped, so an
+interrupted run picks up where it stopped. Throughput statistics are printed
+to stderr at the end.
+"""
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+from analysis_records import to_json, to_plain, with_fields
+from tone_analysis import analyze_thai_word, get_word_analysis, normalize_word
+
+CSV_FIELDS = [
+    'word', 'tone', 'is_multi_syllable', 'syllable_count', 'consonant_class', 'vowel_length', 'syllable_type',
+    'rule', 'romanized', 'phonetic_ipa', 'phonetic_reading', 'explanation', 'error', 'elapsed_ms'
+]
+
+def init_worker():
+    """Load the tltk models once per worker so the first word's timing is not skewed."""
+    try:
+        analyze_thai_word('กา')
+    except Exception:
+        pass
+
+def analyze_word(word):
+    """Analyze one word in a worker and return its record, with timing, instead of raising."""
+    start = time.perf_counter()
+    try:
+        record = get_word_analysis(word)
+    except Exception as e:
+        record = {'word': normalize_word(word), 'error': f"{type(e).__name__}: {e}"}
+    return with_fields(record, elapsed_ms=round((time.perf_counter() - start) * 1000, 3))
+
+def read_words(source):
+    """Yield the words in ``source``, one per line, skipping blank lines and # comments."""
+    for line in source:
+        word = line.strip()
+        if word and not word.startswith('#'):
+            yield word
+
+def count_written(path, output_format):
+    """Return how many records ``path`` already holds, dropping a partly written last record."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb+') as output:
+        data = output.read()
+        # An interrupted write can leave a final line without its newline
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            output.truncate(complete)
+            data = data[:complete]
+    lines = data.count(b'\n')
+    if output_format == 'csv' and lines:
+        lines -= 1  # header
+    return lines
+
+class RecordWriter:
+    """Write analysis records as JSONL or CSV, with explanations only when ``verbose``."""
+
+    def __init__(self, output, output_format, write_header, verbose=False):
+        self.output = output
+        self.output_format = output_format
+        self.verbose = verbose
+        if output_format == 'csv':
+            self.csv = csv.DictWriter(output, fieldnames=CSV_FIELDS, extrasaction='ignore', lineterminator='\n')
+            if write_header:
+                self.csv.writeheader()
+
+    def write(self, record):
+        if self.output_format == 'jsonl':
+            self.output.write(to_json(record, self.verbose).decode('utf-8') + '\n')
+            return
+        row = to_plain(record, self.verbose)
+        row['syllable_count'] = len(record['syllables']) if record.get('syllables') else (1 if 'tone' in record else '')
+        self.csv.writerow(row)
+
+class Statistics:
+    """Throughput and per-word timing statistics for a run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.words = 0
+        self.errors = 0
+        self.timings = []
+
+    def add(self, record):
+        self.words += 1
+        if 'error' in record:
+            self.errors += 1
+        self.timings.append(record['elapsed_ms'])
+
+    def report(self, skipped):
+        elapsed = time.perf_counter() - self.started
+        timings = sorted(self.timings)
+
+        def percentile(fraction):
+            return timings[min(len(timings) - 1, int(fraction * len(timings)))] if timings else 0.0
+
+        print("\nCorpus analysis summary", file=sys.stderr)
+        print("=" * 40, file=sys.stderr)
+        if skipped:
+            print(f"Skipped (resumed):  {skipped}", file=sys.stderr)
+        print(f"Words analyzed:     {self.words}", file=sys.stderr)
+        print(f"Errors:             {self.errors}", file=sys.stderr)
+        print(f"Wall time:          {elapsed:.2f}s", file=sys.stderr)
+        print(f"Throughput:         {self.words / elapsed if elapsed else 0:.1f} words/s", file=sys.stderr)
+        if timings:
+            print(f"Per word (ms):      mean {sum(timings) / len(timings):.2f}, p50 {percentile(0.5):.2f}, "
+                  f"p95 {percentile(0.95):.2f}, max {timings[-1]:.2f}", file=sys.stderr)
+
+def batches(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def run(args):
+    output_format = args.format
+    if output_format is None:
+        output_format = 'csv' if args.output and args.output.endswith('.csv') else 'jsonl'
+
+    if args.resume and not args.output:
+        print("❌ --resume needs an output file (-o)", file=sys.stderr)
+        return 2
+
+    skipped = count_written(args.output, output_format) if args.resume else 0
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    if args.output:
+        output = open(args.output, 'a' if args.resume else 'w', encoding='utf-8', newline='')
+    else:
+        output = sys.stdout
+
+    words = itertools.islice(read_words(source), skipped, None)
+    # A resumed file may hold just its header, so check for one rather than for records
+    has_header = args.resume and os.path.getsize(args.output) > 0
+    writer = RecordWriter(output, output_format, write_header=not has_header, verbose=args.verbose)
+    stats = Statistics()
+    # Results are written in input order, one window at a time, so the output
+    # always holds a prefix of the input and --resume can skip it by count
+    window = args.chunksize * args.workers * 4
+
+    interrupted = False
+    pool = multiprocessing.get_context('spawn').Pool(args.workers, initializer=init_worker)
+    try:
+        for batch in batches(words, window):
+            for record in pool.imap(analyze_word, batch, chunksize=args.chunksize):
+                writer.write(record)
+                stats.add(record)
+            output.flush()
+            if args.progress:
+                print(f"... {skipped + stats.words} words", file=sys.stderr)
+        pool.close()
+    except KeyboardInterrupt:
+        interrupted = True
+        pool.terminate()
+    finally:
+        pool.join()
+        output.flush()
+        if output is not sys.stdout:
+            output.close()
+        if source is not sys.stdin:
+            source.close()
+
+    stats.report(skipped)
+    if interrupted:
+        print(f"\n⚠️ Interrupted; rerun with --resume to continue after {skipped + stats.words} words", file=sys.stderr)
+        return 130
+    return 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyze the tones of a Thai word list.')
+    parser.add_argument('input', help="word list, one word per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default=None,
+                        help='output format (default: from the output file extension, else jsonl)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--chunksize', type=int, default=64, help='words sent to a worker at a time')
+    parser.add_argument('--resume', action='store_true', help='skip words already in the output file')
+    parser.add_argument('--verbose', action='store_true', help='include the explanation of every word and syllable')
+    parser.add_argument('--progress', action='store_true', help='report progress on stderr')
+    sys.exit(run(parser.parse_args()))
@@ -1,128 +1,45 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
+from pythainlp.tokenize import word_tokenize
 from pythainlp.transliterate import romanize
-import re
+from email.utils import formatdate
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import functools
+import gzip
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import threading
+import time
 import requests
+import sqlite3
 import os
+import json
 import base64
+import cProfile
 import io
+import pstats
+import random
+import re
+import uuid
 from gtts import gTTS
 import tempfile
 
-app = Flask(__name__)
+import lexicon
+import metrics
+from analysis_records import WordAnalysis, to_json, with_fields
+from tone_analysis import (
+    CACHE_DIR, CHAR_CONSONANT, CHAR_LEADING_VOWEL, CHAR_SIMPLE_VOWEL, TONE_TABLE_ENABLED, StageTimings,
+    analysis_cache, analysis_version, analyze_thai_word, build_tone_table, char_flags, detect_input_language,
+    get_tone_table, get_word_analysis, invalidate_analysis_cache, normalize_word, syllable_exceptions
+)
 
-# Thai Tone Rules and Special Characters
-# =====================================
-# 
-# ห Rule (ห leading consonant):
-# When ห (ho hip) is followed by a low-class sonorant consonant (ง, ญ, น, ม, ย, ร, ล, ว),
-# the syllable is treated as having a high-class consonant for tone rule purposes.
-# Example: เหนื่อย (tired) - ห + น makes it behave like high-class consonant
-#
-# ์ Rule (thanthakhat - silent consonant marker):
-# The ์ symbol (thanthakhat) indicates that the preceding consonant is not pronounced.
-# This is commonly used in Sanskrit/Pali loanwords and affects syllable structure.
-# Example: การปฏิสัมพันธ์ (interaction) - the ์ at the end makes ธ silent
-#
-# These rules are important for accurate tone analysis and syllable splitting.
-
-# Simple Thai-English dictionary for common words
-THAI_ENGLISH_DICT = {
-    'โกรธ': 'to be angry',
-    'กรอก': 'to pour, to fill',
-    'กล้อง': 'camera, lens',
-    'บ้าน': 'house, home',
-    'สวัสดี': 'hello, goodbye',
-    'ขอบคุณ': 'thank you',
-    'น้ำ': 'water',
-    'อาหาร': 'food',
-    'หนังสือ': 'book',
-    'อะไร': 'what',
-    'อย่า': "don't (negative command)",
-    'อยาก': 'to want, to desire',
-    'อยู่': 'to be, to live, to stay',
-    'อย่าง': 'like, as, way',
-    'ลูก': 'child, son/daughter',
-    'ลูกกรอก': 'marble (toy)',
-    'โรงเรียน': 'school',
-    'มหาวิทยาลัย': 'university',
-    'กา': 'crow',
-    'ขา': 'leg',
-    'คา': 'to be stuck, to get caught',
-    'เธอ': 'you (informal)',
-    'เกา': 'to scratch',
-    'ไก่': 'chicken',
-    'ก่า': 'to be old',
-    'ข่า': 'galangal (spice)',
-    'ค่า': 'value, price',
-    'ก๊า': 'crow (with high tone)',
-    'ก๋า': 'crow (with rising tone)',
-    'อา': 'aunt, uncle',
-    'อี': 'she, her (informal)',
-    'อู': 'owl',
-    'เอา': 'to take, to want',
-    'โอ': 'oh (exclamation)',
-    'อะ': 'ah (exclamation)',
-    'ไร': 'what (colloquial)'
-}
-
-def get_romanization(thai_word):
-    """Get romanized version of Thai word."""
-    try:
-        return romanize(thai_word, engine='tltk')
-    except Exception as e:
-        print(f"Error romanizing with tltk '{thai_word}': {e}")
-        # Fallback to royin engine
-        try:
-            return romanize(thai_word, engine='royin')
-        except Exception as e2:
-            print(f"Error romanizing with royin '{thai_word}': {e2}")
-            return "Unable to romanize"
+# LOG_LEVEL=DEBUG adds the rule engine's trace of every vowel and syllable
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
 
-def get_phonetic_ipa(thai_word):
-    """Get IPA (International Phonetic Alphabet) representation of Thai word."""
-    try:
-        import tltk.nlp as tltk_nlp
-        ipa = tltk_nlp.th2ipa(thai_word)
-        # Clean up the output (remove <s/> tags)
-        return ipa.replace('<s/>', '').strip()
-    except Exception as e:
-        print(f"Error generating IPA for '{thai_word}': {e}")
-        return "Unable to generate IPA"
-
-def get_phonetic_reading(thai_word):
-    """Get reading pronunciation with syllable breaks."""
-    try:
-        import tltk.nlp as tltk_nlp
-        reading = tltk_nlp.th2read(thai_word)
-        # Clean up the output (remove trailing hyphens)
-        return reading.rstrip('-')
-    except Exception as e:
-        print(f"Error generating reading for '{thai_word}': {e}")
-        return "Unable to generate reading"
-
-def generate_audio(text, voice_name="th"):
-    """Generate audio for Thai text using gTTS (Google Text-to-Speech)."""
-    try:
-        # Create gTTS object
-        tts = gTTS(text=text, lang='th', slow=False)
-        
-        # Create a temporary file to store the audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-            tts.save(tmp_file.name)
-            
-            # Read the file and convert to base64
-            with open(tmp_file.name, 'rb') as audio_file:
-                audio_content = audio_file.read()
-                audio_base64 = base64.b64encode(audio_content).decode('utf-8')
-            
-            # Clean up the temporary file
-            os.unlink(tmp_file.name)
-            
-        return audio_base64
-        
-    except Exception as e:
-        print(f"TTS Error: {e}")
-        return None
+app = Flask(__name__)
 
 def get_available_voices():
     """Get available voices for gTTS (simplified list)."""
@@ -135,11 +52,258 @@ def get_available_voices():
         }
     ]
 
-def get_translation(thai_word):
-    """Get English translation of Thai word."""
-    # First check our built-in dictionary
-    if thai_word in THAI_ENGLISH_DICT:
-        return THAI_ENGLISH_DICT[thai_word]
+def is_available_voice(voice):
+    """Check ``voice`` against get_available_voices()."""
+    return any(available['name'] == voice for available in get_available_voices())
+
+# Translation cache
+# =================
+#
+# Upstream translations are kept in a SQLite database under CACHE_DIR so they
+# survive restarts and are shared by every worker process. Keys are per
+# direction ('th-en', 'en-th'). Words the API answered without a usable
+# translation are cached too (as NULL, with a shorter TTL), but failed or
+# timed-out calls are not.
+
+TRANSLATION_CACHE_PATH = os.environ.get('TRANSLATION_CACHE_PATH', os.path.join(CACHE_DIR, 'translations.sqlite3'))
+TRANSLATION_CACHE_TTL = float(os.environ.get('TRANSLATION_CACHE_TTL', 30 * 24 * 3600))
+TRANSLATION_CACHE_NEGATIVE_TTL = float(os.environ.get('TRANSLATION_CACHE_NEGATIVE_TTL', 24 * 3600))
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.environ.get('TRANSLATION_CACHE_MAX_ENTRIES', 100000))
+
+class TranslationCache:
+    """SQLite-backed translation cache with a TTL, negative entries and an entry cap.
+
+    Each thread opens its own connection (reopened after a fork). The
+    database runs in WAL mode so worker processes can read while one writes.
+    Any SQLite error is logged and treated as a cache miss.
+    """
+
+    MISS = object()
+    # How many writes a process makes between checks of the entry cap
+    EVICTION_CHECK_INTERVAL = 100
+
+    def __init__(self, path, ttl, negative_ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return bool(self.path) and self.max_entries > 0
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'direction TEXT NOT NULL, source TEXT NOT NULL, target TEXT, created_at REAL NOT NULL, '
+            'PRIMARY KEY (direction, source))'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS translations_created_at ON translations (created_at)')
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _error(self, action, error):
+        with self._lock:
+            self.errors += 1
+        logger.warning("Translation cache %s failed: %s", action, error)
+
+    def get(self, direction, source):
+        """Return the cached translation (None for a negative entry), or MISS."""
+        if not self.enabled:
+            return self.MISS
+        try:
+            row = self._connect().execute(
+                'SELECT target, created_at FROM translations WHERE direction = ? AND source = ?',
+                (direction, source)
+            ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            self._error('read', e)
+            return self.MISS
+        
+        if row is not None:
+            target, created_at = row
+            ttl = self.ttl if target is not None else self.negative_ttl
+            if time.time() - created_at < ttl:
+                with self._lock:
+                    if target is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                metrics.cache_lookup('translation', True)
+                return target
+        with self._lock:
+            self.misses += 1
+        metrics.cache_lookup('translation', False)
+        return self.MISS
+
+    def put(self, direction, source, target):
+        """Cache ``target`` for ``source`` (None records that no translation exists)."""
+        if not self.enabled:
+            return
+        try:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO translations (direction, source, target, created_at) VALUES (?, ?, ?, ?)',
+                (direction, source, target, time.time())
+            )
+        except (sqlite3.Error, OSError) as e:
+            self._error('write', e)
+            return
+        
+        with self._lock:
+            self.writes += 1
+            self._writes_since_check += 1
+            check = self._writes_since_check >= self.EVICTION_CHECK_INTERVAL
+            if check:
+                self._writes_since_check = 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the oldest entries beyond the cap."""
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            connection = self._connect()
+            removed = connection.execute(
+                'DELETE FROM translations WHERE created_at < ? OR (target IS NULL AND created_at < ?)',
+                (now - self.ttl, now - self.negative_ttl)
+            ).rowcount
+            count = connection.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+            if count > self.max_entries:
+                removed += connection.execute(
+                    'DELETE FROM translations WHERE rowid IN '
+                    '(SELECT rowid FROM translations ORDER BY created_at LIMIT ?)',
+                    (count - self.max_entries,)
+                ).rowcount
+        except (sqlite3.Error, OSError) as e:
+            self._error('eviction', e)
+            return
+        with self._lock:
+            self.evictions += removed
+
+    def clear(self):
+        """Remove every cached translation."""
+        if not self.enabled:
+            return
+        try:
+            self._connect().execute('DELETE FROM translations')
+        except (sqlite3.Error, OSError) as e:
+            self._error('clear', e)
+
+    def stats(self):
+        """Return counters for this process and the number of stored entries."""
+        entries = None
+        if self.enabled:
+            try:
+                entries = self._connect().execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+            except (sqlite3.Error, OSError) as e:
+                self._error('read', e)
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'path': self.path,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'errors': self.errors,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'negative_ttl': self.negative_ttl
+            }
+
+translation_cache = TranslationCache(
+    TRANSLATION_CACHE_PATH, TRANSLATION_CACHE_TTL, TRANSLATION_CACHE_NEGATIVE_TTL, TRANSLATION_CACHE_MAX_ENTRIES
+)
+
+# Offline lexicon
+# ===============
+#
+# Translations are looked up first in the offline lexicon compiled from
+# data/lexicon/*.tsv (see lexicon.py). The compiled file is memory-mapped, so
+# worker processes share its pages and search it in place. It is rebuilt on
+# first use when the word lists are newer; the network API is only asked about
+# words the lexicon does not have.
+
+LEXICON_PATH = os.environ.get('LEXICON_PATH', os.path.join(CACHE_DIR, 'lexicon.bin'))
+LEXICON_SOURCE_DIR = os.environ.get('LEXICON_SOURCE_DIR', lexicon.SOURCE_DIR)
+# Seconds to wait before trying again after the lexicon failed to load
+LEXICON_RETRY_INTERVAL = float(os.environ.get('LEXICON_RETRY_INTERVAL', 60))
+
+_lexicon = None
+_lexicon_retry_at = 0.0
+_lexicon_lock = threading.Lock()
+
+def get_lexicon():
+    """Return the offline lexicon, compiling it first if needed (None if unavailable).
+
+    A failure is remembered for LEXICON_RETRY_INTERVAL seconds, so lookups
+    meanwhile return None at once instead of retrying and logging each time.
+    """
+    global _lexicon, _lexicon_retry_at
+    if _lexicon is not None or time.monotonic() < _lexicon_retry_at:
+        return _lexicon
+    with _lexicon_lock:
+        if _lexicon is None and time.monotonic() >= _lexicon_retry_at:
+            try:
+                sources = lexicon.source_files(LEXICON_SOURCE_DIR)
+                if sources and lexicon.is_stale(LEXICON_PATH, sources):
+                    counts = lexicon.compile_lexicon(sources, LEXICON_PATH)
+                    logger.info("Compiled lexicon %s: %s", LEXICON_PATH, counts)
+                _lexicon = lexicon.Lexicon(LEXICON_PATH)
+            except (lexicon.LexiconError, OSError) as e:
+                logger.warning("Offline lexicon unavailable, retrying in %gs: %s", LEXICON_RETRY_INTERVAL, e)
+                _lexicon_retry_at = time.monotonic() + LEXICON_RETRY_INTERVAL
+    return _lexicon
+
+def lookup_lexicon(direction, text):
+    """Look ``text`` up in the offline lexicon; None when missing or unavailable."""
+    offline_lexicon = get_lexicon()
+    if offline_lexicon is None:
+        return None
+    translation = offline_lexicon.lookup(direction, text)
+    metrics.cache_lookup('lexicon', translation is not None)
+    return translation
+
+def get_translation(thai_word, session=None):
+    """Get English translation of Thai word from the offline lexicon, then the MyMemory API.
+
+    Pass a ``requests.Session`` to reuse one connection across many lookups.
+    """
+    # First check the offline lexicon
+    translation = lookup_lexicon('th-en', thai_word)
+    if translation is not None:
+        return translation
+    
+    # Then earlier answers from the API
+    cached = translation_cache.get('th-en', thai_word)
+    if cached is not TranslationCache.MISS:
+        return cached if cached is not None else "Translation not available"
     
     # If not found, try to get translation from API
     try:
@@ -150,7 +314,8 @@ def get_translation(thai_word):
             'langpair': 'th|en'
         }
         
-        response = requests.get(url, params=params, timeout=5)
+        with metrics.track_upstream('mymemory', 'th-en'):
+            response = (session or requests).get(url, params=params, timeout=5)
         if response.status_code == 200:
             data = response.json()
             if data.get('responseStatus') == 200:
@@ -158,49 +323,30 @@ def get_translation(thai_word):
                 # Clean up the translation (remove extra spaces, etc.)
                 translation = translation.strip()
                 if translation and translation != thai_word:
+                    translation_cache.put('th-en', thai_word, translation)
                     return translation
+                # The API answered but had nothing useful
+                translation_cache.put('th-en', thai_word, None)
+            else:
+                metrics.upstream_error('mymemory', 'th-en', f"api_{data.get('responseStatus')}")
+        else:
+            metrics.upstream_error('mymemory', 'th-en', f"http_{response.status_code}")
         
         return "Translation not available"
     except:
         return "Translation not available"
 
 def translate_english_to_thai(english_word):
-    """Translate English word to Thai using MyMemory API."""
+    """Translate English word to Thai using the offline lexicon, then the MyMemory API."""
     try:
-        # Simple translations for common short words to avoid complex API results
-        simple_translations = {
-            'hi': 'สวัสดี',
-            'hello': 'สวัสดี',
-            'bye': 'ลาก่อน',
-            'yes': 'ใช่',
-            'no': 'ไม่',
-            'ok': 'โอเค',
-            'okay': 'โอเค',
-            'test': 'ทดสอบ',
-            'cat': 'แมว',
-            'dog': 'สุนัข',
-            'monkey': 'ลิง',
-            'book': 'หนังสือ',
-            'water': 'น้ำ',
-            'food': 'อาหาร',
-            'house': 'บ้าน',
-            'car': 'รถยนต์',
-            'tree': 'ต้นไม้',
-            'sun': 'ดวงอาทิตย์',
-            'moon': 'ดวงจันทร์',
-            'star': 'ดาว',
-            'sky': 'ท้องฟ้า',
-            'awesome': 'สุดยอด',
-            'cool': 'สุดยอด',
-            'great': 'เยี่ยม',
-            'good': 'ดี',
-            'bad': 'ไม่ดี'
-        }
+        # Common words come from the offline lexicon, which also avoids complex API results
+        translation = lookup_lexicon('en-th', english_word)
+        if translation is not None:
+            return translation
         
-        # Check simple translations first
-        word_lower = english_word.lower()
-        if word_lower in simple_translations:
-            return simple_translations[word_lower]
+        cached = translation_cache.get('en-th', english_word)
+        if cached is not TranslationCache.MISS:
+            return cached
         
         url = "https://api.mymemory.translated.net/get"
         params = {
@@ -208,7 +354,8 @@ def translate_english_to_thai(english_word):
             'langpair': 'en|th'
         }
         
-        response = requests.get(url, params=params, timeout=5)
+        with metrics.track_upstream('mymemory', 'en-th'):
+            response = requests.get(url, params=params, timeout=5)
         if response.status_code == 200:
             data = response.json()
             if data.get('responseStatus') == 200:
@@ -216,6 +363,7 @@ def translate_english_to_thai(english_word):
                 translation = data['responseData']['translatedText']
                 translation = translation.strip()
                 if translation and translation != english_word and len(translation) <= 50:
+                    translation_cache.put('en-th', english_word, translation)
                     return translation
                 
                 # If main translation is too long or same as input, try to find a better match
@@ -237,1363 +385,670 @@ def translate_english_to_thai(english_word):
                             best_quality = quality
                     
                     if best_match:
+                        translation_cache.put('en-th', english_word, best_match)
                         return best_match
+                
+                # The API answered but had nothing useful
+                translation_cache.put('en-th', english_word, None)
+            else:
+                metrics.upstream_error('mymemory', 'en-th', f"api_{data.get('responseStatus')}")
+        else:
+            metrics.upstream_error('mymemory', 'en-th', f"http_{response.status_code}")
         
         return None
     except:
         return None
 
-def detect_input_language(text):
-    """Detect if input is Thai or English."""
-    # Check if text contains Thai characters
-    thai_pattern = re.compile(r'[\u0E00-\u0E7F]')
-    if thai_pattern.search(text):
-        return 'thai'
-    else:
-        return 'english'
-
-# Thai consonant classes
-CONSONANT_CLASSES = {
-    'mid': ['ก', 'จ', 'ด', 'ต', 'ฏ', 'ฎ', 'บ', 'ป', 'อ'],
-    'high': ['ข', 'ฉ', 'ฐ', 'ถ', 'ผ', 'ฝ', 'ศ', 'ษ', 'ส', 'ห'],
-    'low': ['ค', 'ฅ', 'ฆ', 'ง', 'ช', 'ซ', 'ฌ', 'ญ', 'ฑ', 'ฒ', 'ณ', 'ท', 'ธ', 'น', 'พ', 'ฟ', 'ภ', 'ม', 'ย', 'ร', 'ล', 'ว', 'ฬ', 'ฮ', 'ฤ', 'ฦ']
-}
-
-# Tone marks
-TONE_MARKS = {
-    '่': 'mai_ek',      # Low tone mark
-    '้': 'mai_tho',     # Falling tone mark  
-    '๊': 'mai_tri',     # High tone mark
-    '๋': 'mai_chattawa' # Rising tone mark
-}
-
-# Complex vowel patterns (diphthongs and compound vowels)
-COMPLEX_VOWELS = {
-    # More specific patterns first
-    'เ_ือะ': {'type': 'short', 'name': 'uea (short uea)', 'description': 'short uea sound', 'pattern': r'เ.*ือะ'},
-    'เ_ือ': {'type': 'long', 'name': 'uea (long uea)', 'description': 'long uea sound', 'pattern': r'เ.*ือ'},
-    'เ_ียะ': {'type': 'short', 'name': 'ia (short ia)', 'description': 'short ia sound', 'pattern': r'เ.*ียะ'},
-    'เ_ีย': {'type': 'long', 'name': 'ia (long ia)', 'description': 'long ia sound', 'pattern': r'เ.*ีย'},
-    'เ_็': {'type': 'short', 'name': 'e (short e)', 'description': 'short e sound with mai han-akat', 'pattern': r'เ.*็'},
-    'แ_็': {'type': 'short', 'name': 'ae (short ae)', 'description': 'short ae sound with mai han-akat', 'pattern': r'แ.*็'},
-    'เ_ิ': {'type': 'long', 'name': 'er (long er)', 'description': 'long er sound', 'pattern': r'เ.*ิ'},
-    'เ_าะ': {'type': 'short', 'name': 'oe (short oe)', 'description': 'short oe sound', 'pattern': r'เ.*าะ'},
-    'เ_ะ': {'type': 'short', 'name': 'e (short e)', 'description': 'short e sound', 'pattern': r'เ.*ะ'},
-    'แ_ะ': {'type': 'short', 'name': 'ae (short ae)', 'description': 'short ae sound', 'pattern': r'แ.*ะ'},
-    'เ_า': {'type': 'long', 'name': 'ao (long ao)', 'description': 'long ao sound', 'pattern': r'เ.*า'},
-    'เ_อ': {'type': 'long', 'name': 'er (long er)', 'description': 'long er sound /ɤː/', 'pattern': r'เ(?!.*ือ).*อ'},
-    'โ_ะ': {'type': 'short', 'name': 'o (short o)', 'description': 'short o sound', 'pattern': r'โ.*ะ'},
-    'ไ_': {'type': 'long', 'name': 'ai (long ai)', 'description': 'long ai sound', 'pattern': r'^ไ[ก-ฮ][่้๊๋]?$'},
-    'ใ_': {'type': 'long', 'name': 'ai (long ai)', 'description': 'long ai sound', 'pattern': r'ใ.*'},
-    'ัว': {'type': 'long', 'name': 'ua (long ua)', 'description': 'long ua sound', 'pattern': r'ัว'},
-}
-
-# Simple vowel patterns
-SIMPLE_VOWELS = {
-    'า': {'type': 'long', 'name': 'a (long a)', 'description': 'long a sound'},
-    'ี': {'type': 'long', 'name': 'i (long i)', 'description': 'long i sound'},
-    'ู': {'type': 'long', 'name': 'u (long u)', 'description': 'long u sound'},
-    'อ': {'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
-    'ื': {'type': 'long', 'name': 'ue (long ue)', 'description': 'long ue sound'},
-    
-    # Short vowels
-    'ะ': {'type': 'short', 'name': 'a (short a)', 'description': 'short a sound'},
-    'ิ': {'type': 'short', 'name': 'i (short i)', 'description': 'short i sound'},
-    'ุ': {'type': 'short', 'name': 'u (short u)', 'description': 'short u sound'},
-    'ึ': {'type': 'short', 'name': 'ue (short ue)', 'description': 'short ue sound'},
-    'ั': {'type': 'short', 'name': 'a (short a)', 'description': 'short a sound'},
-    'เ': {'type': 'short', 'name': 'e (short e)', 'description': 'short e sound'},
-    'แ': {'type': 'short', 'name': 'ae (short ae)', 'description': 'short ae sound'},
-    'โ': {'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
-    'ไ': {'type': 'short', 'name': 'ai (short ai)', 'description': 'short ai sound'},
-    'ใ': {'type': 'short', 'name': 'ai (short ai)', 'description': 'short ai sound'},
-    'ฤ': {'type': 'long', 'name': 'rue (long rue)', 'description': 'long rue sound (Sanskrit)'},
-    'ฤๅ': {'type': 'long', 'name': 'rue (long rue)', 'description': 'long rue sound (Sanskrit)'},
-    'ฦ': {'type': 'long', 'name': 'lue (long lue)', 'description': 'long lue sound (Sanskrit)'},
-    'ฦๅ': {'type': 'long', 'name': 'lue (long lue)', 'description': 'long lue sound (Sanskrit)'},
-}
-
-# For backward compatibility
-LONG_VOWELS = [v for v, info in SIMPLE_VOWELS.items() if info['type'] == 'long']
-SHORT_VOWELS = [v for v, info in SIMPLE_VOWELS.items() if info['type'] == 'short']
-
-# Sonorant consonants (for live/dead syllable classification) - these make syllables "live"
-SONORANT_CONSONANTS = ['ม', 'น', 'ง', 'ย', 'ร', 'ล', 'ว']
-
-# Stop consonants (for live/dead syllable classification) - these make syllables "dead"
-STOP_CONSONANTS = ['ก', 'ด', 'บ', 'ป', 'จ', 'ต', 'ธ', 'ษ', 'ศ', 'ข', 'ค', 'ฆ', 'ช', 'ซ', 'ฌ', 'ญ', 'ฎ', 'ฏ', 'ฐ', 'ฑ', 'ฒ', 'ณ', 'ฟ', 'ภ', 'ห', 'ฮ', 'พ']
-
-def get_consonant_class(char):
-    """Determine the class of a Thai consonant."""
-    for class_name, consonants in CONSONANT_CLASSES.items():
-        if char in consonants:
-            return class_name
-    return None
+@app.route('/')
+def index():
+    return render_template('index.html')
 
-def is_vowel_symbol(char):
-    """Check if character is a vowel symbol that appears before consonants."""
-    return char in ['เ', 'โ', 'ไ', 'ใ', 'แ']
+# Connectivity monitor
+# ====================
+#
+# Whether translation is possible is decided from a cached connectivity state
+# kept fresh by a background thread, so requests never wait on a network probe.
+# The probe backs off exponentially while offline.
 
-def has_implied_vowel(word):
-    """Check if a word has an implied vowel (only consonants, no written vowels)."""
-    # Check if the word contains only consonants and no written vowels
-    has_written_vowel = False
-    consonant_count = 0
-    
-    for i, char in enumerate(word):
-        if char == 'ว' and i + 1 < len(word) and word[i + 1] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            # 'ว' is functioning as a vowel (ua sound)
-            has_written_vowel = True
-            break
-        elif char == 'อ' and not is_zero_consonant(word, i):
-            # 'อ' is functioning as a vowel, not a zero consonant
-            has_written_vowel = True
-            break
-        elif char in SIMPLE_VOWELS or is_vowel_symbol(char) or any(vowel in char for vowel in COMPLEX_VOWELS.keys()):
-            has_written_vowel = True
-            break
-        elif char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            consonant_count += 1
-    
-    # If we have only consonants and no written vowels, we need an implied vowel
-    return consonant_count > 0 and not has_written_vowel
-
-def is_zero_consonant(word, pos):
-    """Check if 'อ' at position is functioning as a zero consonant (implicit initial consonant)."""
-    # 'อ' is a zero consonant when:
-    # 1. It's at the beginning of the word
-    # 2. It's followed by a vowel symbol (เ, โ, ไ, ใ, แ)
-    if pos == 0:
-        return True
-    if pos + 1 < len(word) and word[pos + 1] in ['เ', 'โ', 'ไ', 'ใ', 'แ']:
-        return True
-    return False
-
-def has_w_vowel_pattern(word):
-    """Check if a word has the 'ว' functioning as a vowel sound (ua)."""
-    # Look for patterns where 'ว' is followed by a consonant
-    for i in range(len(word) - 1):
-        if word[i] == 'ว' and word[i + 1] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            return True
-    return False
+CONNECTIVITY_PROBE_URL = os.environ.get('CONNECTIVITY_PROBE_URL', 'https://httpbin.org/status/200')
+CONNECTIVITY_PROBE_INTERVAL = float(os.environ.get('CONNECTIVITY_PROBE_INTERVAL', 30))
+CONNECTIVITY_MAX_BACKOFF = float(os.environ.get('CONNECTIVITY_MAX_BACKOFF', 300))
+CONNECTIVITY_PROBE_TIMEOUT = float(os.environ.get('CONNECTIVITY_PROBE_TIMEOUT', 5))
 
-def get_w_vowel_info(word):
-    """Get information about 'ว' functioning as a vowel sound."""
-    if not has_w_vowel_pattern(word):
-        return None
-    
-    # Find the 'ว' + consonant pattern
-    for i in range(len(word) - 1):
-        if word[i] == 'ว' and word[i + 1] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            return {
-                'type': 'w_vowel',
-                'vowel': 'อัว',
-                'description': 'ua sound (ว functioning as vowel)',
-                'position': f'at position {i}',
-                'pattern': f'{word[i]}{word[i + 1]}'
-            }
-    
-    return None
+class ConnectivityMonitor:
+    """Background prober that keeps a cached online/offline state.
 
-def get_vowel_positioning(vowel_char, word, position):
-    """Get positioning information for a vowel character."""
-    print(f"Vowel character: {vowel_char}, Word: {word}, Position: {position}")
-    
-    # Check for surrounding vowel patterns by looking at the word structure
-    if vowel_char in ['เ', 'แ', 'โ', 'ไ', 'ใ']:
-        # Check if this is part of a surrounding vowel pattern
-        # Look for the pattern: เ + consonant + ิ/า/อ/ีย/ือ/ัว
-        if position < len(word) - 2:
-            next_char = word[position + 1]
-            after_next_char = word[position + 2] if position + 2 < len(word) else None
-            after_after_next_char = word[position + 3] if position + 3 < len(word) else None
-            
-            # Check for single character surrounding vowels
-            if vowel_char == 'เ' and after_next_char in ['ิ', 'า', 'อ']:
-                if after_next_char == 'ิ':
-                    return {
-                        'position': 'surrounding_start',
-                        'description': 'vowel surrounds consonant (เ before, ิ after)',
-                        'visual_order': 'written before and after consonant',
-                        'pronunciation_order': 'เ spoken first, then consonant, then ิ'
-                    }
-                elif after_next_char == 'า':
-                    return {
-                        'position': 'surrounding_start',
-                        'description': 'vowel surrounds consonant (เ before, า after)',
-                        'visual_order': 'written before and after consonant',
-                        'pronunciation_order': 'เ spoken first, then consonant, then า'
-                    }
-                elif after_next_char == 'อ':
-                    return {
-                        'position': 'surrounding_start',
-                        'description': 'vowel surrounds consonant (เ before, อ after)',
-                        'visual_order': 'written before and after consonant',
-                        'pronunciation_order': 'เ spoken first, then consonant, then อ'
-                    }
-            
-            # Check for compound character surrounding vowels
-            elif vowel_char == 'เ' and position < len(word) - 3:
-                if after_next_char == 'ี' and after_after_next_char == 'ย':
-                    return {
-                        'position': 'surrounding_start',
-                        'description': 'vowel surrounds consonant (เ before, ีย after)',
-                        'visual_order': 'written before and after consonant',
-                        'pronunciation_order': 'เ spoken first, then consonant, then ีย'
-                    }
-                elif after_next_char == 'ื' and after_after_next_char == 'อ':
-                    return {
-                        'position': 'surrounding_start',
-                        'description': 'vowel surrounds consonant (เ before, ือ after)',
-                        'visual_order': 'written before and after consonant',
-                        'pronunciation_order': 'เ spoken first, then consonant, then ือ'
-                    }
-                elif after_next_char == 'ั' and after_after_next_char == 'ว':
-                    return {
-                        'position': 'surrounding_start',
-                        'description': 'vowel surrounds consonant (เ before, ัว after)',
-                        'visual_order': 'written before and after consonant',
-                        'pronunciation_order': 'เ spoken first, then consonant, then ัว'
-                    }
-            
-            elif vowel_char == 'แ' and after_next_char == 'อ':
-                return {
-                    'position': 'surrounding_start',
-                    'description': 'vowel surrounds consonant (แ before, อ after)',
-                    'visual_order': 'written before and after consonant',
-                    'pronunciation_order': 'แ spoken first, then consonant, then อ'
-                }
-            elif vowel_char == 'โ' and after_next_char == 'ะ':
-                return {
-                    'position': 'surrounding_start',
-                    'description': 'vowel surrounds consonant (โ before, ะ after)',
-                    'visual_order': 'written before and after consonant',
-                    'pronunciation_order': 'โ spoken first, then consonant, then ะ'
-                }
-            elif vowel_char == 'ไ':
-                return {
-                    'position': 'surrounding_start',
-                    'description': 'vowel surrounds consonant (ไ before, no after)',
-                    'visual_order': 'written before consonant',
-                    'pronunciation_order': 'ไ spoken first, then consonant'
-                }
-    
-    # Check if this is the second part of a surrounding vowel
-    if vowel_char in ['ิ', 'า', 'อ', 'ะ'] and position > 0:
-        prev_char = word[position - 1]
-        if prev_char in ['เ', 'แ', 'โ']:
-            if prev_char == 'เ' and vowel_char == 'ิ':
-                return {
-                    'position': 'surrounding_end',
-                    'description': 'vowel surrounds consonant (เ before, ิ after)',
-                    'visual_order': 'written before and after consonant',
-                    'pronunciation_order': 'เ spoken first, then consonant, then ิ'
-                }
-            elif prev_char == 'เ' and vowel_char == 'า':
-                return {
-                    'position': 'surrounding_end',
-                    'description': 'vowel surrounds consonant (เ before, า after)',
-                    'visual_order': 'written before and after consonant',
-                    'pronunciation_order': 'เ spoken first, then consonant, then า'
-                }
-            elif prev_char == 'เ' and vowel_char == 'อ':
-                return {
-                    'position': 'surrounding_end',
-                    'description': 'vowel surrounds consonant (เ before, อ after)',
-                    'visual_order': 'written before and after consonant',
-                    'pronunciation_order': 'เ spoken first, then consonant, then อ'
-                }
-            elif prev_char == 'แ' and vowel_char == 'อ':
-                return {
-                    'position': 'surrounding_end',
-                    'description': 'vowel surrounds consonant (แ before, อ after)',
-                    'visual_order': 'written before and after consonant',
-                    'pronunciation_order': 'แ spoken first, then consonant, then อ'
-                }
-            elif prev_char == 'โ' and vowel_char == 'ะ':
-                return {
-                    'position': 'surrounding_end',
-                    'description': 'vowel surrounds consonant (โ before, ะ after)',
-                    'visual_order': 'written before and after consonant',
-                    'pronunciation_order': 'โ spoken first, then consonant, then ะ'
-                }
-    
-    # Handle individual vowel positions
-    positioning_info = {
-        'above': ['ิ', 'ี', '์'],
-        'below': ['ุ', 'ู'],
-        'before': ['เ', 'โ', 'ไ', 'ใ', 'แ'],
-        'after': ['า', 'อ', 'ะ']
-    }
-    
-    for position_type, vowels in positioning_info.items():
-        if vowel_char in vowels:
-            pronunciation_order = 'spoken first' if position_type == 'before' else 'spoken second'
-            if position_type in ['above', 'below']:
-                pronunciation_order = 'spoken simultaneously'
-            
+    The state starts optimistic (online) until the first probe completes.
+    The probe thread is started lazily on first use, and again in a forked
+    child, since threads do not survive a fork.
+    """
+
+    def __init__(self, probe_url, interval, max_backoff, timeout):
+        self.probe_url = probe_url
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.online = True
+        self.checked_at = None
+        self.last_online_at = None
+        self.last_error = None
+        self.consecutive_failures = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def start(self):
+        """Start the probe thread for this process if it is not running yet."""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._run, name='connectivity-monitor', daemon=True)
+            thread.start()
+
+    def probe(self):
+        """Probe the network once, update the cached state and return it."""
+        try:
+            # Only a 2xx counts; a captive portal redirects and a failing probe URL returns 5xx
+            response = requests.get(self.probe_url, timeout=self.timeout, allow_redirects=False)
+            if not 200 <= response.status_code < 300:
+                raise requests.HTTPError(f"Probe returned HTTP {response.status_code}")
+            online, error = True, None
+        except Exception as e:
+            online, error = False, str(e)
+        
+        with self._lock:
+            if online != self.online:
+                logger.info("Connectivity changed: %s", 'online' if online else 'offline')
+            self.online = online
+            self.checked_at = time.time()
+            self.last_error = error
+            if online:
+                self.last_online_at = self.checked_at
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+        return online
+
+    def next_delay(self):
+        """Seconds until the next probe: the interval, doubled per consecutive failure up to the cap."""
+        if self.consecutive_failures == 0:
+            return self.interval
+        return min(self.interval * 2 ** min(self.consecutive_failures, 32), max(self.max_backoff, self.interval))
+
+    def _run(self):
+        while True:
+            self.probe()
+            time.sleep(self.next_delay())
+
+    def is_online(self):
+        """Return the cached connectivity state without blocking."""
+        self.start()
+        return self.online
+
+    def status(self):
+        """Return the cached state for the /connectivity endpoint."""
+        self.start()
+        with self._lock:
             return {
-                'position': position_type,
-                'description': f'vowel positioned {position_type} consonant',
-                'visual_order': 'written before spoken' if position_type == 'before' else 'written after spoken',
-                'pronunciation_order': pronunciation_order
+                'online': self.online,
+                'checked': self.checked_at is not None,
+                'timestamp': formatdate(self.checked_at, usegmt=True) if self.checked_at else '',
+                'last_online': formatdate(self.last_online_at, usegmt=True) if self.last_online_at else '',
+                'consecutive_failures': self.consecutive_failures,
+                'next_check_in': round(self.next_delay(), 1) if self.enabled else None
             }
+
+connectivity_monitor = ConnectivityMonitor(
+    CONNECTIVITY_PROBE_URL, CONNECTIVITY_PROBE_INTERVAL, CONNECTIVITY_MAX_BACKOFF, CONNECTIVITY_PROBE_TIMEOUT
+)
+
+def is_online():
+    """Connectivity check used before calling translation APIs (reads the monitor's cached state)."""
+    return connectivity_monitor.is_online()
+
+# Concurrent analysis stages
+# ==========================
+#
+# The stages of a single /analyze request are independent of each other, so
+# they run concurrently on a shared thread pool, each with its own deadline
+# (see run_stages in tone_analysis.py). The translation lookup is the one
+# network stage and runs alongside the analysis.
+
+STAGE_WORKERS = int(os.environ.get('STAGE_WORKERS', 16))
+TRANSLATION_STAGE_TIMEOUT = float(os.environ.get('TRANSLATION_STAGE_TIMEOUT', 6))
+
+_stage_executor = None
+
+def get_stage_executor():
+    """Return the shared thread pool used for request stages, creating it on first use."""
+    global _stage_executor
+    if _stage_executor is None:
+        _stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='analysis-stage')
+    return _stage_executor
+
+# Model warm-up
+# =============
+#
+# tltk, the romanizer and gTTS load their models on first use, which used to
+# land on the first request each worker served. warm_up_models() loads and
+# exercises them up front; /ready reports 503 until it has finished so the
+# load balancer only routes to warm workers.
+
+WARM_UP_ENABLED = os.environ.get('WARM_UP', 'true').lower() == 'true'
+
+# A few words covering leading vowels, complex vowels, clusters and multiple syllables
+WARM_UP_WORDS = ['กา', 'สวัสดี', 'เหนื่อย', 'ไม่ดี', 'ภาษาไทย', 'ครับ']
+
+class WarmUpState:
+    """Progress of the warm-up for this process."""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.started = False
+        self.duration = None
+        self.timings = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Return True for the one caller that should run the warm-up."""
+        with self._lock:
+            if self.started:
+                return False
+            self.started = True
+            return True
+
+warm_up_state = WarmUpState()
+
+def warm_up_models(words=WARM_UP_WORDS, verbose=True):
+    """Load and exercise tltk, the romanizer, the tone table, the analysis pipeline and gTTS, and size the audio cache.
+
+    Returns ({component: seconds}, {component: error message}). A component
+    that fails is reported and skipped; the others still warm up.
+    """
+    timings = {}
+    errors = {}
+    
+    def step(component, function):
+        start = time.perf_counter()
+        try:
+            function()
+        except Exception as e:
+            errors[component] = str(e)
+        timings[component] = round(time.perf_counter() - start, 3)
     
-    return {
-        'position': 'unknown',
-        'description': 'vowel position unknown',
-        'visual_order': 'unknown',
-        'pronunciation_order': 'unknown'
-    }
+    def tltk_models():
+        import tltk.nlp as tltk_nlp
+        for word in words:
+            tltk_nlp.th2read(word)
+            tltk_nlp.th2ipa(word)
+    
+    def romanizer():
+        for word in words:
+            romanize(word, engine='tltk')
+            romanize(word, engine='royin')
+    
+    def precomputed_tone_table():
+        # Built here, before gunicorn forks, when missing or left over from other rules
+        if TONE_TABLE_ENABLED and get_tone_table() is None:
+            build_tone_table()
+    
+    def analysis():
+        for word in words:
+            try:
+                analyze_thai_word(word)
+            except Exception:
+                pass  # Rule gaps for a word are not a warm-up failure
+    
+    def text_to_speech():
+        # Builds the request without calling Google
+        gTTS(text=words[0], lang='th')
+    
+    def audio_cache_size():
+        # One directory scan seeds the running size total, before gunicorn forks
+        if audio_cache.enabled:
+            audio_cache.evict()
+    
+    step('lexicon', get_lexicon)
+    step('tltk', tltk_models)
+    step('romanizer', romanizer)
+    step('tone_table', precomputed_tone_table)
+    step('analysis', analysis)
+    step('gtts', text_to_speech)
+    step('audio_cache', audio_cache_size)
+    
+    if verbose:
+        for component, seconds in timings.items():
+            status = f" (failed: {errors[component]})" if component in errors else ""
+            logger.info("Warm-up %s: %.2fs%s", component, seconds, status)
+    return timings, errors
+
+def run_warm_up():
+    """Run the warm-up once for this process and mark it ready."""
+    if not warm_up_state.claim():
+        return
+    start = time.perf_counter()
+    try:
+        warm_up_state.timings, warm_up_state.errors = warm_up_models()
+    finally:
+        warm_up_state.duration = round(time.perf_counter() - start, 3)
+        warm_up_state.ready.set()
+        logger.info("Warm-up finished in %.2fs", warm_up_state.duration)
+
+def start_warm_up():
+    """Start the warm-up in a background thread (or mark ready at once if disabled)."""
+    if not WARM_UP_ENABLED:
+        warm_up_state.started = True
+        warm_up_state.ready.set()
+        return
+    if warm_up_state.started:
+        return
+    threading.Thread(target=run_warm_up, name='warm-up', daemon=True).start()
+
+def warm_up_batch_worker():
+    """Process pool initializer: load tltk and the romanizer before the worker takes words.
+
+    One analysis covers everything get_word_analysis() needs. The rest of the
+    web warm-up (tone table build, lexicon, audio cache, gTTS) stays in the
+    server process; batch workers do not use it.
+    """
+    if WARM_UP_ENABLED:
+        try:
+            analyze_thai_word('กา')
+        except Exception:
+            pass
+
+# Admin endpoints are only served when ADMIN_TOKEN is set, and requests must
+# send it in the X-Admin-Token header; without a token they answer 404.
+# Each worker process keeps its own analysis cache, so an admin request only
+# acts on the worker that serves it.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+def has_admin_token():
+    """Check the request's X-Admin-Token against ADMIN_TOKEN (never true when none is set)."""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+def admin_required(view):
+    """Protect an admin endpoint with ADMIN_TOKEN; without one configured it does not exist."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Not found.'}), 404
+        if not has_admin_token():
+            return jsonify({'error': 'Admin token required.'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/cache', methods=['GET'])
+@admin_required
+def cache_stats():
+    """Report analysis, translation and audio cache statistics."""
+    return jsonify({
+        'analysis': analysis_cache.stats(),
+        'translations': translation_cache.stats(),
+        'audio': audio_cache.stats()
+    })
+
+@app.route('/admin/cache/invalidate', methods=['POST'])
+@admin_required
+def cache_invalidate():
+    """Clear the analysis cache, and the translation or audio cache with ?translations=true or ?audio=true.
+
+    The analysis cache is cleared in this worker only; the translation and
+    audio caches are shared files, cleared for every worker.
+    """
+    invalidate_analysis_cache()
+    if request.args.get('translations', 'false').lower() == 'true':
+        translation_cache.clear()
+    if request.args.get('audio', 'false').lower() == 'true':
+        audio_cache.clear()
+    return jsonify({
+        'analysis': analysis_cache.stats(),
+        'translations': translation_cache.stats(),
+        'audio': audio_cache.stats()
+    })
+
+@app.route('/admin/syllable-exceptions', methods=['GET'])
+@admin_required
+def syllable_exception_stats():
+    """Report syllable exception table sizes, hit counts and recorded candidates."""
+    stats = syllable_exceptions.stats()
+    stats['candidates'] = syllable_exceptions.candidates()
+    return jsonify(stats)
 
-def get_implied_vowel_info(word):
-    """Get information about implied vowels in a word."""
-    if not has_implied_vowel(word):
+@app.route('/admin/syllable-exceptions/reload', methods=['POST'])
+@admin_required
+def syllable_exception_reload():
+    """Reload the syllable exceptions file now."""
+    if not syllable_exceptions.load():
+        return jsonify({'error': syllable_exceptions.last_error}), 400
+    return jsonify(syllable_exceptions.stats())
+
+# Request profiling
+# =================
+#
+# A request runs under cProfile when it sends X-Profile: 1 with the admin
+# token (so only when ADMIN_TOKEN is set) or is picked at random at
+# PROFILE_SAMPLE_RATE. Each profile is saved to PROFILE_DIR as a pstats file
+# with a JSON summary next to it; only the newest PROFILE_MAX_FILES are kept.
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(CACHE_DIR, 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 100))
+PROFILE_TOP_FUNCTIONS = 15
+PROFILE_ID_PATTERN = re.compile(r'[0-9]{8}-[0-9]{6}-[0-9a-f]{8}')
+PROFILE_SORT_KEYS = frozenset(key.value for key in pstats.SortKey)
+
+def profiling_trigger():
+    """Return why this request should run under the profiler ('header' or 'sampled'), or None."""
+    if request.path.startswith('/admin/'):
         return None
-    
-    consonant_count = sum(1 for char in word if char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low'])
-    
-    if consonant_count == 2:
-        # Two consonants - implied short 'o' sound (โอะ)
-        return {
-            'type': 'short_o',
-            'vowel': 'โอะ',
-            'description': 'short o sound',
-            'position': 'between consonants'
-        }
-    elif consonant_count == 3:
-        # Three consonants - implied 'a' after first consonant, then short 'o'
-        return {
-            'type': 'multi_consonant',
-            'vowels': ['อะ', 'โอะ'],
-            'description': 'short a after first consonant, then short o',
-            'positions': ['after first consonant', 'between remaining consonants']
-        }
-    
+    # Only admins can ask for a profile; without ADMIN_TOKEN the header is ignored
+    if ADMIN_TOKEN and request.headers.get('X-Profile', '').lower() in ('1', 'true', 'yes') and has_admin_token():
+        return 'header'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
     return None
 
-def is_consonant_cluster_start(word, pos):
-    """Check if position starts a consonant cluster."""
-    if pos >= len(word) - 1:
-        return False
-    
-    char1 = word[pos]
-    char2 = word[pos + 1]
-    
-    # Common Thai consonant clusters
-    clusters = [
-        'กร', 'กล', 'ขร', 'ขล', 'คร', 'คล', 'ตร', 'ปร', 'ปล', 'พร', 'พล'
-    ]
-    
-    return char1 + char2 in clusters
-
-def find_initial_consonant(word):
-    """Find the initial consonant in a Thai word, handling vowel symbols, zero consonants, and clusters."""
-    if not word:
-        return None, 0
-    
-    # Special cases where อ is a silent tone modifier
-    special_words = ['อย่า', 'อยาก', 'อยู่', 'อย่าง']
-    if word in special_words:
-        return 'อ', 0  # อ acts as silent tone modifier (mid-class)
-    
-    # If first character is a vowel symbol, check if there's a consonant cluster after it
-    if is_vowel_symbol(word[0]):
-        # Look for consonant cluster starting at position 1
-        if len(word) > 2 and is_consonant_cluster_start(word, 1):
-            return word[1], 1  # Return the first consonant of the cluster
-        # Check if there's a single consonant after the vowel symbol
-        elif len(word) > 1 and word[1] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            # Check for ห (ho hip) leading consonant + low-class sonorant pattern
-            if word[1] == 'ห' and len(word) > 2:
-                next_char = word[2]
-                low_sonorants = ['ง', 'ญ', 'น', 'ม', 'ย', 'ร', 'ล', 'ว']
-                if next_char in low_sonorants:
-                    # ห acts as leading consonant, the following consonant determines the tone class
-                    # but the tone rules follow high-class consonant rules
-                    return next_char, 1  # Return the following consonant, but mark it as high-class for tone purposes
-            return word[1], 1  # Return the consonant
-        else:
-            return 'อ', 0  # Return อ as the implicit consonant
-    
-    # If first character is อ followed by a vowel, it's a zero consonant
-    if word[0] == 'อ' and len(word) > 1:
-        # Check if the next character is a vowel
-        next_char = word[1]
-        if (next_char in SIMPLE_VOWELS or is_vowel_symbol(next_char) or 
-            any(vowel in next_char for vowel in COMPLEX_VOWELS.keys())):
-            return 'อ', 0  # อ is the zero consonant
-    
-    # Check for ห (ho hip) leading consonant + low-class sonorant
-    if len(word) > 1 and word[0] == 'ห':
-        next_char = word[1]
-        # Low-class sonorant consonants that can be led by ห
-        low_sonorants = ['ง', 'ญ', 'น', 'ม', 'ย', 'ร', 'ล', 'ว']
-        if next_char in low_sonorants:
-            # ห acts as leading consonant, the following consonant determines the tone class
-            # but the tone rules follow high-class consonant rules
-            return next_char, 0  # Return the following consonant, but mark it as high-class for tone purposes
-    
-    # Check for consonant clusters
-    if is_consonant_cluster_start(word, 0):
-        return word[0], 0  # Return the first consonant of the cluster
-    
-    # Regular consonant
-    return word[0], 0
-
-def has_tone_mark(word):
-    """Check if word has any tone marks and return them."""
-    marks = []
-    for char in word:
-        if char in TONE_MARKS:
-            marks.append(char)
-    return marks
-
-def is_long_vowel(vowel_char):
-    """Check if a vowel character represents a long vowel."""
-    return vowel_char in LONG_VOWELS
-
-def is_short_vowel(vowel_char):
-    """Check if a vowel character represents a short vowel."""
-    return vowel_char in SHORT_VOWELS
-
-def identify_vowels(word):
-    """Identify vowels in the word and return their information."""
-    import re
-    vowels_found = []
-    
-    # First, check for 'ว' functioning as vowel sound (highest priority)
-    w_vowel_info = get_w_vowel_info(word)
-    if w_vowel_info:
-        vowels_found.append({
-            'char': w_vowel_info['vowel'],
-            'info': {'type': 'long', 'name': 'ua (long ua)', 'description': w_vowel_info['description']},
-            'type': 'w_vowel',
-            'position': w_vowel_info['position']
-        })
-        return vowels_found  # W vowel takes precedence over other patterns
-    
-    # Check for Sanskrit vowels (high priority)
-    for i, char in enumerate(word):
-        if char in ['ฤ', 'ฤๅ', 'ฦ', 'ฦๅ']:
-            positioning = get_vowel_positioning(char, word, i)
-            vowels_found.append({
-                'char': char,
-                'info': SIMPLE_VOWELS[char],
-                'type': 'sanskrit',
-                'position': i,
-                'positioning': positioning
-            })
-            return vowels_found  # Sanskrit vowels take precedence
-    
-    # Check for specific complex vowels first (เ_ือ, เ_ีย)
-    specific_patterns = ['เ_ือ', 'เ_ีย']
-    for pattern_name in specific_patterns:
-        if pattern_name in COMPLEX_VOWELS:
-            info = COMPLEX_VOWELS[pattern_name]
-            pattern = info['pattern']
-            if re.search(pattern, word):
-                # Get positioning for the first vowel character in the pattern
-                first_vowel = pattern_name.split('_')[0] if '_' in pattern_name else pattern_name[0]
-                positioning = get_vowel_positioning(first_vowel, word, 0)
-                vowels_found.append({
-                    'char': pattern_name,
-                    'info': info,
-                    'type': 'complex',
-                    'positioning': positioning
-                })
-                return vowels_found  # Specific patterns take precedence
-    
-    # Check for other complex vowels (diphthongs)
-    for complex_vowel, info in COMPLEX_VOWELS.items():
-        if complex_vowel in specific_patterns:
-            continue  # Skip patterns we already checked
-        pattern = info['pattern']
-        if re.search(pattern, word):
-            # Get positioning for the first vowel character in the pattern
-            first_vowel = complex_vowel.split('_')[0] if '_' in complex_vowel else complex_vowel[0]
-            positioning = get_vowel_positioning(first_vowel, word, 0)
-            vowels_found.append({
-                'char': complex_vowel,
-                'info': info,
-                'type': 'complex',
-                'positioning': positioning
-            })
-            return vowels_found  # Complex vowels take precedence
-    
-    # Check for 'อ' functioning as a vowel (before implied vowels)
-    for i, char in enumerate(word):
-        if char == 'อ' and not is_zero_consonant(word, i):
-            positioning = get_vowel_positioning(char, word, i)
-            vowels_found.append({
-                'char': char,
-                'info': {'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
-                'type': 'simple',
-                'position': i,
-                'positioning': positioning
-            })
-            return vowels_found  # 'อ' vowel takes precedence over implied vowels
-    
-    # Check for implied vowels
-    implied_info = get_implied_vowel_info(word)
-    if implied_info:
-        if implied_info['type'] == 'short_o':
-            vowels_found.append({
-                'char': implied_info['vowel'],
-                'info': {'type': 'short', 'name': 'o (short o)', 'description': 'short o sound'},
-                'type': 'implied',
-                'position': 'between consonants'
-            })
-        elif implied_info['type'] == 'multi_consonant':
-            for i, vowel in enumerate(implied_info['vowels']):
-                vowels_found.append({
-                    'char': vowel,
-                    'info': {'type': 'short', 'name': f'{vowel} (short)', 'description': f'short {vowel} sound'},
-                    'type': 'implied',
-                    'position': implied_info['positions'][i]
-                })
-        return vowels_found  # Implied vowels take precedence
-    
-    # If no complex vowels found, look for simple vowels
-    # Find the initial consonant position
-    initial_consonant, consonant_pos = find_initial_consonant(word)
-    
-    # Determine how many characters to skip for the initial consonant/cluster
-    skip_chars = 1
-    if consonant_pos < len(word) - 1 and is_consonant_cluster_start(word, consonant_pos):
-        skip_chars = 2  # Skip both characters in the cluster
-    
-    # Look for simple vowels starting from after the consonant/cluster
-    for i, char in enumerate(word[consonant_pos + skip_chars:], consonant_pos + skip_chars):
-        if char in SIMPLE_VOWELS:
-            positioning = get_vowel_positioning(char, word, i)
-            vowels_found.append({
-                'char': char,
-                'info': SIMPLE_VOWELS[char],
-                'type': 'simple',
-                'position': i,
-                'positioning': positioning
-            })
-        elif char == 'อ' and not is_zero_consonant(word, i):
-            # 'อ' functioning as a vowel
-            positioning = get_vowel_positioning(char, word, i)
-            vowels_found.append({
-                'char': char,
-                'info': {'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
-                'type': 'simple',
-                'position': i,
-                'positioning': positioning
-            })
-    
-    # Also check if the first character is a simple vowel symbol
-    if word and word[0] in SIMPLE_VOWELS:
-        positioning = get_vowel_positioning(word[0], word, 0)
-        vowels_found.append({
-            'char': word[0],
-            'info': SIMPLE_VOWELS[word[0]],
-            'type': 'simple',
-            'position': 0,
-            'positioning': positioning
-        })
-    
-    return vowels_found
-
-def get_vowel_description(vowels):
-    """Get a description of the vowels found in the word."""
-    if not vowels:
-        return "no vowels identified"
-
-    if len(vowels) == 1:
-        vowel = vowels[0]
-        if vowel['type'] == 'implied':
-            return f"implied vowel '{vowel['char']}' ({vowel['info']['name']}) - {vowel['info']['description']} ({vowel['position']})"
-        elif vowel['type'] == 'w_vowel':
-            return f"'{vowel['char']}' vowel sound ({vowel['info']['name']}) - {vowel['info']['description']} ({vowel['position']})"
-        else:
-            positioning_info = vowel.get('positioning', {})
-            positioning_text = f" ({positioning_info.get('description', '')})" if positioning_info else ""
-            return f"vowel '{vowel['char']}' ({vowel['info']['name']}) - {vowel['info']['description']}{positioning_text}"
-    else:
-        # For multiple vowels, return the primary vowel (the main vowel sound)
-        # Priority: 1) Long vowels over short vowels, 2) Vowels after consonants over above/below vowels
-        primary_vowel = None
-        best_priority = -1
-        
-        for vowel in vowels:
-            priority = 0
-            
-            # Priority 1: Long vowels over short vowels
-            if vowel['info']['type'] == 'long':
-                priority += 100
-            else:
-                priority += 50
-            
-            # Priority 2: Vowels after consonants (า, อ, ะ) over above/below vowels (ิ, ี, ุ, ู)
-            positioning = vowel.get('positioning', {})
-            position = positioning.get('position', '')
-            if position == 'after':
-                priority += 20
-            elif position in ['above', 'below']:
-                priority += 10
-            
-            # Priority 3: Earlier position (closer to consonant)
-            priority += (10 - vowel.get('position', 0))
-            
-            if priority > best_priority:
-                primary_vowel = vowel
-                best_priority = priority
-        
-        # If no position info, use the first vowel in the list
-        if primary_vowel is None and vowels:
-            primary_vowel = vowels[0]
-            
-        if primary_vowel:
-            if primary_vowel['type'] == 'implied':
-                return f"implied vowel '{primary_vowel['char']}' ({primary_vowel['info']['name']}) - {primary_vowel['info']['description']} ({primary_vowel['position']})"
-            elif primary_vowel['type'] == 'w_vowel':
-                return f"'{primary_vowel['char']}' vowel sound ({primary_vowel['info']['name']}) - {primary_vowel['info']['description']} ({primary_vowel['position']})"
-            else:
-                positioning_info = primary_vowel.get('positioning', {})
-                positioning_text = f" ({positioning_info.get('description', '')})" if positioning_info else ""
-                return f"vowel '{primary_vowel['char']}' ({primary_vowel['info']['name']}) - {primary_vowel['info']['description']}{positioning_text}"
-        
-        # Fallback: return all vowels if we can't determine primary
-        vowel_descriptions = []
-        for vowel in vowels:
-            if vowel['type'] == 'implied':
-                vowel_descriptions.append(f"'{vowel['char']}' ({vowel['info']['name']}, implied)")
-            elif vowel['type'] == 'w_vowel':
-                vowel_descriptions.append(f"'{vowel['char']}' ({vowel['info']['name']}, ว vowel)")
-            else:
-                positioning_info = vowel.get('positioning', {})
-                positioning_text = f" ({positioning_info.get('position', '')})" if positioning_info else ""
-                vowel_descriptions.append(f"'{vowel['char']}' ({vowel['info']['name']}{positioning_text})")
-        return f"vowels {', '.join(vowel_descriptions)}"
+def is_profiling():
+    """Check if the current request is being profiled."""
+    return g.get('profile') is not None
 
+@app.before_request
+def start_profiling():
+    trigger = profiling_trigger()
+    if trigger is None:
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active in this process
+        logger.warning("Cannot profile %s: %s", request.path, e)
+        return
+    # What the summary needs from the request is read now: a streamed response finishes after the request context
+    g.profile = {
+        'profiler': profiler,
+        'started': time.perf_counter(),
+        'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+        'created': time.time(),
+        'method': request.method,
+        'path': request.path,
+        'input': profiled_input(),
+        'trigger': trigger
+    }
 
-def classify_syllable_type(word):
-    """Classify syllable as live or dead."""
-    # Check for tone marks first - syllables with tone marks are always dead
-    if any(char in TONE_MARKS for char in word):
-        return 'dead'
-    
-    # Remove tone marks for analysis
-    clean_word = ''.join([char for char in word if char not in TONE_MARKS])
-    
-    if not clean_word:
-        return 'live'
-    
-    # Check if ends with sonorant consonant first (this makes syllable live regardless of vowel)
-    if clean_word[-1] in SONORANT_CONSONANTS:
-        return 'live'
-    
-    # Check if ends with stop consonant
-    if clean_word[-1] in STOP_CONSONANTS:
-        return 'dead'
-    
-    # Check for vowels to determine if it's long or short
-    vowels = identify_vowels(clean_word)
-    if vowels:
-        # For multiple vowels, prioritize the final vowel (the one that determines syllable type)
-        # Find the vowel closest to the end of the word
-        final_vowel = None
-        final_position = -1
-        
-        for vowel in vowels:
-            if vowel.get('position', 0) > final_position:
-                final_vowel = vowel
-                final_position = vowel.get('position', 0)
-        
-        # If no position info, use the last vowel in the list
-        if final_vowel is None and vowels:
-            final_vowel = vowels[-1]
-            
-        if final_vowel:
-            if final_vowel['type'] == 'complex':
-                return 'live' if final_vowel['info']['type'] == 'long' else 'dead'
-            elif final_vowel['type'] == 'simple':
-                return 'live' if final_vowel['info']['type'] == 'long' else 'dead'
-            elif final_vowel['type'] == 'implied':
-                return 'live' if final_vowel['info']['type'] == 'long' else 'dead'
-            elif final_vowel['type'] == 'w_vowel':
-                return 'live' if final_vowel['info']['type'] == 'long' else 'dead'
-    
-    # Fallback: check individual characters
-    for char in clean_word:
-        if char in SIMPLE_VOWELS:
-            return 'live' if SIMPLE_VOWELS[char]['type'] == 'long' else 'dead'
-    
-    # Default to live if unclear
-    return 'live'
-
-def analyze_romanization_for_syllables(word, romanized):
-    """Use romanization to help determine syllable structure and 'อ' function."""
-    # More sophisticated vowel counting that recognizes diphthongs
-    # Common Thai diphthongs in romanization
-    diphthongs = ['ai', 'ao', 'ia', 'ua', 'ue', 'oe', 'ui', 'oi']
-    
-    # Count syllables more accurately by looking for vowel clusters
-    romanized_lower = romanized.lower()
-    syllable_count = 0
-    i = 0
-    
-    while i < len(romanized_lower):
-        char = romanized_lower[i]
-        if char in 'aeiou':
-            syllable_count += 1
-            # Check for diphthongs starting with this vowel
-            if i + 1 < len(romanized_lower):
-                next_char = romanized_lower[i + 1]
-                if char + next_char in diphthongs:
-                    i += 2  # Skip both characters of diphthong
-                    continue
-            i += 1
-        else:
-            i += 1
-    
-    # Special handling for words with multiple consonant clusters
-    # If romanization has many consonants in a row, it might indicate multiple syllables
-    consonant_clusters = 0
-    i = 0
-    while i < len(romanized_lower):
-        if romanized_lower[i] not in 'aeiou':
-            # Found consonant, count consecutive consonants
-            cluster_length = 0
-            while i < len(romanized_lower) and romanized_lower[i] not in 'aeiou':
-                cluster_length += 1
-                i += 1
-            if cluster_length >= 2:  # 2+ consecutive consonants might indicate syllable boundary
-                consonant_clusters += 1
-        else:
-            i += 1
-    
-    # If we have many consonant clusters but few vowels, adjust syllable count
-    if consonant_clusters > syllable_count:
-        syllable_count = max(syllable_count, consonant_clusters)
-    
-    # Determine 'อ' function based on patterns
-    o_function = 'unknown'
-    
-    # Check if 'อ' at beginning functions as zero consonant
-    if word.startswith('อ') and not word.startswith('อา'):
-        o_function = 'zero_consonant'
-    # Check for consonant-อ-consonant pattern (single syllable with 'อ' as vowel)
-    elif any(word[i] == 'อ' and 
-             word[i-1] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low'] and
-             word[i+1] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']
-             for i in range(1, len(word) - 1)):
-        o_function = 'vowel'
-    # If only one syllable and contains 'อ', likely vowel
-    elif syllable_count == 1 and 'อ' in word:
-        o_function = 'vowel'
-    
-    return {'syllable_count': syllable_count, 'o_function': o_function}
+def profile_summary(stats, limit=PROFILE_TOP_FUNCTIONS):
+    """Return the functions with the most own time in ``stats``."""
+    entries = sorted(stats.stats.items(), key=lambda item: -item[1][2])[:limit]
+    return [{
+        'function': f"{filename}:{line}({name})",
+        'calls': calls,
+        'own_ms': round(own_time * 1000, 3),
+        'cumulative_ms': round(cumulative_time * 1000, 3)
+    } for (filename, line, name), (_, calls, own_time, cumulative_time, _) in entries]
 
-def is_consonant_o_consonant_pattern(word):
-    """Check if word follows consonant-อ-consonant pattern where อ is a vowel."""
-    if len(word) != 3:
-        return False
-    
-    first_char = word[0]
-    middle_char = word[1] 
-    last_char = word[2]
-    
-    # Check if it's consonant-อ-consonant pattern
-    if (middle_char == 'อ' and 
-        first_char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low'] and
-        last_char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']):
-        return True
-    
-    return False
+def profiled_input():
+    """Return the word or text the request was about, for the profile listing."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        value = data.get('word') or data.get('text')
+        if isinstance(value, str):
+            return value[:200]
+    return request.args.get('text') or request.args.get('word')
 
-def attempt_smart_splitting(word, target_syllable_count):
-    """Attempt to intelligently split a word to match the target syllable count."""
-    # For now, add to manual entries when we detect a mismatch
-    # This ensures we learn from tltk's accuracy
-    print(f"Adding '{word}' to manual entries for future reference")
-    
-    # This is a placeholder - in a more sophisticated implementation,
-    # we could try to algorithmically adjust the splitting
-    # For now, we'll fall back to the original algorithm
-    return split_into_syllables_algorithm(word)
-
-def split_into_syllables(word):
-    """Split a Thai word into syllables using tltk for syllable count, then our algorithm for actual splitting."""
-    if not word or not word.strip():
+def saved_profile_ids():
+    """Return the IDs of the saved profiles, newest first."""
+    profiles = []
+    try:
+        for entry in os.scandir(PROFILE_DIR):
+            if entry.name.endswith('.prof'):
+                profiles.append((entry.stat().st_mtime, entry.name[:-5]))
+    except OSError:
         return []
-    
-    word = word.strip()
-    
-    # Special cases where we override tltk's result
-    special_cases = {
-        'เหนื่อย': ['เหนื่อ', 'ย'],  # tired - should be 2 syllables
-        'การปฏิสัมพันธ์': ['กาน', 'ปะ', 'ติ', 'สัม', 'พัน'],  # interaction - should be 5 syllables
-        'อันตรกิริยา': ['อัน', 'ตะ', 'ระ', 'กิ', 'ริ', 'ยา'],  # interaction - should be 6 syllables
-        'วันอาทิตย์': ['วัน', 'อา', 'ทิด'],  # Sunday - should be 3 syllables
+    return [profile_id for _, profile_id in sorted(profiles, reverse=True)]
+
+def prune_profiles():
+    """Delete the oldest profiles beyond PROFILE_MAX_FILES."""
+    for profile_id in saved_profile_ids()[PROFILE_MAX_FILES:]:
+        for extension in ('.prof', '.json'):
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, profile_id + extension))
+            except OSError:
+                pass
+
+def finish_profiling(profile, status):
+    """Stop a request's profiler and save the profile; returns its ID."""
+    profiler = profile['profiler']
+    profiler.disable()
+    duration = time.perf_counter() - profile['started']
+    
+    profile_id = profile['id']
+    summary = {
+        'id': profile_id,
+        'created': profile['created'],
+        'method': profile['method'],
+        'path': profile['path'],
+        'input': profile['input'],
+        'status': status,
+        'duration_ms': round(duration * 1000, 3),
+        'trigger': profile['trigger'],
+        'top': profile_summary(pstats.Stats(profiler))
     }
-    
-    if word in special_cases:
-        return special_cases[word]
-    
-    # Get syllable count from tltk reading (most accurate)
     try:
-        import tltk.nlp as tltk_nlp
-        reading = tltk_nlp.th2read(word)
-        clean_reading = reading.rstrip('-')
-        tltk_syllables = [syl.strip() for syl in clean_reading.split('-') if syl.strip()]
-        tltk_syllable_count = len(tltk_syllables)
-        
-        # If tltk gives us 1 syllable, return the whole word
-        if tltk_syllable_count == 1:
-            return [word]
-            
-        # If tltk gives us multiple syllables, use our algorithm to split the actual written word
-        # but verify we get the same number of syllables
-        our_syllables = split_into_syllables_algorithm(word)
-        
-        # If our algorithm gives the same count, use it
-        if len(our_syllables) == tltk_syllable_count:
-            return tltk_syllables
-        else:
-            # tltk is correct, so we need to fix our splitting
-            print(f"Syllable count mismatch for '{word}': tltk={tltk_syllable_count}, our={len(our_syllables)}")
-            print(f"tltk syllables: {tltk_syllables}")
-            print(f"our syllables: {our_syllables}")
-            
-            # Try to intelligently split based on tltk's syllable count
-            # This is a fallback that attempts to match tltk's count
-            return attempt_smart_splitting(word, tltk_syllable_count)
-            
-    except Exception as e:
-        print(f"tltk reading failed for '{word}': {e}")
-    
-    # Fall back to our original algorithm
-    return split_into_syllables_algorithm(word)
-
-def split_into_syllables_algorithm(word):
-    """Original syllable splitting algorithm."""
-    # Explicit rule: consonant-อ-consonant pattern (single syllable)
-    if is_consonant_o_consonant_pattern(word):
-        return [word]
-    
-    # Common Thai syllable patterns
-    if word == 'ลูกกรอก':
-        return ['ลูก', 'กรอก']
-    elif word == 'ลูก':
-        return ['ลูก']
-    elif word == 'กรอก':
-        return ['กรอก']
-    elif word == 'อะไร':
-        return ['อะ', 'ไร']
-    elif word == 'อะ':
-        return ['อะ']
-    elif word == 'ไร':
-        return ['ไร']
-    elif word == 'อา':
-        return ['อา']
-    elif word == 'อี':
-        return ['อี']
-    elif word == 'อู':
-        return ['อู']
-    elif word == 'เอา':
-        return ['เอา']
-    elif word == 'โอ':
-        return ['โอ']
-    elif word == 'อย่า':
-        return ['อย่า']
-    elif word == 'อยาก':
-        return ['อยาก']
-    elif word == 'อยู่':
-        return ['อยู่']
-    elif word == 'อย่าง':
-        return ['อย่าง']
-    elif word == 'โกรธ':
-        return ['โกรธ']
-    elif word == 'ใบแจ้งนี้':
-        return ['ใบ', 'แจ้ง', 'นี้']
-    elif word == 'บ้าน':
-        return ['บ้าน']
-    elif word == 'โรงเรียน':
-        return ['โรง', 'เรียน']
-    elif word == 'ขอบคุณ':
-        return ['ขอบ', 'คุณ']
-    elif word == 'น้ำ':
-        return ['น้ำ']
-    elif word == 'อาหาร':
-        return ['อา', 'หาร']
-    elif word == 'หนังสือ':
-        return ['หนง', 'สือ']
-    elif word == 'กา':
-        return ['กา']
-    elif word == 'ขา':
-        return ['ขา']
-    elif word == 'คา':
-        return ['คา']
-    elif word == 'เธอ':
-        return ['เธอ']
-    elif word == 'เกา':
-        return ['เกา']
-    elif word == 'ไก่':
-        return ['ไก่']
-    elif word == 'ใก้':
-        return ['ใก้']
-    elif word == 'มหาวิทยาลัย':
-        return ['มะ', 'หา', 'วิด', 'ทะ', 'ยา', 'ไล']
-    elif word == 'วิทยาลัย':
-        return ['วิด', 'ทะ', 'ยา', 'ไล']
-    elif word == 'น่อง':
-        return ['น่อง']
-    elif word == 'น่าเบื่อ':
-        return ['น่า', 'เบื่อ']
-    elif word == 'การทดสอบ':
-        return ['การ', 'ทด', 'สอบ']
-    elif word == 'สวัสดี':
-        return ['ส', 'วัส', 'ดี']  # ส (ส+implied vowel), วัส (ว+ั+ส+implied vowel), ดี (ด+ี)
-    elif word == 'หนู':
-        return ['หนู']  # Single syllable with ห leading consonant
-    elif word == 'หมา':
-        return ['หมา']  # Single syllable with ห leading consonant
-    elif word == 'หลับ':
-        return ['หลับ']  # Single syllable with ห leading consonant
-    elif word == 'ไม่ดี':
-        return ['ไม่', 'ดี']  # Two syllables: ไม่ (ไ+ม+่) + ดี (ด+ี)
-    elif word == 'ไม่ไป':
-        return ['ไม่', 'ไป']  # Two syllables: ไม่ (ไ+ม+่) + ไป (ไ+ป)
-    elif word == 'เหนื่อย':
-        return ['เหนื่อ', 'ย']  # Two syllables: เหนื่อ (ห+เ+น+ื+่+อ) + ย
-    # Handle English words (single syllable)
-    elif word.isascii() and word.isalpha():
-        return [word]
-    # Use improved look-back algorithm for syllable splitting
-    return improved_syllable_split(word)
-
-def find_syllable_end(word, start):
-    """Find where the current syllable ends using a corrected approach."""
-    i = start
-    
-    # Build the syllable character by character
-    while i < len(word):
-        char = word[i]
-        
-        # Check for complex vowels first (they take priority over everything else)
-        complex_vowel_found = False
-        for complex_vowel, info in COMPLEX_VOWELS.items():
-            pattern = info['pattern']
-            import re
-            if re.search(pattern, word[i:]):
-                # Found a complex vowel starting at position i
-                match = re.search(pattern, word[i:])
-                if match:
-                    # Move past the entire complex vowel
-                    i += match.end()
-                    complex_vowel_found = True
-                    break
-        
-        if complex_vowel_found:
-            continue
-        
-        # If we're at the start and it's a vowel symbol, include it
-        if i == start and is_vowel_symbol(char):
-            i += 1
-            # Include the following consonant if present
-            if i < len(word) and word[i] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-                i += 1
-            # Check if there's another vowel symbol after this
-            if i < len(word) and is_vowel_symbol(word[i]):
-                # There's another vowel symbol, so current syllable ends here
-                break
-            continue
-        
-        # If we're at the start and it's a consonant, include it (and check for clusters)
-        if i == start and char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            if is_consonant_cluster_start(word, i):
-                i += 2  # Include both consonants in cluster
-            else:
-                i += 1  # Include single consonant
-            continue
-        
-        # If it's a vowel symbol (not at start), this starts a new syllable
-        if is_vowel_symbol(char) and i > start:
-            break
-        
-        # If it's a tone mark, include it
-        if char in TONE_MARKS:
-            i += 1
-            # After a tone mark, check if the next character starts a new syllable
-            if i < len(word):
-                next_char = word[i]
-                # If next character is a consonant followed by a vowel, it starts a new syllable
-                if (next_char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low'] and
-                    i + 1 < len(word) and 
-                    (word[i + 1] in SIMPLE_VOWELS or is_vowel_symbol(word[i + 1]) or 
-                     any(vowel in word[i + 1] for vowel in COMPLEX_VOWELS.keys()))):
-                    # Next character starts a new syllable, so current syllable ends here
-                    break
-            continue
-        
-        # If it's a simple vowel, include it
-        if char in SIMPLE_VOWELS:
-            i += 1
-            continue
-        
-        # Special case: 'ว' functioning as a vowel (ua sound)
-        if char == 'ว' and i + 1 < len(word) and word[i + 1] in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            # This is 'ว' functioning as a vowel, include both 'ว' and the following consonant
-            i += 2  # Skip both 'ว' and the next consonant
-            continue
-        
-        # Special case: 'อ' functioning as a vowel (not zero consonant)
-        if char == 'อ' and not is_zero_consonant(word, i):
-            # Check if this is a consonant-อ-consonant pattern
-            if i > 0 and i < len(word) - 1:
-                prev_char = word[i-1]
-                next_char = word[i+1]
-                if (prev_char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low'] and
-                    next_char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']):
-                    # This is consonant-อ-consonant pattern, 'อ' is a vowel
-                    # Include both 'อ' and the following consonant
-                    i += 2  # Skip both 'อ' and the next consonant
-                    continue
-            # For other cases, treat 'อ' as vowel if not zero consonant
-            i += 1
-            continue
-        
-        # If it's a consonant, check if there's another vowel after it
-        if char in CONSONANT_CLASSES['mid'] + CONSONANT_CLASSES['high'] + CONSONANT_CLASSES['low']:
-            # Look ahead to see if there's another vowel
-            j = i + 1
-            found_next_vowel = False
-            while j < len(word):
-                next_char = word[j]
-                if (next_char in SIMPLE_VOWELS or is_vowel_symbol(next_char) or 
-                    any(vowel in next_char for vowel in COMPLEX_VOWELS.keys()) or
-                    (next_char == 'อ' and not is_zero_consonant(word, j))):
-                    found_next_vowel = True
-                    break
-                j += 1
-            
-            if found_next_vowel:
-                # Check if this consonant is directly followed by a vowel (start of new syllable)
-                # or if there are consonants in between (final consonant of current syllable)
-                if i + 1 < len(word) and (word[i + 1] in SIMPLE_VOWELS or 
-                    is_vowel_symbol(word[i + 1]) or 
-                    any(vowel in word[i + 1] for vowel in COMPLEX_VOWELS.keys()) or
-                    (word[i + 1] == 'อ' and not is_zero_consonant(word, i + 1))):
-                    # This consonant is directly followed by a vowel, so it starts a new syllable
-                    break
-                else:
-                    # This consonant is followed by other consonants before the next vowel,
-                    # so it's the final consonant of the current syllable
-                    i += 1
-                    break
-            else:
-                # No more vowels, include this consonant as final consonant
-                i += 1
-                break
-        else:
-            # Unknown character, stop here
-            break
-    
-    return i
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, profile_id + '.prof'))
+        with open(os.path.join(PROFILE_DIR, profile_id + '.json'), 'w', encoding='utf-8') as summary_file:
+            json.dump(summary, summary_file, ensure_ascii=False)
+        prune_profiles()
+    except OSError as e:
+        logger.warning("Could not save profile %s: %s", profile_id, e)
+        return None
+    logger.info("Saved profile %s for %s %s (%.1f ms)", profile_id, profile['method'], profile['path'], duration * 1000)
+    return profile_id
 
-def clean_syllable(syllable):
-    """Clean a syllable by removing ์ (thanthakhat) symbols."""
-    # Remove ์ symbols from the end of syllables
-    return syllable.rstrip('์')
+@app.after_request
+def stop_profiling(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    if response.is_streamed:
+        # The work happens while the body is sent, so profile until the server closes the response
+        response.call_on_close(lambda: finish_profiling(profile, response.status_code))
+        response.headers['X-Profile-Id'] = profile['id']
+        return response
+    if finish_profiling(profile, response.status_code) is not None:
+        response.headers['X-Profile-Id'] = profile['id']
+    return response
 
-def improved_syllable_split(word):
-    """Improved syllable splitting using look-back approach."""
-    syllables = []
-    i = 0
-    
-    while i < len(word):
-        # Find where this syllable ends
-        syllable_end = find_syllable_end(word, i)
-        
-        # Prevent infinite loop - if end <= i, advance by 1
-        if syllable_end <= i:
-            syllable_end = i + 1
-        
-        syllable = word[i:syllable_end]
-        
-        # Check if this syllable has implied vowels and needs special handling
-        if has_implied_vowel(syllable):
-            implied_info = get_implied_vowel_info(syllable)
-            if implied_info and implied_info['type'] == 'multi_consonant':
-                # For multi-consonant words, split at the first consonant boundary
-                # e.g., "ผสม" -> ["ผ", "สม"]
-                if len(syllable) >= 3:
-                    first_syllable = syllable[0]
-                    second_syllable = syllable[1:]
-                    syllables.append(clean_syllable(first_syllable))
-                    syllables.append(clean_syllable(second_syllable))
-                    i = syllable_end
-                    continue
-        
-        syllables.append(clean_syllable(syllable))
-        i = syllable_end
-    
-    return syllables if syllables else [word]
-
-def analyze_single_syllable(syllable):
-    """Analyze a single syllable and return its tone and explanation."""
-    if not syllable:
-        return "Unknown", "Empty syllable"
-    
-    # Find the initial consonant (handling vowel symbols)
-    initial_consonant, consonant_pos = find_initial_consonant(syllable)
-    
-    if not initial_consonant:
-        return "Unknown", f"Could not find a consonant in '{syllable}'"
-    
-    consonant_class = get_consonant_class(initial_consonant)
-    
-    # Check for ห (ho hip) leading consonant + low-class sonorant
-    # This changes the tone class to high-class for tone rule purposes
-    is_ho_hip_leading = False
-    
-    # Check for ห at any position followed by a low-class sonorant
-    for i in range(len(syllable) - 1):
-        if syllable[i] == 'ห':
-            next_char = syllable[i + 1]
-            low_sonorants = ['ง', 'ญ', 'น', 'ม', 'ย', 'ร', 'ล', 'ว']
-            if next_char in low_sonorants and consonant_class == 'low':
-                is_ho_hip_leading = True
-                consonant_class = 'high'  # Override to high-class for tone rules
-                break
-    
-    if not consonant_class:
-        # Check if it's an obsolete consonant
-        if initial_consonant == 'ฅ':
-            return "Unknown", f"'{initial_consonant}' (kho khon) is an obsolete Thai consonant that has been replaced by 'ค' (kho khwai) in modern Thai."
-        else:
-            return "Unknown", f"'{initial_consonant}' is not a recognized Thai consonant."
-    
-    # Check for tone marks
-    tone_marks = has_tone_mark(syllable)
-    
-    # Identify vowels
-    vowels = identify_vowels(syllable)
-    vowel_description = get_vowel_description(vowels)
-    
-    
-    # Classify syllable type
-    syllable_type = classify_syllable_type(syllable)
-    
-    # Determine tone based on rules
-    tone = "Unknown"
-    explanation_parts = []
-    
-    if is_ho_hip_leading:
-        explanation_parts.append(f"Initial consonant: '{initial_consonant}' (Class: low class consonant, but ห leading consonant makes it high-class for tone rules)")
-    else:
-        explanation_parts.append(f"Initial consonant: '{initial_consonant}' (Class: {consonant_class})")
-    explanation_parts.append(f"Vowel: {vowel_description}")
-    
-    
-    explanation_parts.append(f"Syllable type: {syllable_type}")
-    
-    if tone_marks:
-        explanation_parts.append(f"Tone marks found: {', '.join(tone_marks)}")
-        
-        # Tone marks override other rules
-        if '่' in tone_marks:  # mai ek
-            if consonant_class == 'mid':
-                tone = "Low Tone"
-                explanation_parts.append("Rule: Mid-class consonant + mai ek (อ่) = Low tone")
-            elif consonant_class == 'high':
-                tone = "Low Tone" 
-                explanation_parts.append("Rule: High-class consonant + mai ek (อ่) = Low tone")
-            elif consonant_class == 'low':
-                tone = "Falling Tone"
-                explanation_parts.append("Rule: Low-class consonant + mai ek (อ่) = Falling tone")
-                
-        elif '้' in tone_marks:  # mai tho
-            if consonant_class == 'mid':
-                tone = "Falling Tone"
-                explanation_parts.append("Rule: Mid-class consonant + mai tho (อ้) = Falling tone")
-            elif consonant_class == 'high':
-                tone = "Falling Tone"
-                explanation_parts.append("Rule: High-class consonant + mai tho (อ้) = Falling tone")
-            elif consonant_class == 'low':
-                tone = "High Tone"
-                explanation_parts.append("Rule: Low-class consonant + mai tho (อ้) = High tone")
-                
-        elif '๊' in tone_marks:  # mai tri
-            tone = "High Tone"
-            explanation_parts.append("Rule: Any consonant + mai tri (อ๊) = High tone")
-            
-        elif '๋' in tone_marks:  # mai chattawa
-            tone = "Rising"
-            explanation_parts.append("Rule: Any consonant + mai chattawa (อ๋) = Rising tone")
-    else:
-        # No tone marks - use default tone rules
-        
-        # Get vowel length for rule explanations
-        vowel_length = "long"  # default
-        if vowels:
-            vowel_length = vowels[0]['info']['type']
-        
-        # Special case: single consonant with implied vowel gets Low tone
-        if len(syllable) == 1 and has_implied_vowel(syllable):
-            tone = "Low Tone"
-            explanation_parts.append("Rule: Single consonant with implied vowel = Low tone")
-        # Special case: วัส pattern gets Low tone (ว + ั + ส with implied vowel after ส)
-        elif syllable == 'วัส':
-            tone = "Low Tone"
-            explanation_parts.append("Rule: วัส pattern (ว + ั + ส with implied vowel) = Low tone")
-        elif consonant_class == 'mid':
-            if syllable_type == 'live':
-                tone = "Mid Tone"
-                explanation_parts.append(f"Rule: Mid-class consonant + live syllable ({vowel_length} vowel) = Mid tone")
-            else:  # dead
-                tone = "Low Tone"
-                explanation_parts.append(f"Rule: Mid-class consonant + dead syllable ({vowel_length} vowel) = Low tone")
-                
-        elif consonant_class == 'high':
-            if syllable_type == 'live':
-                tone = "Rising Tone"
-                explanation_parts.append(f"Rule: High-class consonant + live syllable ({vowel_length} vowel) = Rising tone")
-            else:  # dead
-                tone = "Low Tone"
-                explanation_parts.append(f"Rule: High-class consonant + dead syllable ({vowel_length} vowel) = Low tone")
-                
-        elif consonant_class == 'low':
-            if syllable_type == 'live':
-                tone = "Mid Tone"
-                explanation_parts.append(f"Rule: Low-class consonant + live syllable ({vowel_length} vowel) = Mid tone")
-            else:  # dead
-                if vowel_length == 'short':
-                    tone = "High Tone"
-                    explanation_parts.append("Rule: Low-class consonant + dead syllable (short vowel) = High tone")
-                else:  # long vowel
-                    tone = "Falling Tone"
-                    explanation_parts.append("Rule: Low-class consonant + dead syllable (long vowel) = Falling tone")
-    
-    explanation = " | ".join(explanation_parts)
-    return tone, explanation
+@app.teardown_request
+def stop_profiling_on_error(error=None):
+    # after_request does not run when the view raised
+    profile = g.pop('profile', None)
+    if profile is not None:
+        finish_profiling(profile, 500)
 
-def determine_tone_with_tltk_hybrid(word):
-    """Use tltk for syllable segmentation but our original logic for tone analysis."""
-    if not word:
-        return "No word provided", "Please enter a Thai word."
-    
-    # Clean the word - remove non-Thai characters (keep only Thai characters and spaces)
-    import re
-    thai_pattern = re.compile(r'[\u0E00-\u0E7F\s]')
-    cleaned_word = ''.join(thai_pattern.findall(word)).strip()
-    
-    if not cleaned_word:
-        return "Unknown", "No Thai characters found in the word."
-    
+def load_profile_summary(profile_id):
+    """Return a saved profile's JSON summary, or None."""
     try:
-        # Use tltk for accurate syllable segmentation
-        import tltk.nlp as tltk_nlp
-        reading = tltk_nlp.th2read(cleaned_word)
-        clean_reading = reading.rstrip('-')
-        tltk_syllables = [syl.strip() for syl in clean_reading.split('-') if syl.strip()]
-        
-        if len(tltk_syllables) == 1:
-            # Single syllable - use our original analysis with the original word
-            tone, explanation = analyze_single_syllable(cleaned_word)
-            return tone, explanation
-        else:
-            # Multiple syllables - use tltk syllables but analyze original word segments
-            syllable_analyses = []
-            all_tones = []
-            
-            # For multi-syllable words, we need to map tltk syllables back to original word
-            # For now, use tltk syllables but analyze each as if it were the original word
-            for i, tltk_syllable in enumerate(tltk_syllables):
-                # Use our original analysis for each syllable
-                tone, explanation = analyze_single_syllable(tltk_syllable)
-                syllable_analyses.append({
-                    'syllable': tltk_syllable,
-                    'tone': tone,
-                    'explanation': explanation,
-                    'position': i + 1
-                })
-                all_tones.append(tone)
-            
-            # Create combined explanation
-            combined_explanation = f"Multi-syllable word with {len(tltk_syllables)} syllables: " + " + ".join(all_tones)
-            
-            return "Multi-syllable", combined_explanation, syllable_analyses
-            
-    except Exception as e:
-        print(f"tltk reading failed for '{cleaned_word}': {e}")
-        # Fall back to original method
-        return determine_tone_original(cleaned_word)
-
-def determine_tone_original(word):
-    """Original tone determination method (fallback)."""
-    # Split into syllables
-    syllables = split_into_syllables(word)
-    
-    if len(syllables) == 1:
-        # Single syllable - return as before
-        tone, explanation = analyze_single_syllable(syllables[0])
-        return tone, explanation
-    else:
-        # Multiple syllables - analyze each one
-        syllable_analyses = []
-        all_tones = []
-        
-        for i, syllable in enumerate(syllables):
-            tone, explanation = analyze_single_syllable(syllable)
-            syllable_analyses.append({
-                'syllable': syllable,
-                'tone': tone,
-                'explanation': explanation,
-                'position': i + 1
-            })
-            all_tones.append(tone)
-        
-        # Create combined explanation
-        combined_explanation = f"Multi-syllable word with {len(syllables)} syllables: " + " + ".join(all_tones)
-        
-        return "Multi-syllable", combined_explanation, syllable_analyses
+        with open(os.path.join(PROFILE_DIR, profile_id + '.json'), encoding='utf-8') as summary_file:
+            return json.load(summary_file)
+    except (OSError, ValueError):
+        return None
 
-def determine_tone(word):
-    """Determine the tone(s) of a Thai word based on tone rules."""
-    # Use hybrid tltk method by default
-    return determine_tone_with_tltk_hybrid(word)
+@app.route('/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """List the newest saved profiles (?limit=N, default 20) with their hottest functions."""
+    limit = request.args.get('limit', 20, type=int)
+    profile_ids = saved_profile_ids()
+    profiles = [summary for summary in map(load_profile_summary, profile_ids[:limit]) if summary is not None]
+    return jsonify({
+        'directory': PROFILE_DIR,
+        'sample_rate': PROFILE_SAMPLE_RATE,
+        'count': len(profile_ids),
+        'profiles': profiles
+    })
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def get_profile(profile_id):
+    """Download a saved profile as a pstats file, or ?format=text for a printed report."""
+    path = os.path.join(PROFILE_DIR, profile_id + '.prof')
+    if not PROFILE_ID_PATTERN.fullmatch(profile_id) or not os.path.exists(path):
+        return jsonify({'error': 'Profile not found.'}), 404
+    
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in PROFILE_SORT_KEYS:
+            return jsonify({'error': f"Unknown sort key '{sort}'. Use one of: {', '.join(sorted(PROFILE_SORT_KEYS))}."}), 400
+        report = io.StringIO()
+        stats = pstats.Stats(path, stream=report)
+        stats.sort_stats(sort).print_stats(request.args.get('limit', 40, type=int))
+        return Response(report.getvalue(), mimetype='text/plain')
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=profile_id + '.prof')
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    data = request.get_json()
-    input_word = data.get('word', '').strip()
-    
-    if not input_word:
-        return jsonify({'error': 'Please enter a word.'})
+# Metrics
+# =======
+#
+# Every response is counted and timed by route in the metrics registry (see
+# metrics.py), which GET /metrics serves in the Prometheus text format. For a
+# streamed response the time covers building the response, not sending it.
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        # The route pattern, not the raw path, so unknown URLs cannot create new series
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.http_requests.labels(endpoint, request.method, str(response.status_code)).inc()
+        metrics.http_request_duration.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Serve the metrics in the Prometheus text exposition format."""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+# Response compression
+# ====================
+#
+# JSON responses are compressed with brotli when the client accepts it and
+# the optional Brotli package is installed, else with gzip. Streamed responses
+# and bodies under COMPRESSION_MIN_SIZE bytes are sent as they are. The bytes
+# of a compressed response differ from the plain ones, so its strong ETag
+# gets the coding appended ("<etag>-gzip").
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 500))
+COMPRESSIBLE_MIMETYPES = frozenset(['application/json'])
+# In order of preference
+CONTENT_CODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def compress(data, coding):
+    """Compress a response body with a content coding from CONTENT_CODINGS."""
+    if coding == 'br':
+        # Within a few percent of the best ratio on analysis JSON, at a fiftieth of the time
+        return brotli.compress(data, quality=5)
+    # mtime=0 so a body always compresses to the same bytes, as a strong ETag promises
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+@app.after_request
+def compress_response(response):
+    if not COMPRESSION_ENABLED or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+    coding = request.accept_encodings.best_match(CONTENT_CODINGS)
+    data = response.get_data()
+    if coding is None or len(data) < COMPRESSION_MIN_SIZE:
+        return response
+    
+    response.set_data(compress(data, coding))
+    response.headers['Content-Encoding'] = coding
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(f"{etag}-{coding}")
+    return response
+
+# Server timing
+# =============
+#
+# Handlers that store a StageTimings in g.timings get a Server-Timing header
+# on their response, so browser devtools and access logs show where the time
+# went. /analyze records every stage; clients can also ask for the breakdown
+# in the JSON body.
+
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+
+@app.after_request
+def add_server_timing(response):
+    timings = g.get('timings')
+    if timings is not None and SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = timings.header()
+    return response
+
+def json_response(value, status=200, verbose=False):
+    """Return ``value``, which may hold analysis records, as a JSON response serialized in one pass."""
+    return Response(to_json(value, verbose), status=status, mimetype='application/json')
+
+def flag_requested(data, name, default=False):
+    """Check if the client set option ``name`` (e.g. timings, verbose) in the body or the query string."""
+    requested = data.get(name, request.args.get(name, default))
+    if isinstance(requested, str):
+        requested = requested.lower() in ('1', 'true', 'yes')
+    return bool(requested)
+
+def analyze_input(input_word, timings, translate=True):
+    """Analyze a Thai word, or an English word translated to Thai, for /analyze.
     
+    Returns (analysis, fields), the fields to add to the analysis; when an
+    English word cannot be translated, returns (None, error body) instead.
+    With ``translate`` false a Thai word gets no translation lookup.
+    """
     # Detect input language
     input_language = detect_input_language(input_word)
     
     if input_language == 'english':
-        # Check if we're online for translation
-        try:
-            # Quick connectivity check using Google DNS
-            response = requests.get('https://8.8.8.8', timeout=3)
-            online = True
-        except Exception as e:
-            print(f"Connectivity check failed: {e}")
-            online = False
+        # Words in the offline lexicon need no connection
+        with timings.measure('translation'):
+            thai_word = lookup_lexicon('en-th', input_word)
         
-        if not online:
-            return jsonify({
-                'error': 'Translation requires internet connection. Please enter a Thai word directly or check your internet connection.',
-                'offline_mode': True
-            })
+        # Check if we're online for translation
+        if thai_word is None:
+            with timings.measure('connectivity'):
+                online = is_online()
+            if not online:
+                return None, {
+                    'error': 'Translation requires internet connection. Please enter a Thai word directly or check your internet connection.',
+                    'offline_mode': True
+                }
         
         # Translate English to Thai
-        thai_word = translate_english_to_thai(input_word)
+        if thai_word is None:
+            with timings.measure('translation'):
+                thai_word = translate_english_to_thai(input_word)
         if not thai_word:
-            return jsonify({'error': 'Unable to translate English word to Thai. Please try a different word or enter a Thai word directly.'})
+            return None, {'error': 'Unable to translate English word to Thai. Please try a different word or enter a Thai word directly.'}
         
         # Get English translation (original word)
         english_translation = input_word
@@ -1602,109 +1057,583 @@ def analyze():
         thai_word = input_word
         english_translation = None
     
-    result = determine_tone(thai_word)
-    
-    # Get translation and romanization
+    # The translation lookup is the only network stage, so it runs alongside the analysis;
+    # a profiled request runs every stage in this thread, where the profiler sees it
+    executor = None if is_profiling() else get_stage_executor()
+    translation_future = None
+    translation = None
     if english_translation:
         translation = english_translation
-    else:
-        # Check if we're online for translation
-        try:
-            # Quick connectivity check using Google DNS
-            response = requests.get('https://8.8.8.8', timeout=3)
-            online = True
-        except Exception as e:
-            print(f"Connectivity check failed: {e}")
-            online = False
-        
-        if online:
-            translation = get_translation(thai_word)
+    elif translate:
+        with timings.measure('connectivity'):
+            online = is_online()
+        if online and executor is None:
+            translation = timings.wrap('translation', get_translation)(thai_word)
+        elif online:
+            translation_future = executor.submit(timings.wrap('translation', get_translation), thai_word)
         else:
-            translation = "Translation unavailable (offline)"
+            with timings.measure('translation', 'offline'):
+                translation = lookup_lexicon('th-en', thai_word) or "Translation unavailable (offline)"
+    translation_started = time.monotonic()
     
-    romanized = get_romanization(thai_word)
-    phonetic_ipa = get_phonetic_ipa(thai_word)
-    phonetic_reading = get_phonetic_reading(thai_word)
+    analysis = get_word_analysis(thai_word, executor, timings)
     
-    # Use romanization to help with syllable analysis
-    romanization_analysis = analyze_romanization_for_syllables(thai_word, romanized)
+    if translation_future is not None:
+        remaining = translation_started + TRANSLATION_STAGE_TIMEOUT - time.monotonic()
+        try:
+            translation = translation_future.result(timeout=max(0, remaining))
+        except FutureTimeoutError:
+            logger.warning("Stage 'translation' timed out after %ss", TRANSLATION_STAGE_TIMEOUT)
+            translation = "Translation unavailable (timed out)"
+            timings.add('translation', time.monotonic() - translation_started, 'timed out')
+    
+    fields = {} if translation is None else {'translation': translation}
+    fields['input_language'] = input_language
+    fields['original_input'] = input_word
+    return analysis, fields
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    timings = g.timings = StageTimings()
+    data = request.get_json()
+    input_word = data.get('word', '').strip()
     
-    # Override romanization syllable count with actual syllable count from Thai analysis
-    if len(result) > 2:  # Multi-syllable word
-        romanization_analysis['syllable_count'] = len(result[2])  # result[2] contains syllables
+    if not input_word:
+        return jsonify({'error': 'Please enter a word.'})
     
-    if len(result) == 2:
-        # Single syllable
-        tone, explanation = result
-        
-        
-        response_data = {
-            'word': thai_word,
-            'tone': tone,
-            'explanation': explanation,
-            'is_multi_syllable': False,
-            'translation': translation,
-            'romanized': romanized,
-            'phonetic_ipa': phonetic_ipa,
-            'phonetic_reading': phonetic_reading,
-            'input_language': input_language,
-            'original_input': input_word,
-            'romanization_analysis': romanization_analysis
-        }
-        
-            
-        return jsonify(response_data)
+    analysis, fields = analyze_input(input_word, timings)
+    if analysis is None:
+        return jsonify(fields)
+    if flag_requested(data, 'timings'):
+        fields['timings'] = timings.as_dict()
+    
+    # Explanations are only rendered for clients that ask for them
+    return json_response(analysis.with_fields(**fields), verbose=flag_requested(data, 'verbose'))
+
+# Cacheable analysis
+# ==================
+#
+# GET /analyze?word=... serves the same analysis to browsers, proxies and
+# CDNs. Without a translation, a Thai word's response depends only on the
+# normalized word, the verbose flag and analysis_version(), so its strong
+# ETag is computed from those and a matching If-None-Match is answered with
+# 304 before any analysis runs. Such responses are public for
+# ANALYSIS_MAX_AGE seconds. Responses with a translation depend on the
+# network: they carry an ETag of their body and must be revalidated.
+
+ANALYSIS_MAX_AGE = int(os.environ.get('ANALYSIS_MAX_AGE', 24 * 3600))
+
+def analysis_etag(thai_word, verbose):
+    """Return the strong ETag for the untranslated analysis of a normalized Thai word."""
+    payload = json.dumps({'word': thai_word, 'verbose': verbose, 'version': analysis_version()},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def matching_etag(etag):
+    """Return the variant of ``etag``, plain or compressed, that If-None-Match holds, or None."""
+    for variant in (etag, *(f"{etag}-{coding}" for coding in CONTENT_CODINGS)):
+        if request.if_none_match.contains(variant):
+            return variant
+    return None
+
+def set_analysis_caching(response, etag, public):
+    response.set_etag(etag)
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = ANALYSIS_MAX_AGE
     else:
-        # Multi-syllable
-        tone, explanation, syllable_analyses = result
-        
-        
-        return jsonify({
-            'word': thai_word,
-            'tone': tone,
-            'explanation': explanation,
-            'is_multi_syllable': True,
-            'syllables': syllable_analyses,
-            'translation': translation,
-            'romanized': romanized,
-            'phonetic_ipa': phonetic_ipa,
-            'phonetic_reading': phonetic_reading,
-            'input_language': input_language,
-            'original_input': input_word,
-            'romanization_analysis': romanization_analysis
-        })
+        response.cache_control.no_cache = True
+    return response
 
-def generate_audio(text, voice='th'):
-    """Generate audio for Thai text using gTTS."""
+def not_modified(etag, public):
+    response = set_analysis_caching(Response(status=304), etag, public)
+    # Caches must keep the 304 apart per coding, like the response it stands for
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/analyze', methods=['GET'])
+def analyze_cacheable():
+    """Analyze ?word=... with a strong ETag, conditional requests and Cache-Control.
+    
+    Takes ?verbose=true and ?translate=false like the POST body; timings are
+    only sent in the Server-Timing header, so the body stays the same.
+    """
+    timings = g.timings = StageTimings()
+    input_word = normalize_word(request.args.get('word', ''))
+    if not input_word:
+        return jsonify({'error': 'Please enter a word.'}), 400
+    verbose = flag_requested({}, 'verbose')
+    translate = flag_requested({}, 'translate', default=True)
+    
+    etag = None
+    if not translate and detect_input_language(input_word) == 'thai':
+        etag = analysis_etag(input_word, verbose)
+        cached_etag = matching_etag(etag)
+        if cached_etag is not None:
+            return not_modified(cached_etag, public=True)
+    
+    analysis, fields = analyze_input(input_word, timings, translate)
+    if analysis is None:
+        response = jsonify(fields)
+        response.status_code = 503
+        response.cache_control.no_store = True
+        return response
+    
+    response = json_response(analysis.with_fields(**fields), verbose=verbose)
+    # A partial analysis is not what the ETag stands for; it is retried on the next request
+    if etag is not None and analysis.timed_out_stages is None:
+        return set_analysis_caching(response, etag, public=True)
+    
+    etag = hashlib.sha256(response.get_data()).hexdigest()
+    cached_etag = matching_etag(etag)
+    if cached_etag is not None:
+        return not_modified(cached_etag, public=False)
+    return set_analysis_caching(response, etag, public=False)
+
+# Batch analysis
+# ==============
+#
+# /analyze/batch takes a whole vocabulary list in one call. Duplicate words are
+# analyzed once, the CPU-bound analysis runs on a pool of worker processes, and
+# all translation lookups share a single HTTP session.
+
+BATCH_MAX_WORDS = int(os.environ.get('BATCH_MAX_WORDS', 2000))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+# Batches smaller than this are analyzed in-process; worker IPC would cost more than it saves
+BATCH_INLINE_THRESHOLD = int(os.environ.get('BATCH_INLINE_THRESHOLD', 8))
+
+_batch_executor = None
+
+def get_batch_executor():
+    """Return the shared process pool used for batch analysis, creating it on first use."""
+    global _batch_executor
+    if _batch_executor is None:
+        # spawn rather than fork: the web server is multi-threaded and forking it can deadlock
+        _batch_executor = ProcessPoolExecutor(
+            max_workers=BATCH_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=warm_up_batch_worker
+        )
+    return _batch_executor
+
+def analyze_batch_word(thai_word):
+    """Analyze one batch word, turning failures into an error entry instead of aborting the batch."""
     try:
-        from gtts import gTTS
-        import base64
-        import io
-        import time
-        
-        start_time = time.time()
-        print(f"Starting audio generation for: {text}")
+        return analyze_thai_word(thai_word)
+    except Exception as e:
+        logger.warning("Batch analysis failed for '%s': %s", thai_word, e)
+        return {'word': thai_word, 'error': 'Analysis failed for this word.'}
+
+def iter_batch_analyses(words):
+    """Yield analyses for unique Thai words in the order given.
+
+    Cached words are served directly; only cache misses are sent to the pool.
+    """
+    cached = [analysis_cache.get(normalize_word(word)) for word in words]
+    missing = [normalize_word(word) for word, analysis in zip(words, cached) if analysis is None]
+    
+    if len(missing) < BATCH_INLINE_THRESHOLD or BATCH_WORKERS <= 1:
+        computed = map(analyze_batch_word, missing)
+    else:
+        chunksize = max(1, len(missing) // (BATCH_WORKERS * 4))
+        computed = get_batch_executor().map(analyze_batch_word, missing, chunksize=chunksize)
+    
+    for word, analysis in zip(words, cached):
+        if analysis is None:
+            analysis = next(computed)
+            if isinstance(analysis, WordAnalysis):
+                analysis_cache.put(normalize_word(word), analysis)
+        yield analysis
+
+def iter_batch_results(words, translate=True):
+    """Yield one result per input word, in input order, analyzing each distinct word only once."""
+    unique_words = []
+    unique_index = {}
+    positions = []
+    for word in words:
+        word = word.strip()
+        if word not in unique_index:
+            unique_index[word] = len(unique_words)
+            unique_words.append(word)
+        positions.append(unique_index[word])
+    
+    thai_words = [word for word in unique_words if word and detect_input_language(word) == 'thai']
+    analyses = iter_batch_analyses(thai_words)
+    
+    session = None
+    online = False
+    if translate and thai_words:
+        online = is_online()
+        if online:
+            session = requests.Session()
+    
+    results = []
+    try:
+        for index, position in enumerate(positions):
+            # Pull results from the pool until the one this input word needs is available
+            while position >= len(results):
+                word = unique_words[len(results)]
+                if not word:
+                    result = {'word': word, 'error': 'Please enter a word.'}
+                elif detect_input_language(word) != 'thai':
+                    result = {'word': word, 'error': 'Batch analysis accepts Thai words only.'}
+                else:
+                    result = next(analyses)
+                    if translate:
+                        if online:
+                            translation = get_translation(word, session=session)
+                        else:
+                            translation = lookup_lexicon('th-en', word) or "Translation unavailable (offline)"
+                        result = with_fields(result, translation=translation)
+                results.append(result)
+            
+            yield index, results[position]
+    finally:
+        if session is not None:
+            session.close()
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze a list of Thai words in one call, optionally streaming NDJSON results."""
+    data = request.get_json(silent=True) or {}
+    words = data.get('words')
+    
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        return jsonify({'error': "Please provide 'words' as a list of strings."}), 400
+    if not words:
+        return jsonify({'error': 'Please provide at least one word.'}), 400
+    if len(words) > BATCH_MAX_WORDS:
+        return jsonify({'error': f'Batches are limited to {BATCH_MAX_WORDS} words.'}), 413
+    
+    translate = bool(data.get('translate', True))
+    verbose = bool(data.get('verbose', False))
+    
+    if data.get('stream'):
+        def generate():
+            for index, result in iter_batch_results(words, translate=translate):
+                yield to_json(with_fields(result, index=index), verbose) + b'\n'
         
-        # Create gTTS object with optimized settings
-        tts = gTTS(text=text, lang='th', slow=False, tld='com')
+        return Response(generate(), mimetype='application/x-ndjson')
+    
+    results = [result for _, result in iter_batch_results(words, translate=translate)]
+    return json_response({
+        'results': results,
+        'count': len(results),
+        'unique_count': len(set(word.strip() for word in words))
+    }, verbose=verbose)
+
+# Text analysis
+# =============
+#
+# Sentences and paragraphs are tokenized into words with pythainlp and each
+# Thai word goes through the batch pipeline, so a word repeated in the text is
+# analyzed once and results stream back as soon as they are ready.
+
+TEXT_MAX_CHARS = int(os.environ.get('TEXT_MAX_CHARS', 20000))
+TEXT_TOKENIZER_ENGINE = os.environ.get('TEXT_TOKENIZER_ENGINE', 'newmm')
+
+WORD_CHAR_FLAGS = CHAR_CONSONANT | CHAR_SIMPLE_VOWEL | CHAR_LEADING_VOWEL
+
+def tokenize_text(text):
+    """Split text into (offset, token, is_thai_word) tuples, dropping whitespace."""
+    tokens = []
+    cursor = 0
+    for token in word_tokenize(text, engine=TEXT_TOKENIZER_ENGINE, keep_whitespace=False):
+        token = token.strip()
+        if not token:
+            continue
+        offset = text.find(token, cursor)
+        if offset == -1:
+            offset = cursor
+        else:
+            cursor = offset + len(token)
+        # Punctuation, digits, Latin text and lone marks such as ๆ are passed through unanalyzed
+        is_thai_word = any(char_flags(char) & WORD_CHAR_FLAGS for char in token)
+        tokens.append((offset, token, is_thai_word))
+    return tokens
+
+def iter_text_results(text, translate=True):
+    """Yield one result per token of ``text``, in order; Thai words carry their analysis."""
+    tokens = tokenize_text(text)
+    words = [token for _, token, is_thai_word in tokens if is_thai_word]
+    analyses = iter_batch_results(words, translate=translate)
+    for index, (offset, token, is_thai_word) in enumerate(tokens):
+        if is_thai_word:
+            _, result = next(analyses)
+        else:
+            result = {'skipped': True}
+        yield with_fields(result, index=index, token=token, offset=offset)
+
+@app.route('/analyze/text', methods=['POST'])
+def analyze_text():
+    """Tokenize Thai text into words and analyze each one, streaming NDJSON by default."""
+    data = request.get_json(silent=True) or {}
+    text = data.get('text')
+    
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({'error': 'Please provide some Thai text.'}), 400
+    if len(text) > TEXT_MAX_CHARS:
+        return jsonify({'error': f'Text is limited to {TEXT_MAX_CHARS} characters.'}), 413
+    
+    translate = bool(data.get('translate', True))
+    verbose = bool(data.get('verbose', False))
+    
+    if data.get('stream', True):
+        def generate():
+            for result in iter_text_results(text, translate=translate):
+                yield to_json(result, verbose) + b'\n'
         
-        # Save to bytes buffer
-        audio_buffer = io.BytesIO()
+        return Response(generate(), mimetype='application/x-ndjson')
+    
+    results = list(iter_text_results(text, translate=translate))
+    words = [result['token'] for result in results if not result.get('skipped')]
+    return json_response({
+        'results': results,
+        'count': len(results),
+        'word_count': len(words),
+        'unique_count': len(set(words))
+    }, verbose=verbose)
+
+# Audio cache
+# ===========
+#
+# Synthesized speech is stored on disk as MP3, named by a hash of the text,
+# voice and engine settings, so a word is sent to gTTS once and then replayed
+# from disk. Files are written to a temporary name and renamed into place, so
+# worker processes can share the directory. Reading a file refreshes its
+# mtime, and the least recently used files are evicted beyond the size cap.
+# Each process keeps a running total of the cache size instead of listing the
+# directory on every write; it lists it again only when the total goes over
+# the cap, or after AUDIO_CACHE_RESCAN_INTERVAL seconds to pick up the files
+# other workers wrote.
+
+AUDIO_CACHE_DIR = os.environ.get('AUDIO_CACHE_DIR', os.path.join(CACHE_DIR, 'audio'))
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get('AUDIO_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+AUDIO_CACHE_RESCAN_INTERVAL = float(os.environ.get('AUDIO_CACHE_RESCAN_INTERVAL', 300))
+AUDIO_CACHE_EVICT_TO = 0.9
+# How long browsers and CDNs may reuse audio served by GET /audio, in seconds
+AUDIO_MAX_AGE = int(os.environ.get('AUDIO_MAX_AGE', 7 * 24 * 3600))
+
+# gTTS settings used for synthesis; part of every cache key
+AUDIO_ENGINE_SETTINGS = {'engine': 'gtts', 'lang': 'th', 'slow': False, 'tld': 'com'}
+
+class AudioCache:
+    """Content-addressed MP3 cache on disk with a total size cap and LRU eviction."""
+
+    def __init__(self, directory, max_bytes, rescan_interval):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        # Running totals, from the last directory scan plus this process's writes since
+        self._bytes = 0
+        self._file_count = 0
+        self._scanned_at = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.max_bytes > 0
+
+    @staticmethod
+    def key(text, voice, settings=AUDIO_ENGINE_SETTINGS):
+        """Return the content address for ``text`` spoken with ``voice`` and ``settings``."""
+        payload = json.dumps({'text': text, 'voice': voice, 'settings': settings}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        """Return the file path for ``key`` (sharded by the first two hex digits)."""
+        return os.path.join(self.directory, key[:2], key + '.mp3')
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_path(self, key):
+        """Return the path of the cached file for ``key``, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            self._count('misses')
+            metrics.cache_lookup('audio', False)
+            return None
+        except OSError as e:
+            logger.warning("Audio cache read failed: %s", e)
+            self._count('errors')
+            return None
+        self._count('hits')
+        metrics.cache_lookup('audio', True)
+        return path
+
+    def get(self, key):
+        """Return the cached MP3 bytes for ``key``, or None on a miss."""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as audio_file:
+                return audio_file.read()
+        except OSError as e:
+            # Evicted by another worker between the touch and the read
+            logger.warning("Audio cache read failed: %s", e)
+            self._count('errors')
+            return None
+
+    def put(self, key, data):
+        """Store MP3 bytes under ``key`` atomically and return the file path (None on failure)."""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                # Another worker may have stored the same audio already
+                replaced_size = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced_size = None
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as tmp_file:
+                    tmp_file.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning("Audio cache write failed: %s", e)
+            self._count('errors')
+            return None
+        with self._lock:
+            self.writes += 1
+            self._bytes += len(data) - (replaced_size or 0)
+            self._file_count += replaced_size is None
+            over_cap = self._bytes > self.max_bytes
+        if over_cap or self._scan_due():
+            self.evict()
+        return path
+
+    def _scan_due(self):
+        return self._scanned_at is None or time.monotonic() - self._scanned_at >= self.rescan_interval
+
+    def _files(self):
+        """Return (mtime, size, path) for every cached MP3."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.mp3'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def evict(self):
+        """List the cache, resetting the running totals; over max_bytes, delete the least recently used files."""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        if total > self.max_bytes:
+            # Leave headroom, so a full cache is not listed again on the very next write
+            target = self.max_bytes * AUDIO_CACHE_EVICT_TO
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+        with self._lock:
+            self.evictions += removed
+            self._bytes = total
+            self._file_count = len(files) - removed
+            self._scanned_at = time.monotonic()
+
+    def clear(self):
+        """Delete every cached file."""
+        if not self.enabled:
+            return
+        for _, _, path in self._files():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._bytes = 0
+            self._file_count = 0
+            self._scanned_at = time.monotonic()
+
+    def stats(self):
+        """Return counters for this process and the size on disk as of the last scan and this process's writes."""
+        if self.enabled and self._scan_due():
+            self.evict()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'directory': self.directory,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'errors': self.errors,
+                'files': self._file_count,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, AUDIO_CACHE_RESCAN_INTERVAL)
+
+def synthesize_audio(text):
+    """Synthesize MP3 bytes for Thai text with gTTS."""
+    settings = {name: value for name, value in AUDIO_ENGINE_SETTINGS.items() if name != 'engine'}
+    tts = gTTS(text=text, **settings)
+    audio_buffer = io.BytesIO()
+    with metrics.track_upstream('gtts', 'synthesize'):
         tts.write_to_fp(audio_buffer)
-        audio_buffer.seek(0)
+    return audio_buffer.getvalue()
+
+def get_audio_bytes(text, voice='th'):
+    """Return MP3 bytes for Thai text, from the audio cache or gTTS (None on failure)."""
+    key = AudioCache.key(text, voice)
+    audio = audio_cache.get(key)
+    if audio is not None:
+        return audio
+    
+    try:
+        start_time = time.time()
+        logger.debug("Starting audio generation for: %s", text)
         
-        # Convert to base64
-        audio_base64 = base64.b64encode(audio_buffer.getvalue()).decode('utf-8')
+        audio = synthesize_audio(text)
         
         end_time = time.time()
-        print(f"Audio generation completed in {end_time - start_time:.2f} seconds")
-        print(f"Audio size: {len(audio_base64) / 1024:.1f} KB")
-        
-        return audio_base64
-        
+        logger.info("Audio generation completed in %.2f seconds (%.1f KB)", end_time - start_time, len(audio) / 1024)
     except Exception as e:
-        print(f"Audio generation error: {e}")
+        logger.warning("Audio generation error: %s", e)
         return None
+    
+    audio_cache.put(key, audio)
+    return audio
+
+def generate_audio(text, voice='th'):
+    """Generate base64-encoded MP3 audio for Thai text."""
+    audio = get_audio_bytes(text, voice)
+    if audio is None:
+        return None
+    return base64.b64encode(audio).decode('utf-8')
 
 @app.route('/audio', methods=['POST'])
 def get_audio():
@@ -1715,6 +1644,8 @@ def get_audio():
     
     if not text:
         return jsonify({'error': 'Please provide text to convert to speech.'})
+    if not is_available_voice(voice):
+        return jsonify({'success': False, 'error': f"Unknown voice '{voice}'. See /voices."}), 400
     
     audio_base64 = generate_audio(text, voice)
     
@@ -1730,6 +1661,41 @@ def get_audio():
             'error': 'Failed to generate audio. Please try again.'
         })
 
+@app.route('/audio', methods=['GET'])
+def stream_audio():
+    """Serve MP3 audio for Thai text directly, with ETag, Cache-Control and Range support."""
+    text = request.args.get('text', '').strip()
+    voice = request.args.get('voice', 'th')
+    
+    if not text:
+        return jsonify({'error': 'Please provide text to convert to speech.'}), 400
+    # Unknown voices would each get their own cache entry of the same audio
+    if not is_available_voice(voice):
+        return jsonify({'error': f"Unknown voice '{voice}'. See /voices."}), 400
+    
+    # The cache key already covers text, voice and engine settings, so it doubles as a strong ETag
+    etag = AudioCache.key(text, voice)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = AUDIO_MAX_AGE
+        return response
+    
+    audio = get_audio_bytes(text, voice)
+    if audio is None:
+        return jsonify({'error': 'Failed to generate audio. Please try again.'}), 503
+    
+    response = send_file(
+        io.BytesIO(audio),
+        mimetype='audio/mpeg',
+        conditional=True,
+        etag=etag,
+        max_age=AUDIO_MAX_AGE
+    )
+    response.accept_ranges = 'bytes'
+    return response
+
 @app.route('/voices', methods=['GET'])
 def get_voices():
     """Get available Thai voices."""
@@ -1738,26 +1704,22 @@ def get_voices():
 
 @app.route('/connectivity', methods=['GET'])
 def check_connectivity():
-    """Check internet connectivity."""
-    try:
-        # Test with a more reliable endpoint that works on mobile
-        response = requests.get('https://httpbin.org/status/200', timeout=5)
-        if response.status_code == 200:
-            return jsonify({
-                'online': True,
-                'timestamp': response.headers.get('Date', '')
-            })
-        else:
-            return jsonify({
-                'online': False,
-                'timestamp': ''
-            })
-    except:
-        # Fallback: assume online if we can't check
-        return jsonify({
-            'online': True,
-            'timestamp': ''
-        })
+    """Check internet connectivity (cached state from the connectivity monitor)."""
+    return jsonify(connectivity_monitor.status())
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """Report whether this worker has finished warming up (503 until it has)."""
+    # Servers that import the app without running __main__ start the warm-up here
+    start_warm_up()
+    if not warm_up_state.ready.is_set():
+        return jsonify({'ready': False}), 503
+    return jsonify({
+        'ready': True,
+        'warm_up_seconds': warm_up_state.duration,
+        'timings': warm_up_state.timings,
+        'errors': warm_up_state.errors
+    })
 
 @app.route('/favicon.svg')
 def favicon_svg():
@@ -1773,4 +1735,7 @@ if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 5001))
     debug = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
+    # With the debug reloader, only the child process serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
     app.run(debug=debug, host='0.0.0.0', port=port)
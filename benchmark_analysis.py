@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the analysis core.
+Times the main rule functions over fixed corpora of short, long and
+pathological words, in process and without the web server, and compares
+the results with a saved baseline.
+
+    python benchmark_analysis.py --save         # record a baseline
+    python benchmark_analysis.py                # compare, fail on regressions
+    python benchmark_analysis.py --threshold 10 --function determine_tone
+
+Baselines are specific to the machine and Python version they were
+recorded on; record one before changing the code and compare after.
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+import tone_analysis
+
+BASELINE_PATH = os.environ.get('BENCHMARK_BASELINE') or os.path.join(tone_analysis.CACHE_DIR, 'benchmark_baseline.json')
+
+# Fixed corpora; changing a corpus invalidates its saved baselines
+CORPORA = {
+    # Single syllables across consonant classes, vowel lengths, tone marks and finals
+    'short': [
+        'กา', 'ขา', 'คา', 'ก่า', 'ข่า', 'ค่า', 'ก้า', 'ข้า', 'ค้า', 'ไก่', 'ไข่', 'ม้า',
+        'น้ำ', 'เด็ก', 'มาก', 'นก', 'บิน', 'เสือ', 'เกือก', 'ปลา', 'ครู', 'หมา', 'อยู่', 'ใจ',
+    ],
+    # Multi-syllable words and compounds
+    'long': [
+        'สวัสดี', 'ภาษาไทย', 'โรงเรียน', 'มหาวิทยาลัย', 'กรุงเทพมหานคร', 'ประเทศไทย',
+        'คอมพิวเตอร์', 'สนามบิน', 'โทรศัพท์', 'อร่อย', 'ขอบคุณ', 'ภาพยนตร์',
+    ],
+    # Inputs that stress the scanners: long runs, stacked marks, repeated
+    # complex vowels, mixed scripts and a whole sentence without spaces
+    'pathological': [
+        'เด็กๆเรียนหนังสือที่โรงเรียนใกล้บ้านเมื่อวานนี้เพื่อนของฉันไปตลาด',
+        'ก' * 32,
+        'เกือะ' * 6,
+        'ไม้' * 5,
+        'เ' * 10,
+        'ก่่่่',
+        'ก์์์์์',
+        'ๆๆๆ',
+        'Thaiภาษา123',
+        'abc',
+    ],
+}
+
+FUNCTIONS = [
+    'determine_tone',
+    'split_into_syllables',
+    'improved_syllable_split',
+    'identify_vowels',
+    'classify_syllable_type',
+    'analyze_single_syllable',
+    'analyze_syllable',
+]
+
+def corpus_fingerprint(words):
+    """Return a short hash of a corpus, so a baseline is only compared with the same words."""
+    return hashlib.sha256('\n'.join(words).encode('utf-8')).hexdigest()[:16]
+
+def run_pass(function, words):
+    """Call ``function`` once on every word; errors are part of the workload, not failures."""
+    for word in words:
+        try:
+            function(word)
+        except Exception:
+            pass
+
+def time_function(function, words, repeat, min_time):
+    """Return the best time per call of ``function`` over ``words``, in microseconds.
+
+    Like timeit, the number of passes over the corpus is doubled until one
+    round takes at least ``min_time`` seconds, then the fastest of ``repeat``
+    rounds is kept.
+    """
+    run_pass(function, words)  # warm caches and tltk models
+
+    def round_time(passes):
+        # As in timeit, keep garbage collection out of the measurement
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(passes):
+                run_pass(function, words)
+            return time.perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    passes = 1
+    while True:
+        elapsed = round_time(passes)
+        if elapsed >= min_time:
+            break
+        passes *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, round_time(passes))
+    return best / (passes * len(words)) * 1e6
+
+def run_benchmarks(functions, corpora, repeat, min_time):
+    """Time every function over every corpus and return {name: result}."""
+    results = {}
+    for function_name in functions:
+        function = getattr(tone_analysis, function_name)
+        for corpus in corpora:
+            words = CORPORA[corpus]
+            us_per_call = time_function(function, words, repeat, min_time)
+            results[f"{function_name}/{corpus}"] = {
+                'us_per_call': round(us_per_call, 3),
+                'corpus': corpus_fingerprint(words),
+            }
+            print(f"  {function_name:<26} {corpus:<13} {us_per_call:>12.2f} µs/call", flush=True)
+    return results
+
+def environment():
+    """Describe where the benchmark ran, so mismatched baselines can be flagged."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+    }
+
+def save_baseline(path, results):
+    """Merge ``results`` into the baseline file at ``path``."""
+    baseline = load_baseline(path) or {'results': {}}
+    baseline['environment'] = environment()
+    baseline['recorded'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    baseline['results'].update(results)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+def load_baseline(path):
+    """Return the saved baseline, or None if there is none."""
+    try:
+        with open(path, encoding='utf-8') as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return None
+
+def compare(results, baseline, threshold):
+    """Print each result against the baseline and return the names that regressed."""
+    if baseline.get('environment') != environment():
+        print(f"⚠️ Baseline was recorded on {baseline.get('environment')}, now running on {environment()}")
+
+    print(f"\n{'benchmark':<42} {'µs/call':>12} {'baseline':>12} {'change':>9}")
+    print("-" * 78)
+    regressions = []
+    for name, result in results.items():
+        saved = baseline['results'].get(name)
+        if saved is None:
+            print(f"{name:<42} {result['us_per_call']:>12.2f} {'-':>12} {'new':>9}")
+            continue
+        if saved.get('corpus') != result['corpus']:
+            print(f"{name:<42} {result['us_per_call']:>12.2f} {'-':>12} {'corpus changed':>9}")
+            continue
+        change = (result['us_per_call'] - saved['us_per_call']) / saved['us_per_call'] * 100
+        status = ''
+        if change > threshold:
+            status = '  ❌'
+            regressions.append(name)
+        print(f"{name:<42} {result['us_per_call']:>12.2f} {saved['us_per_call']:>12.2f} {change:>+8.1f}%{status}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the tone analysis core against a saved baseline.')
+    parser.add_argument('--function', choices=FUNCTIONS, action='append', help='function to benchmark (default: all)')
+    parser.add_argument('--corpus', choices=sorted(CORPORA), action='append', help='corpus to run (default: all)')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='baseline file (default: BENCHMARK_BASELINE or .cache/benchmark_baseline.json)')
+    parser.add_argument('--save', action='store_true', help='record the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('BENCHMARK_THRESHOLD', 20)),
+                        help='fail when a benchmark is slower than its baseline by more than this percentage')
+    parser.add_argument('--repeat', type=int, default=5, help='timing rounds per benchmark (best is kept)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds per timing round')
+    args = parser.parse_args()
+
+    functions = args.function or FUNCTIONS
+    corpora = args.corpus or list(CORPORA)
+    print(f"Benchmarking {len(functions)} functions over {len(corpora)} corpora")
+    results = run_benchmarks(functions, corpora, args.repeat, args.min_time)
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"✅ Saved {len(results)} baselines to {args.baseline}")
+        sys.exit(0)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"❌ No baseline at {args.baseline}; record one with --save")
+        sys.exit(1)
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmarks regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n✅ No benchmark regressed by more than {args.threshold:g}%")
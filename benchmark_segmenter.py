@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the syllable segmenter.
+Times improved_syllable_split on inputs of doubling length, from a single
+phrase up to several paragraphs, and reports how the time per character
+changes. A linear segmenter keeps the time per character roughly flat.
+"""
+
+import argparse
+import sys
+import time
+
+from tone_analysis import improved_syllable_split
+
+# Sample texts, repeated to build inputs of any length
+SAMPLE_TEXTS = {
+    # Everyday Thai with leading vowels, complex vowels, clusters and tone marks, one sentence per line
+    'paragraph': (
+        'ภาษาไทยเป็นภาษาที่มีวรรณยุกต์\n'
+        'เด็กๆเรียนหนังสือที่โรงเรียนใกล้บ้าน\n'
+        'เมื่อวานนี้เพื่อนของฉันไปตลาดเพื่อซื้อผลไม้และขนมหวาน\n'
+        'แม่ครัวทำอาหารอร่อยมากเพราะใช้เครื่องปรุงที่สดใหม่\n'
+    ),
+    # Only simple vowels, so every position is scanned without a complex vowel jump
+    'plain': 'นกบินมาหาอาหารกินที่นาข้าวของชาวนา ',
+}
+
+def build_input(sample, length):
+    """Repeat a sample text until it is ``length`` characters long."""
+    text = SAMPLE_TEXTS[sample]
+    repeats = length // len(text) + 1
+    return (text * repeats)[:length]
+
+def time_split(text, repeat):
+    """Return the best of ``repeat`` timings of improved_syllable_split(text), in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        improved_syllable_split(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_benchmark(sample, min_length, max_length, repeat):
+    """Time the segmenter at doubling input lengths and print the results."""
+    print(f"\nSample: {sample}")
+    print(f"{'chars':>8} {'time (ms)':>12} {'µs/char':>10} {'x prev':>8}")
+    print("-" * 42)
+
+    results = []
+    length = min_length
+    previous = None
+    while length <= max_length:
+        elapsed = time_split(build_input(sample, length), repeat)
+        growth = f"{elapsed / previous:.2f}" if previous else '-'
+        print(f"{length:>8} {elapsed * 1000:>12.2f} {elapsed / length * 1e6:>10.2f} {growth:>8}")
+        results.append((length, elapsed))
+        previous = elapsed
+        length *= 2
+
+    # Compare time per character at the largest and smallest sizes
+    (first_length, first_time), (last_length, last_time) = results[0], results[-1]
+    scaling = (last_time / last_length) / (first_time / first_length)
+    print(f"Time per character grew {scaling:.2f}x from {first_length} to {last_length} characters")
+    return scaling
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark syllable segmentation scaling.')
+    parser.add_argument('--sample', choices=sorted(SAMPLE_TEXTS), action='append',
+                        help='sample text to benchmark (default: all)')
+    parser.add_argument('--min-length', type=int, default=50, help='shortest input, in characters')
+    parser.add_argument('--max-length', type=int, default=12800, help='longest input, in characters')
+    parser.add_argument('--repeat', type=int, default=3, help='timings per size (best is reported)')
+    parser.add_argument('--max-scaling', type=float, default=None,
+                        help='exit with an error if time per character grows more than this factor')
+    args = parser.parse_args()
+
+    failed = False
+    for sample in args.sample or sorted(SAMPLE_TEXTS):
+        scaling = run_benchmark(sample, args.min_length, args.max_length, args.repeat)
+        if args.max_scaling is not None and scaling > args.max_scaling:
+            print(f"❌ Segmentation of '{sample}' is not scaling linearly (limit {args.max_scaling:.2f}x)")
+            failed = True
+    sys.exit(1 if failed else 0)
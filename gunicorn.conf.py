@@ -0,0 +1,80 @@
+"""
+Gunicorn configuration for production.
+The app is imported and warmed up (tltk, the pythainlp romanizer, the rule
+tables, the tone table and the offline lexicon) once in the master process,
+then forked, so workers share those pages copy-on-write instead of each
+loading its own copy. Every worker logs its memory use when it boots.
+
+    gunicorn app:app                      # picks up this file automatically
+    WEB_CONCURRENCY=4 gunicorn app:app
+"""
+
+import gc
+import multiprocessing
+import os
+import resource
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threads let a worker keep analyzing while other requests wait on MyMemory or gTTS
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+preload_app = True
+accesslog = '-'
+
+def process_memory(pid='self'):
+    """Return a process's memory in MB: rss, and on Linux pss, shared and private."""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as smaps:
+            for line in smaps:
+                name, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    memory[name] = int(value.split()[0]) / 1024
+    except OSError:
+        # No /proc (e.g. macOS): only the peak RSS of this process is available
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': round(peak / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024), 1)}
+    return {
+        'rss': round(memory.get('Rss', 0), 1),
+        'pss': round(memory.get('Pss', 0), 1),
+        'shared': round(memory.get('Shared_Clean', 0) + memory.get('Shared_Dirty', 0), 1),
+        'private': round(memory.get('Private_Clean', 0) + memory.get('Private_Dirty', 0), 1)
+    }
+
+def format_memory(memory):
+    return ', '.join(f"{name} {value:.1f} MB" for name, value in memory.items())
+
+def on_starting(server):
+    """Warm up in the master, after the app is preloaded and before any worker forks."""
+    import app
+    import metrics
+
+    # Values left by workers of a previous run would be added to this run's totals
+    if metrics.MULTIPROC_DIR:
+        for name in os.listdir(metrics.MULTIPROC_DIR):
+            path = os.path.join(metrics.MULTIPROC_DIR, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+
+    # Workers inherit the finished warm-up, so they report ready at once
+    if app.WARM_UP_ENABLED:
+        app.run_warm_up()
+    else:
+        app.start_warm_up()
+    # Move everything loaded so far out of the collector's reach; otherwise the
+    # first collection in each worker writes to every object and unshares its page
+    gc.freeze()
+    server.log.info("Master warmed up (%s), forking %d workers", format_memory(process_memory()), workers)
+
+def post_worker_init(worker):
+    worker.log.info("Worker %d booted: %s", worker.pid, format_memory(process_memory()))
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Offline Thai-English lexicon.
+Word lists in data/lexicon/*.tsv are compiled into one binary file of
+sorted records that workers memory-map and search in place, so lookups
+need no network call and no per-process copy of the word list.
+
+    python lexicon.py                 # compile data/lexicon/*.tsv
+    python lexicon.py -o lexicon.bin  # choose the output file
+    python lexicon.py --lookup th-en สวัสดี
+
+File layout (little-endian):
+
+    magic       8 bytes  b'THLEX001'
+    sections    u32      number of directions
+    directory   per direction: 8-byte name, u32 record count, u32 index offset
+    index       per direction: u32 record offsets, sorted by key bytes
+    records     u16 key length, u16 value length, key, value (UTF-8)
+"""
+
+import argparse
+import glob
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import unicodedata
+
+MAGIC = b'THLEX001'
+DIRECTIONS = ('th-en', 'en-th')
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'lexicon')
+
+_HEADER = struct.Struct('<8sI')
+_SECTION = struct.Struct('<8sII')
+_OFFSET = struct.Struct('<I')
+_RECORD = struct.Struct('<HH')
+
+class LexiconError(Exception):
+    """Raised for a missing, malformed or unreadable lexicon file."""
+
+def normalize_key(direction, text):
+    """Return the lookup key for ``text``: NFC and stripped, lowercased for English."""
+    key = unicodedata.normalize('NFC', text).strip()
+    if direction == 'en-th':
+        key = key.lower()
+    return key
+
+def source_files(source_dir=SOURCE_DIR):
+    """Return the word list files in ``source_dir``, in build order."""
+    return sorted(glob.glob(os.path.join(source_dir, '*.tsv')))
+
+def read_sources(paths):
+    """Read word lists into {direction: {key: value}}.
+
+    Each file is named after its direction (``th-en.tsv``, or e.g.
+    ``th-en.extra.tsv``) and holds ``source<TAB>target`` lines; blank lines and
+    ``#`` comments are skipped. Later entries override earlier ones.
+    """
+    entries = {direction: {} for direction in DIRECTIONS}
+    for path in paths:
+        direction = os.path.basename(path).split('.')[0]
+        if direction not in entries:
+            raise LexiconError(f"{path}: file name must start with one of {', '.join(DIRECTIONS)}")
+        with open(path, encoding='utf-8') as source:
+            for line_number, line in enumerate(source, 1):
+                line = line.rstrip('\n')
+                if not line.strip() or line.lstrip().startswith('#'):
+                    continue
+                parts = line.split('\t')
+                if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+                    raise LexiconError(f"{path}:{line_number}: expected 'source<TAB>target'")
+                entries[direction][normalize_key(direction, parts[0])] = parts[1].strip()
+    return entries
+
+def compile_lexicon(paths, output):
+    """Compile word lists into a lexicon file at ``output`` and return the entry counts.
+
+    The file is written to a temporary name and renamed into place, so
+    workers that have the previous version mapped keep reading it safely.
+    """
+    entries = read_sources(paths)
+
+    sections = []
+    records = bytearray()
+    for direction in DIRECTIONS:
+        offsets = []
+        for key, value in sorted((k.encode('utf-8'), v.encode('utf-8')) for k, v in entries[direction].items()):
+            if len(key) > 0xFFFF or len(value) > 0xFFFF:
+                raise LexiconError(f"{direction} entry too long: {key[:40]!r}")
+            offsets.append(len(records))
+            records += _RECORD.pack(len(key), len(value)) + key + value
+        sections.append((direction, offsets))
+
+    # Record offsets are stored relative to the file start, after every index
+    index_start = _HEADER.size + _SECTION.size * len(sections)
+    records_start = index_start + sum(_OFFSET.size * len(offsets) for _, offsets in sections)
+
+    header = bytearray(_HEADER.pack(MAGIC, len(sections)))
+    indexes = bytearray()
+    for direction, offsets in sections:
+        header += _SECTION.pack(direction.encode('ascii'), len(offsets), index_start + len(indexes))
+        for offset in offsets:
+            indexes += _OFFSET.pack(records_start + offset)
+
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(header + indexes + records)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return {direction: len(offsets) for direction, offsets in sections}
+
+def is_stale(output, paths):
+    """Check if ``output`` is missing or older than any of the word lists."""
+    try:
+        built = os.path.getmtime(output)
+    except OSError:
+        return True
+    return any(os.path.getmtime(path) > built for path in paths)
+
+class Lexicon:
+    """Read-only view of a compiled lexicon file, searched in place through mmap."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'rb') as lexicon_file:
+                self._map = mmap.mmap(lexicon_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise LexiconError(f"Cannot open lexicon {path}: {e}")
+
+        if len(self._map) < _HEADER.size:
+            raise LexiconError(f"{path} is not a lexicon file")
+        magic, section_count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise LexiconError(f"{path} is not a lexicon file")
+
+        self._sections = {}
+        for i in range(section_count):
+            name, count, index_offset = _SECTION.unpack_from(self._map, _HEADER.size + i * _SECTION.size)
+            self._sections[name.rstrip(b'\0').decode('ascii')] = (count, index_offset)
+
+    def __len__(self):
+        return sum(count for count, _ in self._sections.values())
+
+    def count(self, direction):
+        """Return the number of entries for ``direction``."""
+        return self._sections.get(direction, (0, 0))[0]
+
+    def _key_at(self, index_offset, i):
+        record = _OFFSET.unpack_from(self._map, index_offset + i * _OFFSET.size)[0]
+        key_length, value_length = _RECORD.unpack_from(self._map, record)
+        key_start = record + _RECORD.size
+        return self._map[key_start:key_start + key_length], key_start + key_length, value_length
+
+    def lookup(self, direction, text):
+        """Return the translation of ``text`` in ``direction``, or None."""
+        section = self._sections.get(direction)
+        if section is None:
+            return None
+        count, index_offset = section
+        key = normalize_key(direction, text).encode('utf-8')
+
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            found, value_start, value_length = self._key_at(index_offset, middle)
+            if found == key:
+                return self._map[value_start:value_start + value_length].decode('utf-8')
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self):
+        self._map.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile the offline Thai-English lexicon.')
+    parser.add_argument('sources', nargs='*', help='word list files (default: data/lexicon/*.tsv)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='compiled lexicon file (default: LEXICON_PATH or .cache/lexicon.bin)')
+    parser.add_argument('--lookup', nargs=2, metavar=('DIRECTION', 'WORD'),
+                        help='look a word up in the compiled lexicon instead of building it')
+    args = parser.parse_args()
+
+    output = args.output or os.environ.get('LEXICON_PATH') or os.path.join(
+        os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')),
+        'lexicon.bin'
+    )
+
+    try:
+        if args.lookup:
+            direction, word = args.lookup
+            translation = Lexicon(output).lookup(direction, word)
+            print(translation if translation is not None else f"'{word}' is not in the lexicon")
+            sys.exit(0 if translation is not None else 1)
+
+        paths = args.sources or source_files()
+        counts = compile_lexicon(paths, output)
+        print(f"✅ Compiled {len(paths)} word lists into {output}")
+        for direction, count in counts.items():
+            print(f"   {direction}: {count} entries")
+    except LexiconError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,104 @@
+"""
+Prometheus metrics for the analyzer.
+Request rates and latencies per endpoint, tltk call durations, MyMemory and
+gTTS latencies and errors, and cache hit rates, served in the Prometheus
+text format by GET /metrics.
+
+Under a preforking server every worker process keeps its own values. Set
+PROMETHEUS_MULTIPROC_DIR to an empty directory before the server starts
+and each process writes its metrics there, so /metrics reports the sum over
+all workers whichever one answers. The directory must be emptied between
+server runs and mark_process_dead() called when a worker exits;
+gunicorn.conf.py does both.
+"""
+
+import contextlib
+import os
+import time
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+if MULTIPROC_DIR:
+    # prometheus_client picks its storage when imported, and needs the directory to exist
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Buckets for in-process work (tltk) and for network calls, in seconds
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+NETWORK_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+http_requests = Counter(
+    'thai_tone_http_requests_total', 'HTTP requests handled, by route, method and status',
+    ['endpoint', 'method', 'status']
+)
+http_request_duration = Histogram(
+    'thai_tone_http_request_duration_seconds', 'Time to build the HTTP response, by route and method',
+    ['endpoint', 'method'], buckets=NETWORK_BUCKETS
+)
+tltk_call_duration = Histogram(
+    'thai_tone_tltk_call_duration_seconds', 'Duration of tltk calls, by tltk function',
+    ['function'], buckets=FAST_BUCKETS
+)
+tltk_errors = Counter('thai_tone_tltk_errors_total', 'tltk calls that raised, by tltk function', ['function'])
+upstream_request_duration = Histogram(
+    'thai_tone_upstream_request_duration_seconds', 'Duration of calls to external services (MyMemory, gTTS)',
+    ['service', 'operation'], buckets=NETWORK_BUCKETS
+)
+upstream_errors = Counter(
+    'thai_tone_upstream_errors_total', 'Failed calls to external services, by reason',
+    ['service', 'operation', 'reason']
+)
+cache_lookups = Counter(
+    'thai_tone_cache_lookups_total', 'Cache and offline lexicon lookups, by cache and hit or miss',
+    ['cache', 'result']
+)
+romanizations = Counter(
+    'thai_tone_romanizations_total', 'Romanizations by the engine that produced them', ['engine']
+)
+
+@contextlib.contextmanager
+def track_tltk(function):
+    """Time a tltk call, counting it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        tltk_errors.labels(function).inc()
+        raise
+    finally:
+        tltk_call_duration.labels(function).observe(time.perf_counter() - start)
+
+@contextlib.contextmanager
+def track_upstream(service, operation):
+    """Time a call to an external service, counting an exception as an error."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_errors.labels(service, operation, type(e).__name__).inc()
+        raise
+    finally:
+        upstream_request_duration.labels(service, operation).observe(time.perf_counter() - start)
+
+def upstream_error(service, operation, reason):
+    """Count a failed call that did not raise, e.g. an HTTP error status."""
+    upstream_errors.labels(service, operation, reason).inc()
+
+def cache_lookup(cache, hit):
+    """Count a cache lookup as a hit or a miss."""
+    cache_lookups.labels(cache, 'hit' if hit else 'miss').inc()
+
+def render():
+    """Return (body, content type) with the current metrics in the Prometheus text format."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid):
+    """Drop a finished worker's live values (call from the server's worker-exit hook)."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
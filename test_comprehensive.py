@@ -13,7 +13,7 @@ def test_word(word, expected_tone=None):
         response = requests.post(
             'http://localhost:5001/analyze',
             headers={'Content-Type': 'application/json'},
-            json={'word': word},
+            json={'word': word, 'verbose': True},
             timeout=5
         )
         
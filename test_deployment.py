@@ -46,6 +46,9 @@ def test_app():
             response = client.post('/analyze', json={'word': 'มา'})
             if response.status_code == 200:
                 data = response.get_json()
+                if data.get('timed_out_stages'):
+                    print(f"   ❌ Thai word analysis timed out: {data['timed_out_stages']}")
+                    return False
                 if 'tone' in data:
                     print("   ✅ Thai word analysis works")
                 else:
@@ -96,6 +99,62 @@ def test_app():
         print(f"   ❌ Connectivity check test failed: {e}")
         return False
     
+    # Test 6: Batch analysis
+    print("6. Testing batch analysis...")
+    try:
+        with app.test_client() as client:
+            response = client.post('/analyze/batch', json={'words': ['มา', 'กา', 'มา'], 'translate': False})
+            if response.status_code == 200:
+                data = response.get_json()
+                words = [result.get('word') for result in data.get('results', [])]
+                if words == ['มา', 'กา', 'มา'] and all('tone' in result for result in data['results']):
+                    print("   ✅ Batch analysis works")
+                else:
+                    print("   ❌ Batch analysis returned unexpected results")
+                    return False
+            else:
+                print(f"   ❌ Batch analysis failed: {response.status_code}")
+                return False
+    except Exception as e:
+        print(f"   ❌ Batch analysis test failed: {e}")
+        return False
+
+    # Test 7: Cacheable analysis
+    print("7. Testing cacheable analysis...")
+    try:
+        with app.test_client() as client:
+            response = client.get('/analyze?word=มา&translate=false')
+            etag = response.headers.get('ETag')
+            if response.status_code != 200 or not etag or response.get_json().get('word') != 'มา':
+                print(f"   ❌ GET /analyze failed: {response.status_code}")
+                return False
+            response = client.get('/analyze?word=มา&translate=false', headers={'If-None-Match': etag})
+            if response.status_code == 304:
+                print("   ✅ Cacheable analysis works")
+            else:
+                print(f"   ❌ Conditional GET /analyze returned {response.status_code}, expected 304")
+                return False
+    except Exception as e:
+        print(f"   ❌ Cacheable analysis test failed: {e}")
+        return False
+
+    # Test 8: tltk normalization tables
+    print("8. Testing tltk normalization tables...")
+    try:
+        import tltk.nlp as tltk_nlp
+        from pythainlp.transliterate import romanize
+        from tone_analysis import WordAnalysisContext
+        for word in ['มา', 'สวัสดี', 'ภาษาไทย', 'เหนื่อย', 'การปฏิสัมพันธ์', 'น้ำ', 'ขอบคุณครับ']:
+            context = WordAnalysisContext(word)
+            expected = (tltk_nlp.th2read(word), tltk_nlp.th2ipa(word), romanize(word, engine='tltk'))
+            if (context.reading, context.ipa, context.romanization) != expected:
+                print(f"   ❌ Reading, IPA or romanization of {word} differs from tltk's")
+                return False
+        print("   ✅ tltk normalization tables match tltk")
+    except Exception as e:
+        print(f"   ❌ tltk normalization test failed: {e}")
+        return False
+
     print("\n🎉 All tests passed! App is ready for deployment.")
     return True
 
@@ -13,7 +13,7 @@ def test_word(word):
         response = requests.post(
             'http://localhost:5001/analyze',
             headers={'Content-Type': 'application/json'},
-            json={'word': word},
+            json={'word': word, 'verbose': True},
             timeout=5
         )
         
@@ -64,7 +64,7 @@ def test_word(word: str, expected_tone: str = None) -> Dict[str, Any]:
         response = requests.post(
             'http://localhost:5001/analyze',
             headers={'Content-Type': 'application/json'},
-            json={'word': word},
+            json={'word': word, 'verbose': True},
             timeout=10
         )
         
@@ -0,0 +1,2338 @@
+#!/usr/bin/env python3
+"""
+Thai tone analysis core.
+Rule tables, syllable splitting, tone determination, the tltk-backed
+romanization, IPA and reading, and the analysis cache. Results are the
+slotted records of analysis_records.py. Nothing here depends on Flask, so
+command-line tools, worker processes and app.py import what they need from
+it directly.
+"""
+
+from pythainlp.transliterate import romanize
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import atexit
+import bisect
+import contextlib
+import functools
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+
+import analysis_records
+import metrics
+import tone_table
+from analysis_records import (
+    Record, RomanizationAnalysis, ToneResult, Vowel, VowelPositioning, WordAnalysis, to_json
+)
+
+logger = logging.getLogger(__name__)
+
+# Generated caches and data recorded at runtime live here
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+# Thai Tone Rules and Special Characters
+# =====================================
+# 
+# ห Rule (ห leading consonant):
+# When ห (ho hip) is followed by a low-class sonorant consonant (ง, ญ, น, ม, ย, ร, ล, ว),
+# the syllable is treated as having a high-class consonant for tone rule purposes.
+# Example: เหนื่อย (tired) - ห + น makes it behave like high-class consonant
+#
+# ์ Rule (thanthakhat - silent consonant marker):
+# The ์ symbol (thanthakhat) indicates that the preceding consonant is not pronounced.
+# This is commonly used in Sanskrit/Pali loanwords and affects syllable structure.
+# Example: การปฏิสัมพันธ์ (interaction) - the ์ at the end makes ธ silent
+#
+# These rules are important for accurate tone analysis and syllable splitting.
+
+# Normalization tables applied by tltk 1.9.1 when it turns a g2p transcription
+# into IPA (th2ipa) and romanization (th2roman). With any other tltk version
+# the context calls tltk's own functions instead (see WordAnalysisContext).
+TLTK_TABLES_VERSION = '1.9.1'
+TLTK_IPA_NORMALIZATION = [('O', '\u1D10'), ('x', '\u025B'), ('@', '\u0264'), ('N', '\u014B'), ('?', '\u0294'), ('U', '\u026F'), ('|', ' '), ('~', '.'), ('^', '.'), ("'", '.'), ('4', '5'), ('3', '4'), ('2', '3'), ('1', '2'), ('0', '1')]
+TLTK_ROMAN_NORMALIZATION = [('O', 'o'), ('x', 'ae'), ('@', 'oe'), ('N', 'ng'), ('U', 'ue'), ('aw', 'ao'), ('iw', 'io'), ('ew', 'eo'), ('?', ''), ('|', ' '), ('~', '-'), ('^', '-'), ("'", '-')]
+
+def tltk_transcriptions(g2p_output):
+    """Yield the transcription of each segment in a tltk g2p() result."""
+    for segment in g2p_output.split('<s/>'):
+        if segment == '':
+            continue
+        _, transcription = segment.split('<tr/>')
+        yield transcription
+
+def tltk_tables_current():
+    """Whether the installed tltk is the version the normalization tables were copied from."""
+    try:
+        installed = importlib.metadata.version('tltk')
+    except importlib.metadata.PackageNotFoundError:
+        return False
+    if installed != TLTK_TABLES_VERSION:
+        logger.warning("tltk %s is installed but the normalization tables match tltk %s; "
+                       "using tltk's own th2read, th2ipa and romanization", installed, TLTK_TABLES_VERSION)
+        return False
+    return True
+
+TLTK_TABLES_CURRENT = tltk_tables_current()
+
+# Set once a tltk call has returned in this process. The first call loads
+# tltk's models, which can take longer than any stage deadline.
+tltk_loaded = threading.Event()
+
+@contextlib.contextmanager
+def calling_tltk(function):
+    """Track a tltk call that may load its models, marking tltk loaded once it returns."""
+    try:
+        with metrics.track_tltk(function):
+            yield
+    finally:
+        tltk_loaded.set()
+
+class WordAnalysisContext:
+    """Per-word cache of tltk output shared by every analysis stage.
+
+    tltk's th2read, th2ipa and th2roman each run the expensive g2p() step on
+    their input. The context runs g2p() once and derives the reading, IPA and
+    romanization from it the same way tltk does, each on first access. A
+    failure is cached too and re-raised on every access, so a word tltk
+    cannot handle is not retried by later stages. If the installed tltk is
+    not the version the normalization tables came from, the values come from
+    tltk's own functions instead.
+    """
+
+    def __init__(self, word):
+        self.word = word
+        self._values = {}
+        # Stages share a context across threads; one lock per value, so stages
+        # only wait for the values they use (usually just g2p)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _get(self, name, compute):
+        if name not in self._values:
+            with self._locks_lock:
+                lock = self._locks.setdefault(name, threading.Lock())
+            with lock:
+                if name not in self._values:
+                    try:
+                        self._values[name] = (compute(), None)
+                    except Exception as e:
+                        self._values[name] = (None, e)
+        value, error = self._values[name]
+        if error is not None:
+            raise error
+        return value
+
+    @property
+    def g2p(self):
+        """Raw tltk g2p() output for the word."""
+        def compute():
+            import tltk.nlp as tltk_nlp
+            with calling_tltk('g2p'):
+                return tltk_nlp.g2p(self.word)
+        return self._get('g2p', compute)
+
+    @property
+    def reading(self):
+        """Same as tltk.nlp.th2read(word): syllables spelled in Thai, each followed by '-'."""
+        def compute():
+            import tltk.nlp as tltk_nlp
+            if not TLTK_TABLES_CURRENT:
+                with calling_tltk('th2read'):
+                    return tltk_nlp.th2read(self.word)
+            transcriptions = list(tltk_transcriptions(self.g2p))
+            reading = ''
+            with metrics.track_tltk('PhoneToThai'):
+                for transcription in transcriptions:
+                    for syllable in re.split(r"~|\||\^|'", transcription):
+                        if syllable != '':
+                            reading += tltk_nlp.PhoneToThai(syllable) + '-'
+            return reading
+        return self._get('reading', compute)
+
+    @property
+    def reading_syllables(self):
+        """Syllables of the tltk reading."""
+        def compute():
+            clean_reading = self.reading.rstrip('-')
+            return [syl.strip() for syl in clean_reading.split('-') if syl.strip()]
+        return self._get('reading_syllables', compute)
+
+    @property
+    def ipa(self):
+        """Same as tltk.nlp.th2ipa(word)."""
+        def compute():
+            if not TLTK_TABLES_CURRENT:
+                import tltk.nlp as tltk_nlp
+                with calling_tltk('th2ipa'):
+                    return tltk_nlp.th2ipa(self.word)
+            ipa = ''
+            for transcription in tltk_transcriptions(self.g2p):
+                transcription = re.sub(r"([aeiouUxO@])\1", r"\1ː", transcription)
+                transcription = re.sub(r"([ptkc])h", r"\1ʰ", transcription)
+                for old, new in TLTK_IPA_NORMALIZATION:
+                    transcription = transcription.replace(old, new)
+                ipa += transcription + '<s/>'
+            return ipa
+        return self._get('ipa', compute)
+
+    @property
+    def romanization(self):
+        """Same as pythainlp's romanize(word, engine='tltk')."""
+        def compute():
+            if not self.word:
+                return ''
+            if ' ' in self.word or not TLTK_TABLES_CURRENT:
+                # pythainlp romanizes each space-separated part on its own
+                with calling_tltk('romanize'):
+                    return romanize(self.word, engine='tltk')
+            roman = ''
+            for transcription in tltk_transcriptions(self.g2p):
+                transcription = re.sub(r"([aeiouUxO@])\1", r"\1", transcription)
+                transcription = re.sub(r"[0-9]", r"", transcription)
+                for old, new in TLTK_ROMAN_NORMALIZATION:
+                    transcription = transcription.replace(old, new)
+                transcription = re.sub(r"([aeiou])j", r"\1i", transcription)
+                transcription = transcription.replace('j', 'y')
+                transcription = re.sub(r"c([^h])", r"ch\1", transcription)
+                transcription = re.sub(r"\-([^aeiou])", r"\1", transcription)
+                roman += transcription + '<s/>'
+            return roman[: roman.rfind(" <s/>")].replace("<s/>", "")
+        return self._get('romanization', compute)
+
+def get_analysis_context(word, context=None):
+    """Return ``context`` if it was built for ``word``, otherwise a fresh context."""
+    if context is not None and context.word == word:
+        return context
+    return WordAnalysisContext(word)
+
+def get_romanization(thai_word, context=None):
+    """Get romanized version of Thai word."""
+    try:
+        romanized = get_analysis_context(thai_word, context).romanization
+        metrics.romanizations.labels('tltk').inc()
+        return romanized
+    except Exception as e:
+        logger.warning("Error romanizing with tltk '%s': %s", thai_word, e)
+        # Fallback to royin engine
+        try:
+            romanized = romanize(thai_word, engine='royin')
+            metrics.romanizations.labels('royin').inc()
+            return romanized
+        except Exception as e2:
+            logger.warning("Error romanizing with royin '%s': %s", thai_word, e2)
+            metrics.romanizations.labels('failed').inc()
+            return "Unable to romanize"
+
+def get_phonetic_ipa(thai_word, context=None):
+    """Get IPA (International Phonetic Alphabet) representation of Thai word."""
+    try:
+        ipa = get_analysis_context(thai_word, context).ipa
+        # Clean up the output (remove <s/> tags)
+        return ipa.replace('<s/>', '').strip()
+    except Exception as e:
+        logger.warning("Error generating IPA for '%s': %s", thai_word, e)
+        return "Unable to generate IPA"
+
+def get_phonetic_reading(thai_word, context=None):
+    """Get reading pronunciation with syllable breaks."""
+    try:
+        reading = get_analysis_context(thai_word, context).reading
+        # Clean up the output (remove trailing hyphens)
+        return reading.rstrip('-')
+    except Exception as e:
+        logger.warning("Error generating reading for '%s': %s", thai_word, e)
+        return "Unable to generate reading"
+
+def detect_input_language(text):
+    """Detect if input is Thai or English."""
+    # Check if text contains Thai characters
+    thai_pattern = re.compile(r'[\u0E00-\u0E7F]')
+    if thai_pattern.search(text):
+        return 'thai'
+    else:
+        return 'english'
+
+# Thai consonant classes
+CONSONANT_CLASSES = {
+    'mid': ['ก', 'จ', 'ด', 'ต', 'ฏ', 'ฎ', 'บ', 'ป', 'อ'],
+    'high': ['ข', 'ฉ', 'ฐ', 'ถ', 'ผ', 'ฝ', 'ศ', 'ษ', 'ส', 'ห'],
+    'low': ['ค', 'ฅ', 'ฆ', 'ง', 'ช', 'ซ', 'ฌ', 'ญ', 'ฑ', 'ฒ', 'ณ', 'ท', 'ธ', 'น', 'พ', 'ฟ', 'ภ', 'ม', 'ย', 'ร', 'ล', 'ว', 'ฬ', 'ฮ', 'ฤ', 'ฦ']
+}
+
+# Tone marks
+TONE_MARKS = {
+    '่': 'mai_ek',      # Low tone mark
+    '้': 'mai_tho',     # Falling tone mark  
+    '๊': 'mai_tri',     # High tone mark
+    '๋': 'mai_chattawa' # Rising tone mark
+}
+
+# Complex vowel patterns (diphthongs and compound vowels)
+COMPLEX_VOWELS = {
+    # More specific patterns first
+    'เ_ือะ': {'type': 'short', 'name': 'uea (short uea)', 'description': 'short uea sound', 'pattern': r'เ.*ือะ'},
+    'เ_ือ': {'type': 'long', 'name': 'uea (long uea)', 'description': 'long uea sound', 'pattern': r'เ.*ือ'},
+    'เ_ียะ': {'type': 'short', 'name': 'ia (short ia)', 'description': 'short ia sound', 'pattern': r'เ.*ียะ'},
+    'เ_ีย': {'type': 'long', 'name': 'ia (long ia)', 'description': 'long ia sound', 'pattern': r'เ.*ีย'},
+    'เ_็': {'type': 'short', 'name': 'e (short e)', 'description': 'short e sound with mai han-akat', 'pattern': r'เ.*็'},
+    'แ_็': {'type': 'short', 'name': 'ae (short ae)', 'description': 'short ae sound with mai han-akat', 'pattern': r'แ.*็'},
+    'เ_ิ': {'type': 'long', 'name': 'er (long er)', 'description': 'long er sound', 'pattern': r'เ.*ิ'},
+    'เ_าะ': {'type': 'short', 'name': 'oe (short oe)', 'description': 'short oe sound', 'pattern': r'เ.*าะ'},
+    'เ_ะ': {'type': 'short', 'name': 'e (short e)', 'description': 'short e sound', 'pattern': r'เ.*ะ'},
+    'แ_ะ': {'type': 'short', 'name': 'ae (short ae)', 'description': 'short ae sound', 'pattern': r'แ.*ะ'},
+    'เ_า': {'type': 'long', 'name': 'ao (long ao)', 'description': 'long ao sound', 'pattern': r'เ.*า'},
+    'เ_อ': {'type': 'long', 'name': 'er (long er)', 'description': 'long er sound /ɤː/', 'pattern': r'เ(?!.*ือ).*อ'},
+    'โ_ะ': {'type': 'short', 'name': 'o (short o)', 'description': 'short o sound', 'pattern': r'โ.*ะ'},
+    'ไ_': {'type': 'long', 'name': 'ai (long ai)', 'description': 'long ai sound', 'pattern': r'^ไ[ก-ฮ][่้๊๋]?$'},
+    'ใ_': {'type': 'long', 'name': 'ai (long ai)', 'description': 'long ai sound', 'pattern': r'ใ.*'},
+    'ัว': {'type': 'long', 'name': 'ua (long ua)', 'description': 'long ua sound', 'pattern': r'ัว'},
+}
+
+# Simple vowel patterns
+SIMPLE_VOWELS = {
+    'า': {'type': 'long', 'name': 'a (long a)', 'description': 'long a sound'},
+    'ี': {'type': 'long', 'name': 'i (long i)', 'description': 'long i sound'},
+    'ู': {'type': 'long', 'name': 'u (long u)', 'description': 'long u sound'},
+    'อ': {'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
+    'ื': {'type': 'long', 'name': 'ue (long ue)', 'description': 'long ue sound'},
+    
+    # Short vowels
+    'ะ': {'type': 'short', 'name': 'a (short a)', 'description': 'short a sound'},
+    'ิ': {'type': 'short', 'name': 'i (short i)', 'description': 'short i sound'},
+    'ุ': {'type': 'short', 'name': 'u (short u)', 'description': 'short u sound'},
+    'ึ': {'type': 'short', 'name': 'ue (short ue)', 'description': 'short ue sound'},
+    'ั': {'type': 'short', 'name': 'a (short a)', 'description': 'short a sound'},
+    'เ': {'type': 'short', 'name': 'e (short e)', 'description': 'short e sound'},
+    'แ': {'type': 'short', 'name': 'ae (short ae)', 'description': 'short ae sound'},
+    'โ': {'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
+    'ไ': {'type': 'short', 'name': 'ai (short ai)', 'description': 'short ai sound'},
+    'ใ': {'type': 'short', 'name': 'ai (short ai)', 'description': 'short ai sound'},
+    'ฤ': {'type': 'long', 'name': 'rue (long rue)', 'description': 'long rue sound (Sanskrit)'},
+    'ฤๅ': {'type': 'long', 'name': 'rue (long rue)', 'description': 'long rue sound (Sanskrit)'},
+    'ฦ': {'type': 'long', 'name': 'lue (long lue)', 'description': 'long lue sound (Sanskrit)'},
+    'ฦๅ': {'type': 'long', 'name': 'lue (long lue)', 'description': 'long lue sound (Sanskrit)'},
+}
+
+# For backward compatibility
+LONG_VOWELS = [v for v, info in SIMPLE_VOWELS.items() if info['type'] == 'long']
+SHORT_VOWELS = [v for v, info in SIMPLE_VOWELS.items() if info['type'] == 'short']
+
+# Sonorant consonants (for live/dead syllable classification) - these make syllables "live"
+SONORANT_CONSONANTS = ['ม', 'น', 'ง', 'ย', 'ร', 'ล', 'ว']
+
+# Stop consonants (for live/dead syllable classification) - these make syllables "dead"
+STOP_CONSONANTS = ['ก', 'ด', 'บ', 'ป', 'จ', 'ต', 'ธ', 'ษ', 'ศ', 'ข', 'ค', 'ฆ', 'ช', 'ซ', 'ฌ', 'ญ', 'ฎ', 'ฏ', 'ฐ', 'ฑ', 'ฒ', 'ณ', 'ฟ', 'ภ', 'ห', 'ฮ', 'พ']
+
+# Leading vowels are written before the consonant they follow in speech
+LEADING_VOWELS = ['เ', 'แ', 'โ', 'ไ', 'ใ']
+
+# Low-class sonorants that take high-class tone rules when led by silent ห
+HO_NAM_SONORANTS = ['ง', 'ญ', 'น', 'ม', 'ย', 'ร', 'ล', 'ว']
+
+# Character classification table for the Thai block (U+0E00-U+0E7F)
+# ==================================================================
+#
+# THAI_CHAR_FLAGS[ord(char) - THAI_BLOCK_START] is a bit set of the CHAR_*
+# flags below, and THAI_CONSONANT_CLASS holds the consonant class name (or
+# None) at the same index. Both are built once from the rule tables above, so
+# the character helpers answer with a single index instead of building and
+# scanning lists.
+
+THAI_BLOCK_START = 0x0E00
+THAI_BLOCK_SIZE = 0x80
+
+CHAR_CONSONANT = 1 << 0
+CHAR_MID_CLASS = 1 << 1
+CHAR_HIGH_CLASS = 1 << 2
+CHAR_LOW_CLASS = 1 << 3
+CHAR_LEADING_VOWEL = 1 << 4
+CHAR_SIMPLE_VOWEL = 1 << 5
+CHAR_TONE_MARK = 1 << 6
+CHAR_SONORANT_FINAL = 1 << 7
+CHAR_STOP_FINAL = 1 << 8
+CHAR_HO_NAM_SONORANT = 1 << 9
+CHAR_SANSKRIT_VOWEL = 1 << 10
+
+CONSONANT_CLASS_FLAGS = {'mid': CHAR_MID_CLASS, 'high': CHAR_HIGH_CLASS, 'low': CHAR_LOW_CLASS}
+
+def build_thai_char_tables():
+    """Build the flag and consonant class tables for the Thai block."""
+    flags = [0] * THAI_BLOCK_SIZE
+    classes = [None] * THAI_BLOCK_SIZE
+    
+    def mark(chars, flag):
+        for char in chars:
+            if len(char) == 1:
+                flags[ord(char) - THAI_BLOCK_START] |= flag
+    
+    # Reversed so that, as with a forward scan of CONSONANT_CLASSES, the first class listed wins
+    for class_name, consonants in reversed(list(CONSONANT_CLASSES.items())):
+        mark(consonants, CHAR_CONSONANT | CONSONANT_CLASS_FLAGS[class_name])
+        for char in consonants:
+            classes[ord(char) - THAI_BLOCK_START] = class_name
+    mark(LEADING_VOWELS, CHAR_LEADING_VOWEL)
+    mark(SIMPLE_VOWELS, CHAR_SIMPLE_VOWEL)
+    mark(TONE_MARKS, CHAR_TONE_MARK)
+    mark(SONORANT_CONSONANTS, CHAR_SONORANT_FINAL)
+    mark(STOP_CONSONANTS, CHAR_STOP_FINAL)
+    mark(HO_NAM_SONORANTS, CHAR_HO_NAM_SONORANT)
+    mark(['ฤ', 'ฦ'], CHAR_SANSKRIT_VOWEL)
+    return flags, classes
+
+THAI_CHAR_FLAGS, THAI_CONSONANT_CLASS = build_thai_char_tables()
+
+def char_flags(char):
+    """Return the CHAR_* flags of a single character (0 outside the Thai block)."""
+    if len(char) != 1:
+        return 0
+    index = ord(char) - THAI_BLOCK_START
+    if 0 <= index < THAI_BLOCK_SIZE:
+        return THAI_CHAR_FLAGS[index]
+    return 0
+
+def is_thai_consonant(char):
+    """Check if character is a Thai consonant of any class."""
+    return char_flags(char) & CHAR_CONSONANT != 0
+
+def get_consonant_class(char):
+    """Determine the class of a Thai consonant."""
+    if len(char) != 1:
+        return None
+    index = ord(char) - THAI_BLOCK_START
+    if 0 <= index < THAI_BLOCK_SIZE:
+        return THAI_CONSONANT_CLASS[index]
+    return None
+
+def is_vowel_symbol(char):
+    """Check if character is a vowel symbol that appears before consonants."""
+    return char_flags(char) & CHAR_LEADING_VOWEL != 0
+
+# Complex vowel matching
+# ======================
+#
+# The COMPLEX_VOWELS patterns are compiled once into matchers shared by vowel
+# identification and the syllable segmenter, instead of running each pattern
+# string through re.search on every call.
+
+def word_lines(word):
+    """Return the (start, end) bounds of each line of ``word``."""
+    lines = []
+    line_start = 0
+    for line in word.split('\n'):
+        lines.append((line_start, line_start + len(line)))
+        line_start += len(line) + 1
+    return lines
+
+# A regex character that stands for itself
+_LITERAL_CHAR = r'[^\\.*?+()\[\]{}^$|]'
+_SPAN_PATTERN = re.compile(rf'({_LITERAL_CHAR})\.\*({_LITERAL_CHAR}+)')
+_EXCLUDING_SPAN_PATTERN = re.compile(rf'({_LITERAL_CHAR})\(\?!\.\*({_LITERAL_CHAR}+)\)\.\*({_LITERAL_CHAR}+)')
+_OPEN_SPAN_PATTERN = re.compile(rf'({_LITERAL_CHAR})\.\*')
+_LITERAL_PATTERN = re.compile(rf'{_LITERAL_CHAR}+')
+
+class CompiledComplexVowel:
+    """A COMPLEX_VOWELS pattern compiled into a form that is located without backtracking.
+
+    The patterns in COMPLEX_VOWELS take one of four shapes, each of which can
+    be resolved for a whole word with a few string searches per line:
+
+    - ``X.*Y``: lead X, then the last Y on the same line
+    - ``X(?!.*Z).*Y``: as above, provided no Z follows X on the line
+    - ``X.*``: lead X to the end of the line
+    - a literal
+
+    Any other pattern falls back to the regex itself.
+    """
+
+    def __init__(self, name, pattern):
+        self.name = name
+        self.pattern = pattern
+        self.lead = None
+        self.tail = None
+        self.excluded = None
+        self.regex = None
+        self.anchored = False
+        
+        match = _EXCLUDING_SPAN_PATTERN.fullmatch(pattern)
+        if match:
+            self.kind = 'span'
+            self.lead, self.excluded, self.tail = match.groups()
+        elif _SPAN_PATTERN.fullmatch(pattern):
+            self.kind = 'span'
+            self.lead, self.tail = _SPAN_PATTERN.fullmatch(pattern).groups()
+        elif _OPEN_SPAN_PATTERN.fullmatch(pattern):
+            self.kind = 'open'
+            self.lead = _OPEN_SPAN_PATTERN.fullmatch(pattern).group(1)
+        elif _LITERAL_PATTERN.fullmatch(pattern):
+            self.kind = 'literal'
+            self.lead = pattern
+        else:
+            self.kind = 'regex'
+            # re.search(pattern, word[i:]) with a leading ^ can only match at i
+            self.anchored = pattern.startswith('^')
+            self.regex = re.compile(pattern[1:] if self.anchored else pattern)
+        
+        # A character every match starts with, used to skip patterns cheaply
+        self.first_char = self.lead[0] if self.lead else None
+
+    def find_matches(self, word, lines):
+        """Return (starts, ends) of every position a search for this pattern can match from.
+
+        ``starts`` is sorted, so the match found by searching from position i
+        is the first start >= i. ``lines`` holds the (start, end) bounds of each
+        line of ``word``, since '.' does not cross a newline.
+        """
+        starts = []
+        ends = []
+        if self.kind == 'literal':
+            position = word.find(self.lead)
+            while position != -1:
+                starts.append(position)
+                ends.append(position + len(self.lead))
+                position = word.find(self.lead, position + 1)
+            return starts, ends
+        
+        for line_start, line_end in lines:
+            if self.kind == 'span':
+                last_tail = word.rfind(self.tail, line_start, line_end)
+                if last_tail == -1:
+                    continue
+                end = last_tail + len(self.tail)
+                last_excluded = word.rfind(self.excluded, line_start, line_end) if self.excluded else -1
+            else:
+                end = line_end
+            position = word.find(self.lead, line_start, line_end)
+            while position != -1:
+                if self.kind == 'span':
+                    # Greedy .* runs to the last tail on the line, which must come after the lead
+                    if last_tail < position + 1:
+                        break
+                    if last_excluded < position + 1:
+                        starts.append(position)
+                        ends.append(end)
+                else:
+                    starts.append(position)
+                    ends.append(end)
+                position = word.find(self.lead, position + 1, line_end)
+        return starts, ends
+
+    def search(self, word, lines=None):
+        """Return the (start, end) span ``re.search(pattern, word)`` would find, or None."""
+        if self.kind == 'regex':
+            match = self.regex.match(word) if self.anchored else self.regex.search(word)
+            return match.span() if match else None
+        if self.kind == 'literal':
+            position = word.find(self.lead)
+            return (position, position + len(self.lead)) if position != -1 else None
+        starts, ends = self.find_matches(word, lines or word_lines(word))
+        return (starts[0], ends[0]) if starts else None
+
+class ComplexVowelMatcher:
+    """COMPLEX_VOWELS compiled once and tried in a fixed priority order.
+
+    ``match(word)`` returns the name and span of the first complex vowel (in
+    priority order) found anywhere in the word, which is what looping over
+    COMPLEX_VOWELS with ``re.search`` used to compute.
+    """
+
+    def __init__(self, priority=()):
+        names = list(priority) + [name for name in COMPLEX_VOWELS if name not in priority]
+        self.compiled = [CompiledComplexVowel(name, COMPLEX_VOWELS[name]['pattern']) for name in names]
+
+    def match(self, word):
+        """Return (name, (start, end)) of the highest-priority complex vowel in ``word``, or None."""
+        present = set(word)
+        lines = None
+        for compiled in self.compiled:
+            if compiled.first_char is not None and compiled.first_char not in present:
+                continue
+            if lines is None:
+                lines = word_lines(word)
+            span = compiled.search(word, lines)
+            if span:
+                return compiled.name, span
+        return None
+
+# Segmentation tries COMPLEX_VOWELS in table order; vowel identification
+# checks เ_ือ and เ_ีย before the rest
+COMPLEX_VOWEL_MATCHER = ComplexVowelMatcher()
+VOWEL_IDENTIFICATION_MATCHER = ComplexVowelMatcher(priority=['เ_ือ', 'เ_ีย'])
+
+def has_implied_vowel(word):
+    """Check if a word has an implied vowel (only consonants, no written vowels)."""
+    # Check if the word contains only consonants and no written vowels
+    has_written_vowel = False
+    consonant_count = 0
+    
+    for i, char in enumerate(word):
+        if char == 'ว' and i + 1 < len(word) and is_thai_consonant(word[i + 1]):
+            # 'ว' is functioning as a vowel (ua sound)
+            has_written_vowel = True
+            break
+        elif char == 'อ' and not is_zero_consonant(word, i):
+            # 'อ' is functioning as a vowel, not a zero consonant
+            has_written_vowel = True
+            break
+        elif char in SIMPLE_VOWELS or is_vowel_symbol(char):
+            has_written_vowel = True
+            break
+        elif is_thai_consonant(char):
+            consonant_count += 1
+    
+    # If we have only consonants and no written vowels, we need an implied vowel
+    return consonant_count > 0 and not has_written_vowel
+
+def is_zero_consonant(word, pos):
+    """Check if 'อ' at position is functioning as a zero consonant (implicit initial consonant)."""
+    # 'อ' is a zero consonant when:
+    # 1. It's at the beginning of the word
+    # 2. It's followed by a vowel symbol (เ, โ, ไ, ใ, แ)
+    if pos == 0:
+        return True
+    if pos + 1 < len(word) and is_vowel_symbol(word[pos + 1]):
+        return True
+    return False
+
+def has_w_vowel_pattern(word):
+    """Check if a word has the 'ว' functioning as a vowel sound (ua)."""
+    # Look for patterns where 'ว' is followed by a consonant
+    for i in range(len(word) - 1):
+        if word[i] == 'ว' and is_thai_consonant(word[i + 1]):
+            return True
+    return False
+
+def get_w_vowel_info(word):
+    """Get information about 'ว' functioning as a vowel sound."""
+    if not has_w_vowel_pattern(word):
+        return None
+    
+    # Find the 'ว' + consonant pattern
+    for i in range(len(word) - 1):
+        if word[i] == 'ว' and is_thai_consonant(word[i + 1]):
+            return {
+                'type': 'w_vowel',
+                'vowel': 'อัว',
+                'description': 'ua sound (ว functioning as vowel)',
+                'position': f'at position {i}',
+                'pattern': f'{word[i]}{word[i + 1]}'
+            }
+    
+    return None
+
+# Where single vowel characters are written relative to their consonant
+VOWEL_POSITIONS = {
+    'above': ['ิ', 'ี', '์'],
+    'below': ['ุ', 'ู'],
+    'before': ['เ', 'โ', 'ไ', 'ใ', 'แ'],
+    'after': ['า', 'อ', 'ะ']
+}
+
+def get_vowel_positioning(vowel_char, word, position):
+    """Get positioning information for a vowel character."""
+    # Called for every vowel of every syllable, so skip even the call when debug logging is off
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Vowel character: %s, Word: %s, Position: %s", vowel_char, word, position)
+    
+    # Check for surrounding vowel patterns by looking at the word structure
+    if is_vowel_symbol(vowel_char):
+        # Check if this is part of a surrounding vowel pattern
+        # Look for the pattern: เ + consonant + ิ/า/อ/ีย/ือ/ัว
+        if position < len(word) - 2:
+            next_char = word[position + 1]
+            after_next_char = word[position + 2] if position + 2 < len(word) else None
+            after_after_next_char = word[position + 3] if position + 3 < len(word) else None
+            
+            # Check for single character surrounding vowels
+            if vowel_char == 'เ' and after_next_char in ['ิ', 'า', 'อ']:
+                if after_next_char == 'ิ':
+                    return VowelPositioning(
+                        position='surrounding_start',
+                        description='vowel surrounds consonant (เ before, ิ after)',
+                        visual_order='written before and after consonant',
+                        pronunciation_order='เ spoken first, then consonant, then ิ'
+                    )
+                elif after_next_char == 'า':
+                    return VowelPositioning(
+                        position='surrounding_start',
+                        description='vowel surrounds consonant (เ before, า after)',
+                        visual_order='written before and after consonant',
+                        pronunciation_order='เ spoken first, then consonant, then า'
+                    )
+                elif after_next_char == 'อ':
+                    return VowelPositioning(
+                        position='surrounding_start',
+                        description='vowel surrounds consonant (เ before, อ after)',
+                        visual_order='written before and after consonant',
+                        pronunciation_order='เ spoken first, then consonant, then อ'
+                    )
+            
+            # Check for compound character surrounding vowels
+            elif vowel_char == 'เ' and position < len(word) - 3:
+                if after_next_char == 'ี' and after_after_next_char == 'ย':
+                    return VowelPositioning(
+                        position='surrounding_start',
+                        description='vowel surrounds consonant (เ before, ีย after)',
+                        visual_order='written before and after consonant',
+                        pronunciation_order='เ spoken first, then consonant, then ีย'
+                    )
+                elif after_next_char == 'ื' and after_after_next_char == 'อ':
+                    return VowelPositioning(
+                        position='surrounding_start',
+                        description='vowel surrounds consonant (เ before, ือ after)',
+                        visual_order='written before and after consonant',
+                        pronunciation_order='เ spoken first, then consonant, then ือ'
+                    )
+                elif after_next_char == 'ั' and after_after_next_char == 'ว':
+                    return VowelPositioning(
+                        position='surrounding_start',
+                        description='vowel surrounds consonant (เ before, ัว after)',
+                        visual_order='written before and after consonant',
+                        pronunciation_order='เ spoken first, then consonant, then ัว'
+                    )
+            
+            elif vowel_char == 'แ' and after_next_char == 'อ':
+                return VowelPositioning(
+                    position='surrounding_start',
+                    description='vowel surrounds consonant (แ before, อ after)',
+                    visual_order='written before and after consonant',
+                    pronunciation_order='แ spoken first, then consonant, then อ'
+                )
+            elif vowel_char == 'โ' and after_next_char == 'ะ':
+                return VowelPositioning(
+                    position='surrounding_start',
+                    description='vowel surrounds consonant (โ before, ะ after)',
+                    visual_order='written before and after consonant',
+                    pronunciation_order='โ spoken first, then consonant, then ะ'
+                )
+            elif vowel_char == 'ไ':
+                return VowelPositioning(
+                    position='surrounding_start',
+                    description='vowel surrounds consonant (ไ before, no after)',
+                    visual_order='written before consonant',
+                    pronunciation_order='ไ spoken first, then consonant'
+                )
+    
+    # Check if this is the second part of a surrounding vowel
+    if vowel_char in ['ิ', 'า', 'อ', 'ะ'] and position > 0:
+        prev_char = word[position - 1]
+        if prev_char in ['เ', 'แ', 'โ']:
+            if prev_char == 'เ' and vowel_char == 'ิ':
+                return VowelPositioning(
+                    position='surrounding_end',
+                    description='vowel surrounds consonant (เ before, ิ after)',
+                    visual_order='written before and after consonant',
+                    pronunciation_order='เ spoken first, then consonant, then ิ'
+                )
+            elif prev_char == 'เ' and vowel_char == 'า':
+                return VowelPositioning(
+                    position='surrounding_end',
+                    description='vowel surrounds consonant (เ before, า after)',
+                    visual_order='written before and after consonant',
+                    pronunciation_order='เ spoken first, then consonant, then า'
+                )
+            elif prev_char == 'เ' and vowel_char == 'อ':
+                return VowelPositioning(
+                    position='surrounding_end',
+                    description='vowel surrounds consonant (เ before, อ after)',
+                    visual_order='written before and after consonant',
+                    pronunciation_order='เ spoken first, then consonant, then อ'
+                )
+            elif prev_char == 'แ' and vowel_char == 'อ':
+                return VowelPositioning(
+                    position='surrounding_end',
+                    description='vowel surrounds consonant (แ before, อ after)',
+                    visual_order='written before and after consonant',
+                    pronunciation_order='แ spoken first, then consonant, then อ'
+                )
+            elif prev_char == 'โ' and vowel_char == 'ะ':
+                return VowelPositioning(
+                    position='surrounding_end',
+                    description='vowel surrounds consonant (โ before, ะ after)',
+                    visual_order='written before and after consonant',
+                    pronunciation_order='โ spoken first, then consonant, then ะ'
+                )
+    
+    # Handle individual vowel positions
+    for position_type, vowels in VOWEL_POSITIONS.items():
+        if vowel_char in vowels:
+            pronunciation_order = 'spoken first' if position_type == 'before' else 'spoken second'
+            if position_type in ['above', 'below']:
+                pronunciation_order = 'spoken simultaneously'
+            
+            return VowelPositioning(
+                position=position_type,
+                description=f'vowel positioned {position_type} consonant',
+                visual_order='written before spoken' if position_type == 'before' else 'written after spoken',
+                pronunciation_order=pronunciation_order
+            )
+    
+    return VowelPositioning(
+        position='unknown',
+        description='vowel position unknown',
+        visual_order='unknown',
+        pronunciation_order='unknown'
+    )
+
+def get_implied_vowel_info(word):
+    """Get information about implied vowels in a word."""
+    if not has_implied_vowel(word):
+        return None
+    
+    consonant_count = sum(1 for char in word if is_thai_consonant(char))
+    
+    if consonant_count == 2:
+        # Two consonants - implied short 'o' sound (โอะ)
+        return {
+            'type': 'short_o',
+            'vowel': 'โอะ',
+            'description': 'short o sound',
+            'position': 'between consonants'
+        }
+    elif consonant_count == 3:
+        # Three consonants - implied 'a' after first consonant, then short 'o'
+        return {
+            'type': 'multi_consonant',
+            'vowels': ['อะ', 'โอะ'],
+            'description': 'short a after first consonant, then short o',
+            'positions': ['after first consonant', 'between remaining consonants']
+        }
+    
+    return None
+
+def is_consonant_cluster_start(word, pos):
+    """Check if position starts a consonant cluster."""
+    if pos >= len(word) - 1:
+        return False
+    
+    char1 = word[pos]
+    char2 = word[pos + 1]
+    
+    # Common Thai consonant clusters
+    clusters = [
+        'กร', 'กล', 'ขร', 'ขล', 'คร', 'คล', 'ตร', 'ปร', 'ปล', 'พร', 'พล'
+    ]
+    
+    return char1 + char2 in clusters
+
+def find_initial_consonant(word):
+    """Find the initial consonant in a Thai word, handling vowel symbols, zero consonants, and clusters."""
+    if not word:
+        return None, 0
+    
+    # Special cases where อ is a silent tone modifier
+    special_words = ['อย่า', 'อยาก', 'อยู่', 'อย่าง']
+    if word in special_words:
+        return 'อ', 0  # อ acts as silent tone modifier (mid-class)
+    
+    # If first character is a vowel symbol, check if there's a consonant cluster after it
+    if is_vowel_symbol(word[0]):
+        # Look for consonant cluster starting at position 1
+        if len(word) > 2 and is_consonant_cluster_start(word, 1):
+            return word[1], 1  # Return the first consonant of the cluster
+        # Check if there's a single consonant after the vowel symbol
+        elif len(word) > 1 and is_thai_consonant(word[1]):
+            # Check for ห (ho hip) leading consonant + low-class sonorant pattern
+            if word[1] == 'ห' and len(word) > 2:
+                next_char = word[2]
+                if char_flags(next_char) & CHAR_HO_NAM_SONORANT:
+                    # ห acts as leading consonant, the following consonant determines the tone class
+                    # but the tone rules follow high-class consonant rules
+                    return next_char, 1  # Return the following consonant, but mark it as high-class for tone purposes
+            return word[1], 1  # Return the consonant
+        else:
+            return 'อ', 0  # Return อ as the implicit consonant
+    
+    # If first character is อ followed by a vowel, it's a zero consonant
+    if word[0] == 'อ' and len(word) > 1:
+        # Check if the next character is a vowel
+        next_char = word[1]
+        if next_char in SIMPLE_VOWELS or is_vowel_symbol(next_char):
+            return 'อ', 0  # อ is the zero consonant
+    
+    # Check for ห (ho hip) leading consonant + low-class sonorant
+    if len(word) > 1 and word[0] == 'ห':
+        next_char = word[1]
+        # Low-class sonorant consonants that can be led by ห
+        if char_flags(next_char) & CHAR_HO_NAM_SONORANT:
+            # ห acts as leading consonant, the following consonant determines the tone class
+            # but the tone rules follow high-class consonant rules
+            return next_char, 0  # Return the following consonant, but mark it as high-class for tone purposes
+    
+    # Check for consonant clusters
+    if is_consonant_cluster_start(word, 0):
+        return word[0], 0  # Return the first consonant of the cluster
+    
+    # Regular consonant
+    return word[0], 0
+
+def has_tone_mark(word):
+    """Check if word has any tone marks and return them."""
+    return [char for char in word if char_flags(char) & CHAR_TONE_MARK]
+
+def is_long_vowel(vowel_char):
+    """Check if a vowel character represents a long vowel."""
+    return vowel_char in LONG_VOWELS
+
+def is_short_vowel(vowel_char):
+    """Check if a vowel character represents a short vowel."""
+    return vowel_char in SHORT_VOWELS
+
+def identify_vowels(word):
+    """Identify vowels in the word and return their information."""
+    vowels_found = []
+    
+    # First, check for 'ว' functioning as vowel sound (highest priority)
+    w_vowel_info = get_w_vowel_info(word)
+    if w_vowel_info:
+        vowels_found.append(Vowel(
+            char=w_vowel_info['vowel'],
+            info={'type': 'long', 'name': 'ua (long ua)', 'description': w_vowel_info['description']},
+            type='w_vowel',
+            position=w_vowel_info['position']
+        ))
+        return vowels_found  # W vowel takes precedence over other patterns
+    
+    # Check for Sanskrit vowels (high priority)
+    for i, char in enumerate(word):
+        if char_flags(char) & CHAR_SANSKRIT_VOWEL:
+            positioning = get_vowel_positioning(char, word, i)
+            vowels_found.append(Vowel(
+                char=char,
+                info=SIMPLE_VOWELS[char],
+                type='sanskrit',
+                position=i,
+                positioning=positioning
+            ))
+            return vowels_found  # Sanskrit vowels take precedence
+    
+    # Check for complex vowels (diphthongs), with เ_ือ and เ_ีย taking priority
+    complex_match = VOWEL_IDENTIFICATION_MATCHER.match(word)
+    if complex_match:
+        complex_vowel, _ = complex_match
+        # Get positioning for the first vowel character in the pattern
+        first_vowel = complex_vowel.split('_')[0] if '_' in complex_vowel else complex_vowel[0]
+        positioning = get_vowel_positioning(first_vowel, word, 0)
+        vowels_found.append(Vowel(
+            char=complex_vowel,
+            info=COMPLEX_VOWELS[complex_vowel],
+            type='complex',
+            positioning=positioning
+        ))
+        return vowels_found  # Complex vowels take precedence
+    
+    # Check for 'อ' functioning as a vowel (before implied vowels)
+    for i, char in enumerate(word):
+        if char == 'อ' and not is_zero_consonant(word, i):
+            positioning = get_vowel_positioning(char, word, i)
+            vowels_found.append(Vowel(
+                char=char,
+                info={'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
+                type='simple',
+                position=i,
+                positioning=positioning
+            ))
+            return vowels_found  # 'อ' vowel takes precedence over implied vowels
+    
+    # Check for implied vowels
+    implied_info = get_implied_vowel_info(word)
+    if implied_info:
+        if implied_info['type'] == 'short_o':
+            vowels_found.append(Vowel(
+                char=implied_info['vowel'],
+                info={'type': 'short', 'name': 'o (short o)', 'description': 'short o sound'},
+                type='implied',
+                position='between consonants'
+            ))
+        elif implied_info['type'] == 'multi_consonant':
+            for i, vowel in enumerate(implied_info['vowels']):
+                vowels_found.append(Vowel(
+                    char=vowel,
+                    info={'type': 'short', 'name': f'{vowel} (short)', 'description': f'short {vowel} sound'},
+                    type='implied',
+                    position=implied_info['positions'][i]
+                ))
+        return vowels_found  # Implied vowels take precedence
+    
+    # If no complex vowels found, look for simple vowels
+    # Find the initial consonant position
+    initial_consonant, consonant_pos = find_initial_consonant(word)
+    
+    # Determine how many characters to skip for the initial consonant/cluster
+    skip_chars = 1
+    if consonant_pos < len(word) - 1 and is_consonant_cluster_start(word, consonant_pos):
+        skip_chars = 2  # Skip both characters in the cluster
+    
+    # Look for simple vowels starting from after the consonant/cluster
+    for i, char in enumerate(word[consonant_pos + skip_chars:], consonant_pos + skip_chars):
+        if char in SIMPLE_VOWELS:
+            positioning = get_vowel_positioning(char, word, i)
+            vowels_found.append(Vowel(
+                char=char,
+                info=SIMPLE_VOWELS[char],
+                type='simple',
+                position=i,
+                positioning=positioning
+            ))
+        elif char == 'อ' and not is_zero_consonant(word, i):
+            # 'อ' functioning as a vowel
+            positioning = get_vowel_positioning(char, word, i)
+            vowels_found.append(Vowel(
+                char=char,
+                info={'type': 'long', 'name': 'o (long o)', 'description': 'long o sound'},
+                type='simple',
+                position=i,
+                positioning=positioning
+            ))
+    
+    # Also check if the first character is a simple vowel symbol
+    if word and word[0] in SIMPLE_VOWELS:
+        positioning = get_vowel_positioning(word[0], word, 0)
+        vowels_found.append(Vowel(
+            char=word[0],
+            info=SIMPLE_VOWELS[word[0]],
+            type='simple',
+            position=0,
+            positioning=positioning
+        ))
+    
+    return vowels_found
+
+def select_primary_vowel(vowels):
+    """Return the vowel that describes the syllable (the main vowel sound), or None if there is none."""
+    if not vowels:
+        return None
+    if len(vowels) == 1:
+        return vowels[0]
+    
+    # For multiple vowels, return the primary vowel (the main vowel sound)
+    # Priority: 1) Long vowels over short vowels, 2) Vowels after consonants over above/below vowels
+    primary_vowel = None
+    best_priority = -1
+    
+    for vowel in vowels:
+        priority = 0
+        
+        # Priority 1: Long vowels over short vowels
+        if vowel.info['type'] == 'long':
+            priority += 100
+        else:
+            priority += 50
+        
+        # Priority 2: Vowels after consonants (า, อ, ะ) over above/below vowels (ิ, ี, ุ, ู)
+        position = vowel.positioning.position if vowel.positioning is not None else ''
+        if position == 'after':
+            priority += 20
+        elif position in ['above', 'below']:
+            priority += 10
+        
+        # Priority 3: Earlier position (closer to consonant)
+        priority += (10 - (vowel.position if vowel.position is not None else 0))
+        
+        if priority > best_priority:
+            primary_vowel = vowel
+            best_priority = priority
+    
+    # If no position info, use the first vowel in the list
+    return primary_vowel if primary_vowel is not None else vowels[0]
+
+def describe_vowel(vowel):
+    """Describe a vowel for the explanation text."""
+    if vowel.type == 'implied':
+        return f"implied vowel '{vowel.char}' ({vowel.info['name']}) - {vowel.info['description']} ({vowel.position})"
+    elif vowel.type == 'w_vowel':
+        return f"'{vowel.char}' vowel sound ({vowel.info['name']}) - {vowel.info['description']} ({vowel.position})"
+    positioning_text = f" ({vowel.positioning.description})" if vowel.positioning is not None else ""
+    return f"vowel '{vowel.char}' ({vowel.info['name']}) - {vowel.info['description']}{positioning_text}"
+
+def get_vowel_description(vowels):
+    """Get a description of the vowels found in the word."""
+    if not vowels:
+        return "no vowels identified"
+    return describe_vowel(select_primary_vowel(vowels))
+
+
+def classify_syllable_type(word):
+    """Classify syllable as live or dead."""
+    # Check for tone marks first - syllables with tone marks are always dead
+    if any(char_flags(char) & CHAR_TONE_MARK for char in word):
+        return 'dead'
+    
+    # Remove tone marks for analysis
+    clean_word = ''.join([char for char in word if not char_flags(char) & CHAR_TONE_MARK])
+    
+    if not clean_word:
+        return 'live'
+    
+    # Check if ends with sonorant consonant first (this makes syllable live regardless of vowel)
+    final_flags = char_flags(clean_word[-1])
+    if final_flags & CHAR_SONORANT_FINAL:
+        return 'live'
+    
+    # Check if ends with stop consonant
+    if final_flags & CHAR_STOP_FINAL:
+        return 'dead'
+    
+    # Check for vowels to determine if it's long or short
+    vowels = identify_vowels(clean_word)
+    if vowels:
+        # For multiple vowels, prioritize the final vowel (the one that determines syllable type)
+        # Find the vowel closest to the end of the word
+        final_vowel = None
+        final_position = -1
+        
+        for vowel in vowels:
+            if vowel.get('position', 0) > final_position:
+                final_vowel = vowel
+                final_position = vowel.get('position', 0)
+        
+        # If no position info, use the last vowel in the list
+        if final_vowel is None and vowels:
+            final_vowel = vowels[-1]
+            
+        if final_vowel:
+            if final_vowel.type == 'complex':
+                return 'live' if final_vowel.info['type'] == 'long' else 'dead'
+            elif final_vowel.type == 'simple':
+                return 'live' if final_vowel.info['type'] == 'long' else 'dead'
+            elif final_vowel.type == 'implied':
+                return 'live' if final_vowel.info['type'] == 'long' else 'dead'
+            elif final_vowel.type == 'w_vowel':
+                return 'live' if final_vowel.info['type'] == 'long' else 'dead'
+    
+    # Fallback: check individual characters
+    for char in clean_word:
+        if char in SIMPLE_VOWELS:
+            return 'live' if SIMPLE_VOWELS[char]['type'] == 'long' else 'dead'
+    
+    # Default to live if unclear
+    return 'live'
+
+def analyze_romanization_for_syllables(word, romanized):
+    """Use romanization to help determine syllable structure and 'อ' function."""
+    # More sophisticated vowel counting that recognizes diphthongs
+    # Common Thai diphthongs in romanization
+    diphthongs = ['ai', 'ao', 'ia', 'ua', 'ue', 'oe', 'ui', 'oi']
+    
+    # Count syllables more accurately by looking for vowel clusters
+    romanized_lower = romanized.lower()
+    syllable_count = 0
+    i = 0
+    
+    while i < len(romanized_lower):
+        char = romanized_lower[i]
+        if char in 'aeiou':
+            syllable_count += 1
+            # Check for diphthongs starting with this vowel
+            if i + 1 < len(romanized_lower):
+                next_char = romanized_lower[i + 1]
+                if char + next_char in diphthongs:
+                    i += 2  # Skip both characters of diphthong
+                    continue
+            i += 1
+        else:
+            i += 1
+    
+    # Special handling for words with multiple consonant clusters
+    # If romanization has many consonants in a row, it might indicate multiple syllables
+    consonant_clusters = 0
+    i = 0
+    while i < len(romanized_lower):
+        if romanized_lower[i] not in 'aeiou':
+            # Found consonant, count consecutive consonants
+            cluster_length = 0
+            while i < len(romanized_lower) and romanized_lower[i] not in 'aeiou':
+                cluster_length += 1
+                i += 1
+            if cluster_length >= 2:  # 2+ consecutive consonants might indicate syllable boundary
+                consonant_clusters += 1
+        else:
+            i += 1
+    
+    # If we have many consonant clusters but few vowels, adjust syllable count
+    if consonant_clusters > syllable_count:
+        syllable_count = max(syllable_count, consonant_clusters)
+    
+    # Determine 'อ' function based on patterns
+    o_function = 'unknown'
+    
+    # Check if 'อ' at beginning functions as zero consonant
+    if word.startswith('อ') and not word.startswith('อา'):
+        o_function = 'zero_consonant'
+    # Check for consonant-อ-consonant pattern (single syllable with 'อ' as vowel)
+    elif any(word[i] == 'อ' and 
+             is_thai_consonant(word[i-1]) and
+             is_thai_consonant(word[i+1])
+             for i in range(1, len(word) - 1)):
+        o_function = 'vowel'
+    # If only one syllable and contains 'อ', likely vowel
+    elif syllable_count == 1 and 'อ' in word:
+        o_function = 'vowel'
+    
+    return RomanizationAnalysis(syllable_count, o_function)
+
+def is_consonant_o_consonant_pattern(word):
+    """Check if word follows consonant-อ-consonant pattern where อ is a vowel."""
+    if len(word) != 3:
+        return False
+    
+    first_char = word[0]
+    middle_char = word[1] 
+    last_char = word[2]
+    
+    # Check if it's consonant-อ-consonant pattern
+    if (middle_char == 'อ' and 
+        is_thai_consonant(first_char) and
+        is_thai_consonant(last_char)):
+        return True
+    
+    return False
+
+# Syllable splitting exceptions
+# =============================
+#
+# Words the splitting rules get wrong are listed in
+# data/syllable_exceptions.json rather than in code. The file is loaded into
+# hash maps, checked for changes every few seconds and reloaded without a
+# restart. Each entry counts its hits. Words where tltk and the rule-based
+# split disagree are recorded as candidates for new entries; a background
+# thread appends them to a file, so analysis never waits on the disk, and
+# stops at SYLLABLE_CANDIDATES_MAX words since anyone can submit words.
+
+SYLLABLE_EXCEPTIONS_PATH = os.environ.get(
+    'SYLLABLE_EXCEPTIONS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'syllable_exceptions.json')
+)
+SYLLABLE_CANDIDATES_PATH = os.environ.get(
+    'SYLLABLE_CANDIDATES_PATH', os.path.join(CACHE_DIR, 'syllable_candidates.jsonl')
+)
+# Seconds between checks of the exceptions file for changes
+SYLLABLE_EXCEPTIONS_RELOAD_INTERVAL = float(os.environ.get('SYLLABLE_EXCEPTIONS_RELOAD_INTERVAL', 2))
+# Words kept in the candidates file; 0 disables recording
+SYLLABLE_CANDIDATES_MAX = int(os.environ.get('SYLLABLE_CANDIDATES_MAX', 10000))
+# Candidates waiting for the writer thread; beyond this they are dropped
+SYLLABLE_CANDIDATES_QUEUE_SIZE = 1000
+
+SYLLABLE_EXCEPTION_TABLES = ('split_overrides', 'algorithm_overrides')
+
+class SyllableExceptions:
+    """Hot-reloadable syllable splitting exceptions with per-entry hit counters."""
+
+    def __init__(self, path, candidates_path, reload_interval, max_candidates):
+        self.path = path
+        self.candidates_path = candidates_path
+        self.reload_interval = reload_interval
+        self.max_candidates = max_candidates
+        self.tables = {table: {} for table in SYLLABLE_EXCEPTION_TABLES}
+        self.hits = {table: {} for table in SYLLABLE_EXCEPTION_TABLES}
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+        # Hash of the loaded tables, part of analysis_version()
+        self.fingerprint = None
+        self._mtime = None
+        self._next_check = 0.0
+        # Set by the writer thread once the candidates file holds max_candidates words
+        self.candidates_full = max_candidates <= 0
+        self.candidates_dropped = 0
+        self._queue = None
+        self._queue_pid = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the exceptions file, keeping the current tables if it is missing or invalid."""
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding='utf-8') as exceptions_file:
+                data = json.load(exceptions_file)
+            tables = {}
+            for table in SYLLABLE_EXCEPTION_TABLES:
+                entries = data.get(table, {})
+                if not isinstance(entries, dict) or not all(
+                    isinstance(syllables, list) and all(isinstance(s, str) for s in syllables)
+                    for syllables in entries.values()
+                ):
+                    raise ValueError(f"'{table}' must map words to lists of syllables")
+                tables[table] = dict(entries)
+            fingerprint = hashlib.sha256(
+                json.dumps(tables, ensure_ascii=False, sort_keys=True).encode('utf-8')
+            ).hexdigest()[:16]
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load syllable exceptions from %s: %s", self.path, e)
+            with self._lock:
+                self.last_error = str(e)
+                # Do not retry an unchanged broken file on every check
+                self._mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            return False
+        
+        with self._lock:
+            reloaded = self.loaded_at is not None
+            self.tables = tables
+            self.fingerprint = fingerprint
+            # Keep counters for entries that are still present
+            self.hits = {
+                table: {word: count for word, count in self.hits[table].items() if word in tables[table]}
+                for table in SYLLABLE_EXCEPTION_TABLES
+            }
+            self._mtime = mtime
+            self.loaded_at = time.time()
+            self.last_error = None
+            if reloaded:
+                self.reloads += 1
+        if reloaded:
+            logger.info("Reloaded syllable exceptions from %s", self.path)
+            # Cached analyses were split with the old table
+            invalidate_analysis_cache()
+        return True
+
+    def maybe_reload(self):
+        """Reload the file if it changed; checked at most once per reload interval."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if self.loaded_at is None or mtime != self._mtime:
+            self.load()
+
+    def lookup(self, table, word):
+        """Return a copy of the exception's syllables for ``word``, or None."""
+        self.maybe_reload()
+        syllables = self.tables[table].get(word)
+        if syllables is None:
+            return None
+        with self._lock:
+            self.hits[table][word] = self.hits[table].get(word, 0) + 1
+        return list(syllables)
+
+    def record_candidate(self, word, tltk_syllables, algorithm_syllables):
+        """Queue a word whose tltk and rule-based splits disagree for the candidates file.
+
+        Returns at once: a background thread appends each word once, up to
+        ``max_candidates`` words. Returns False if the entry was dropped.
+        """
+        if self.candidates_full:
+            return False
+        entry = {
+            'word': word,
+            'tltk_syllables': tltk_syllables,
+            'algorithm_syllables': algorithm_syllables,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        }
+        try:
+            self._candidate_queue().put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.candidates_dropped += 1
+            return False
+        return True
+
+    def _candidate_queue(self):
+        """Return this process's candidate queue, starting its writer thread on first use."""
+        with self._lock:
+            if self._queue_pid != os.getpid():
+                self._queue = queue.Queue(maxsize=SYLLABLE_CANDIDATES_QUEUE_SIZE)
+                self._queue_pid = os.getpid()
+                self._writer = threading.Thread(
+                    target=self._write_candidates, args=(self._queue,), name='syllable-candidates', daemon=True
+                )
+                self._writer.start()
+            return self._queue
+
+    def _write_candidates(self, entries):
+        """Writer thread: append queued candidates not already in the file, until the cap is reached."""
+        known = {entry.get('word') for entry in self.candidates()}
+        while True:
+            entry = entries.get()
+            if entry is None:
+                return
+            word = entry['word']
+            if word in known:
+                continue
+            if len(known) >= self.max_candidates:
+                if not self.candidates_full:
+                    self.candidates_full = True
+                    logger.warning("%s holds %d syllable candidates; recording no more",
+                                   self.candidates_path, self.max_candidates)
+                continue
+            known.add(word)
+            try:
+                os.makedirs(os.path.dirname(self.candidates_path), exist_ok=True)
+                # One short append per line, so workers can share the file
+                with open(self.candidates_path, 'a', encoding='utf-8') as candidates_file:
+                    candidates_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            except OSError as e:
+                logger.warning("Could not record syllable candidate '%s': %s", word, e)
+                continue
+            logger.info("Recorded '%s' as a syllable exception candidate", word)
+
+    def flush_candidates(self, timeout=5):
+        """Write out the queued candidates and stop the writer thread, e.g. before a script exits."""
+        with self._lock:
+            if self._queue_pid != os.getpid():
+                return
+            entries, writer = self._queue, self._writer
+            self._queue_pid = None
+        entries.put(None)
+        writer.join(timeout)
+
+    def candidates(self):
+        """Return the recorded candidates, oldest first."""
+        entries = []
+        try:
+            with open(self.candidates_path, encoding='utf-8') as candidates_file:
+                for line in candidates_file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return entries
+
+    def stats(self):
+        """Return the table sizes, per-entry hit counts and reload state."""
+        self.maybe_reload()
+        with self._lock:
+            return {
+                'path': self.path,
+                'loaded_at': self.loaded_at,
+                'reloads': self.reloads,
+                'last_error': self.last_error,
+                'fingerprint': self.fingerprint,
+                'entries': {table: len(entries) for table, entries in self.tables.items()},
+                'hits': {table: dict(sorted(hits.items(), key=lambda item: -item[1]))
+                         for table, hits in self.hits.items()},
+                'candidates_path': self.candidates_path,
+                'candidates_max': self.max_candidates,
+                'candidates_full': self.candidates_full,
+                'candidates_dropped': self.candidates_dropped
+            }
+
+syllable_exceptions = SyllableExceptions(
+    SYLLABLE_EXCEPTIONS_PATH, SYLLABLE_CANDIDATES_PATH, SYLLABLE_EXCEPTIONS_RELOAD_INTERVAL, SYLLABLE_CANDIDATES_MAX
+)
+# Candidates still queued when a script exits would be lost
+atexit.register(syllable_exceptions.flush_candidates)
+
+def attempt_smart_splitting(word, target_syllable_count, tltk_syllables=None, algorithm_syllables=None):
+    """Attempt to intelligently split a word to match the target syllable count."""
+    # Record the mismatch as a candidate for the exceptions file
+    # This ensures we learn from tltk's accuracy
+    if tltk_syllables is not None:
+        syllable_exceptions.record_candidate(word, tltk_syllables, algorithm_syllables)
+    
+    # This is a placeholder - in a more sophisticated implementation,
+    # we could try to algorithmically adjust the splitting
+    # For now, we'll fall back to the original algorithm
+    return split_into_syllables_algorithm(word)
+
+def split_into_syllables(word, context=None):
+    """Split a Thai word into syllables using tltk for syllable count, then our algorithm for actual splitting."""
+    if not word or not word.strip():
+        return []
+    
+    word = word.strip()
+    
+    # Special cases where we override tltk's result
+    override = syllable_exceptions.lookup('split_overrides', word)
+    if override is not None:
+        return override
+    
+    # Get syllable count from tltk reading (most accurate)
+    try:
+        tltk_syllables = get_analysis_context(word, context).reading_syllables
+        tltk_syllable_count = len(tltk_syllables)
+        
+        # If tltk gives us 1 syllable, return the whole word
+        if tltk_syllable_count == 1:
+            return [word]
+            
+        # If tltk gives us multiple syllables, use our algorithm to split the actual written word
+        # but verify we get the same number of syllables
+        our_syllables = split_into_syllables_algorithm(word)
+        
+        # If our algorithm gives the same count, use it
+        if len(our_syllables) == tltk_syllable_count:
+            return tltk_syllables
+        else:
+            # tltk is correct, so we need to fix our splitting
+            logger.debug("Syllable count mismatch for '%s': tltk=%d, our=%d (tltk syllables: %s, our syllables: %s)",
+                         word, tltk_syllable_count, len(our_syllables), tltk_syllables, our_syllables)
+            
+            # Try to intelligently split based on tltk's syllable count
+            # This is a fallback that attempts to match tltk's count
+            return attempt_smart_splitting(word, tltk_syllable_count, tltk_syllables, our_syllables)
+            
+    except Exception as e:
+        logger.warning("tltk reading failed for '%s': %s", word, e)
+    
+    # Fall back to our original algorithm
+    return split_into_syllables_algorithm(word)
+
+def split_into_syllables_algorithm(word):
+    """Original syllable splitting algorithm."""
+    # Explicit rule: consonant-อ-consonant pattern (single syllable)
+    if is_consonant_o_consonant_pattern(word):
+        return [word]
+    
+    # Known exceptions
+    override = syllable_exceptions.lookup('algorithm_overrides', word)
+    if override is not None:
+        return override
+    
+    # Handle English words (single syllable)
+    if word.isascii() and word.isalpha():
+        return [word]
+    # Use improved look-back algorithm for syllable splitting
+    return improved_syllable_split(word)
+
+# Linear-time syllable segmentation
+# =================================
+#
+# find_syllable_end used to re-run every COMPLEX_VOWELS regex against the
+# remaining suffix at every position, and to rescan ahead for the next vowel
+# at every consonant, which made segmentation quadratic (or worse) in the
+# input length. SyllableScanner precomputes both answers for the whole word in
+# linear time, so the segmenter below reads them from tables as it walks the
+# word once.
+
+class SyllableScanner:
+    """Per-word lookup tables for find_syllable_end.
+
+    ``complex_vowel_end(i)`` gives the end of the complex vowel that
+    ``re.search`` over ``word[i:]`` would find first (in COMPLEX_VOWELS
+    order), and ``has_vowel_from(i)`` tells whether any vowel occurs at or
+    after position i.
+    """
+
+    def __init__(self, word):
+        self.word = word
+        lines = word_lines(word)
+        
+        self._matches = []
+        for compiled in COMPLEX_VOWEL_MATCHER.compiled:
+            if compiled.kind == 'regex':
+                self._matches.append((compiled, None, None))
+                continue
+            starts, ends = compiled.find_matches(word, lines)
+            if starts:
+                self._matches.append((compiled, starts, ends))
+        
+        # _vowel_from[i] is True if a vowel occurs at position i or later
+        self._vowel_from = [False] * (len(word) + 1)
+        for j in range(len(word) - 1, -1, -1):
+            char = word[j]
+            self._vowel_from[j] = (self._vowel_from[j + 1] or char in SIMPLE_VOWELS or is_vowel_symbol(char) or
+                                   (char == 'อ' and not is_zero_consonant(word, j)))
+
+    def complex_vowel_end(self, i):
+        """Return where the first matching complex vowel searched from ``i`` ends, or -1."""
+        for compiled, starts, ends in self._matches:
+            if starts is None:
+                if compiled.anchored:
+                    match = compiled.regex.match(self.word, i)
+                else:
+                    match = compiled.regex.search(self.word, i)
+                if match:
+                    return match.end()
+                continue
+            index = bisect.bisect_left(starts, i)
+            if index < len(starts):
+                return ends[index]
+        return -1
+
+    def has_vowel_from(self, i):
+        """Check if any vowel occurs at position ``i`` or later."""
+        return self._vowel_from[min(i, len(self.word))]
+
+def find_syllable_end(word, start, scanner=None):
+    """Find where the current syllable ends using a corrected approach.
+
+    Pass a SyllableScanner for ``word`` when calling repeatedly on the same word.
+    """
+    if scanner is None:
+        scanner = SyllableScanner(word)
+    i = start
+    
+    # Build the syllable character by character
+    while i < len(word):
+        char = word[i]
+        
+        # Check for complex vowels first (they take priority over everything else)
+        complex_vowel_end = scanner.complex_vowel_end(i)
+        if complex_vowel_end != -1:
+            # Move past the entire complex vowel
+            i = complex_vowel_end
+            continue
+        
+        # If we're at the start and it's a vowel symbol, include it
+        if i == start and is_vowel_symbol(char):
+            i += 1
+            # Include the following consonant if present
+            if i < len(word) and is_thai_consonant(word[i]):
+                i += 1
+            # Check if there's another vowel symbol after this
+            if i < len(word) and is_vowel_symbol(word[i]):
+                # There's another vowel symbol, so current syllable ends here
+                break
+            continue
+        
+        # If we're at the start and it's a consonant, include it (and check for clusters)
+        if i == start and is_thai_consonant(char):
+            if is_consonant_cluster_start(word, i):
+                i += 2  # Include both consonants in cluster
+            else:
+                i += 1  # Include single consonant
+            continue
+        
+        # If it's a vowel symbol (not at start), this starts a new syllable
+        if is_vowel_symbol(char) and i > start:
+            break
+        
+        # If it's a tone mark, include it
+        if char_flags(char) & CHAR_TONE_MARK:
+            i += 1
+            # After a tone mark, check if the next character starts a new syllable
+            if i < len(word):
+                next_char = word[i]
+                # If next character is a consonant followed by a vowel, it starts a new syllable
+                if (is_thai_consonant(next_char) and
+                    i + 1 < len(word) and 
+                    (word[i + 1] in SIMPLE_VOWELS or is_vowel_symbol(word[i + 1]))):
+                    # Next character starts a new syllable, so current syllable ends here
+                    break
+            continue
+        
+        # If it's a simple vowel, include it
+        if char in SIMPLE_VOWELS:
+            i += 1
+            continue
+        
+        # Special case: 'ว' functioning as a vowel (ua sound)
+        if char == 'ว' and i + 1 < len(word) and is_thai_consonant(word[i + 1]):
+            # This is 'ว' functioning as a vowel, include both 'ว' and the following consonant
+            i += 2  # Skip both 'ว' and the next consonant
+            continue
+        
+        # Special case: 'อ' functioning as a vowel (not zero consonant)
+        if char == 'อ' and not is_zero_consonant(word, i):
+            # Check if this is a consonant-อ-consonant pattern
+            if i > 0 and i < len(word) - 1:
+                prev_char = word[i-1]
+                next_char = word[i+1]
+                if (is_thai_consonant(prev_char) and
+                    is_thai_consonant(next_char)):
+                    # This is consonant-อ-consonant pattern, 'อ' is a vowel
+                    # Include both 'อ' and the following consonant
+                    i += 2  # Skip both 'อ' and the next consonant
+                    continue
+            # For other cases, treat 'อ' as vowel if not zero consonant
+            i += 1
+            continue
+        
+        # If it's a consonant, check if there's another vowel after it
+        if is_thai_consonant(char):
+            # Look ahead to see if there's another vowel
+            if scanner.has_vowel_from(i + 1):
+                # Check if this consonant is directly followed by a vowel (start of new syllable)
+                # or if there are consonants in between (final consonant of current syllable)
+                if i + 1 < len(word) and (word[i + 1] in SIMPLE_VOWELS or 
+                    is_vowel_symbol(word[i + 1]) or
+                    (word[i + 1] == 'อ' and not is_zero_consonant(word, i + 1))):
+                    # This consonant is directly followed by a vowel, so it starts a new syllable
+                    break
+                else:
+                    # This consonant is followed by other consonants before the next vowel,
+                    # so it's the final consonant of the current syllable
+                    i += 1
+                    break
+            else:
+                # No more vowels, include this consonant as final consonant
+                i += 1
+                break
+        else:
+            # Unknown character, stop here
+            break
+    
+    return i
+
+def clean_syllable(syllable):
+    """Clean a syllable by removing ์ (thanthakhat) symbols."""
+    # Remove ์ symbols from the end of syllables
+    return syllable.rstrip('์')
+
+def improved_syllable_split(word):
+    """Improved syllable splitting using look-back approach."""
+    syllables = []
+    i = 0
+    scanner = SyllableScanner(word)
+    
+    while i < len(word):
+        # Find where this syllable ends
+        syllable_end = find_syllable_end(word, i, scanner)
+        
+        # Prevent infinite loop - if end <= i, advance by 1
+        if syllable_end <= i:
+            syllable_end = i + 1
+        
+        syllable = word[i:syllable_end]
+        
+        # Check if this syllable has implied vowels and needs special handling
+        if has_implied_vowel(syllable):
+            implied_info = get_implied_vowel_info(syllable)
+            if implied_info and implied_info['type'] == 'multi_consonant':
+                # For multi-consonant words, split at the first consonant boundary
+                # e.g., "ผสม" -> ["ผ", "สม"]
+                if len(syllable) >= 3:
+                    first_syllable = syllable[0]
+                    second_syllable = syllable[1:]
+                    syllables.append(clean_syllable(first_syllable))
+                    syllables.append(clean_syllable(second_syllable))
+                    i = syllable_end
+                    continue
+        
+        syllables.append(clean_syllable(syllable))
+        i = syllable_end
+    
+    return syllables if syllables else [word]
+
+# Precomputed tone table
+# ======================
+#
+# analyze_syllable() depends only on the syllable, so `python tone_table.py`
+# runs the rules below over every syllable shape once and stores the results.
+# Syllables in the table skip the rules; anything else, or every syllable when
+# the table is missing or was built from different rules, goes through them.
+
+TONE_TABLE_PATH = os.environ.get('TONE_TABLE_PATH', os.path.join(CACHE_DIR, 'tone_table.bin'))
+TONE_TABLE_ENABLED = os.environ.get('TONE_TABLE_ENABLED', 'true').lower() == 'true'
+
+def file_fingerprint(path):
+    """Return a short hash of a file's contents."""
+    with open(path, 'rb') as source:
+        return hashlib.sha256(source.read()).hexdigest()[:16]
+
+def compute_rules_fingerprint():
+    """Return a hash of this module's source; every rule the table captures lives here."""
+    return file_fingerprint(os.path.abspath(__file__))
+
+RULES_FINGERPRINT = compute_rules_fingerprint()
+
+_tone_table = None
+_tone_table_checked = False
+_tone_table_lock = threading.Lock()
+
+def get_tone_table():
+    """Return the precomputed tone table, or None if it is disabled, missing or stale (checked once)."""
+    global _tone_table, _tone_table_checked
+    if _tone_table_checked:
+        return _tone_table
+    with _tone_table_lock:
+        if not _tone_table_checked:
+            if TONE_TABLE_ENABLED and os.path.exists(TONE_TABLE_PATH):
+                try:
+                    table = tone_table.ToneTable(TONE_TABLE_PATH)
+                    if table.fingerprint == RULES_FINGERPRINT:
+                        _tone_table = table
+                        logger.info("Loaded tone table %s (%d syllables)", TONE_TABLE_PATH, len(table))
+                    else:
+                        logger.warning("Tone table %s was built from different rules; "
+                                       "run python tone_table.py to rebuild it", TONE_TABLE_PATH)
+                        table.close()
+                except tone_table.ToneTableError as e:
+                    logger.warning("Tone table unavailable: %s", e)
+            _tone_table_checked = True
+    return _tone_table
+
+def build_tone_table():
+    """Build the tone table at TONE_TABLE_PATH from the current rules and start using it."""
+    global _tone_table, _tone_table_checked
+    with _tone_table_lock:
+        count, skipped, size = tone_table.build(TONE_TABLE_PATH)
+        logger.info("Built tone table %s: %d syllables, %.1f MB", TONE_TABLE_PATH, count, size / (1024 * 1024))
+        # Unmap the table the new file replaces; get_tone_table() maps the new one
+        if _tone_table is not None:
+            _tone_table.close()
+            _tone_table = None
+        _tone_table_checked = False
+    return get_tone_table()
+
+# Syllable analysis
+# =================
+#
+# The rules produce codes: the tone, the (effective) consonant class, vowel
+# length, syllable type and which rule decided the tone. The English
+# explanation is only rendered from them when it is read.
+
+RULE_EXPLANATIONS = {
+    'mid_mai_ek': "Mid-class consonant + mai ek (อ่) = Low tone",
+    'high_mai_ek': "High-class consonant + mai ek (อ่) = Low tone",
+    'low_mai_ek': "Low-class consonant + mai ek (อ่) = Falling tone",
+    'mid_mai_tho': "Mid-class consonant + mai tho (อ้) = Falling tone",
+    'high_mai_tho': "High-class consonant + mai tho (อ้) = Falling tone",
+    'low_mai_tho': "Low-class consonant + mai tho (อ้) = High tone",
+    'mai_tri': "Any consonant + mai tri (อ๊) = High tone",
+    'mai_chattawa': "Any consonant + mai chattawa (อ๋) = Rising tone",
+    'single_implied': "Single consonant with implied vowel = Low tone",
+    'wat': "วัส pattern (ว + ั + ส with implied vowel) = Low tone",
+    'mid_live': "Mid-class consonant + live syllable ({vowel_length} vowel) = Mid tone",
+    'mid_dead': "Mid-class consonant + dead syllable ({vowel_length} vowel) = Low tone",
+    'high_live': "High-class consonant + live syllable ({vowel_length} vowel) = Rising tone",
+    'high_dead': "High-class consonant + dead syllable ({vowel_length} vowel) = Low tone",
+    'low_live': "Low-class consonant + live syllable ({vowel_length} vowel) = Mid tone",
+    'low_dead_short': "Low-class consonant + dead syllable (short vowel) = High tone",
+    'low_dead_long': "Low-class consonant + dead syllable (long vowel) = Falling tone",
+}
+
+class SyllableAnalysis(Record):
+    """Tone and codes of one syllable; ``position`` counts from 1 within a multi-syllable word.
+
+    Syllables analyzed by the rules keep what their explanation is rendered
+    from (initial consonant, primary vowel, tone marks); those found in the
+    tone table have none of it and read the explanation from the table.
+    A syllable the rules could not analyze carries a fixed ``message``.
+    """
+
+    __slots__ = ('syllable', 'tone', 'consonant_class', 'vowel_length', 'syllable_type', 'rule', 'position',
+                 'consonant', 'ho_hip_leading', 'vowel', 'tone_marks', 'message')
+    _fields = ('syllable', 'tone', 'explanation', 'consonant_class', 'vowel_length', 'syllable_type', 'rule',
+               'position')
+    _optional = frozenset(['consonant_class', 'vowel_length', 'syllable_type', 'rule', 'position'])
+    _verbose = frozenset(['explanation'])
+
+    def __init__(self, syllable, tone, consonant_class=None, vowel_length=None, syllable_type=None, rule=None,
+                 position=None, consonant=None, ho_hip_leading=False, vowel=None, tone_marks=(), message=None):
+        self.syllable = syllable
+        self.tone = tone
+        self.consonant_class = consonant_class
+        self.vowel_length = vowel_length
+        self.syllable_type = syllable_type
+        self.rule = rule
+        self.position = position
+        self.consonant = consonant
+        self.ho_hip_leading = ho_hip_leading
+        self.vowel = vowel
+        self.tone_marks = tone_marks
+        self.message = message
+
+    @property
+    def explanation(self):
+        return render_syllable_explanation(self)
+
+def render_syllable_explanation(analysis):
+    """Render the English explanation of a SyllableAnalysis."""
+    if analysis.message is not None:
+        return analysis.message
+    if analysis.consonant is None:
+        # From the tone table, which stores the rendered explanation
+        table = get_tone_table()
+        entry = table.lookup(analysis.syllable) if table is not None else None
+        if entry is not None:
+            return entry[-1]
+        analysis = analyze_syllable_rules(analysis.syllable)
+        if analysis.message is not None:
+            return analysis.message
+    
+    if analysis.ho_hip_leading:
+        explanation_parts = [f"Initial consonant: '{analysis.consonant}' (Class: low class consonant, but ห leading consonant makes it high-class for tone rules)"]
+    else:
+        explanation_parts = [f"Initial consonant: '{analysis.consonant}' (Class: {analysis.consonant_class})"]
+    vowel_description = describe_vowel(analysis.vowel) if analysis.vowel is not None else "no vowels identified"
+    explanation_parts.append(f"Vowel: {vowel_description}")
+    explanation_parts.append(f"Syllable type: {analysis.syllable_type}")
+    if analysis.tone_marks:
+        explanation_parts.append(f"Tone marks found: {', '.join(analysis.tone_marks)}")
+    if analysis.rule is not None:
+        explanation_parts.append("Rule: " + RULE_EXPLANATIONS[analysis.rule].format(vowel_length=analysis.vowel_length))
+    return " | ".join(explanation_parts)
+
+def analyze_syllable(syllable):
+    """Analyze a single syllable and return its SyllableAnalysis, from the tone table when it is there."""
+    table = get_tone_table()
+    if table is not None:
+        entry = table.lookup(syllable, explanation=False)
+        metrics.cache_lookup('tone_table', entry is not None)
+        if entry is not None:
+            tone, syllable_type, consonant_class, vowel_length, rule, _ = entry
+            return SyllableAnalysis(syllable, tone, consonant_class, vowel_length, syllable_type, rule)
+    return analyze_syllable_rules(syllable)
+
+def analyze_single_syllable(syllable):
+    """Analyze a single syllable and return its tone and explanation."""
+    analysis = analyze_syllable(syllable)
+    return analysis.tone, analysis.explanation
+
+def analyze_single_syllable_rules(syllable):
+    """Run the tone rules on a single syllable and return its tone and explanation."""
+    analysis = analyze_syllable_rules(syllable)
+    return analysis.tone, analysis.explanation
+
+def analyze_syllable_rules(syllable):
+    """Run the tone rules on a single syllable and return its SyllableAnalysis."""
+    if not syllable:
+        return SyllableAnalysis(syllable, "Unknown", message="Empty syllable")
+    
+    # Find the initial consonant (handling vowel symbols)
+    initial_consonant, consonant_pos = find_initial_consonant(syllable)
+    
+    if not initial_consonant:
+        return SyllableAnalysis(syllable, "Unknown", message=f"Could not find a consonant in '{syllable}'")
+    
+    consonant_class = get_consonant_class(initial_consonant)
+    
+    # Check for ห (ho hip) leading consonant + low-class sonorant
+    # This changes the tone class to high-class for tone rule purposes
+    is_ho_hip_leading = False
+    
+    # Check for ห at any position followed by a low-class sonorant
+    for i in range(len(syllable) - 1):
+        if syllable[i] == 'ห':
+            next_char = syllable[i + 1]
+            if char_flags(next_char) & CHAR_HO_NAM_SONORANT and consonant_class == 'low':
+                is_ho_hip_leading = True
+                consonant_class = 'high'  # Override to high-class for tone rules
+                break
+    
+    if not consonant_class:
+        # Check if it's an obsolete consonant
+        if initial_consonant == 'ฅ':
+            message = f"'{initial_consonant}' (kho khon) is an obsolete Thai consonant that has been replaced by 'ค' (kho khwai) in modern Thai."
+        else:
+            message = f"'{initial_consonant}' is not a recognized Thai consonant."
+        return SyllableAnalysis(syllable, "Unknown", message=message)
+    
+    # Check for tone marks
+    tone_marks = has_tone_mark(syllable)
+    
+    # Identify vowels; the one describing the syllable is picked now, its description only when needed
+    vowels = identify_vowels(syllable)
+    primary_vowel = select_primary_vowel(vowels)
+    
+    # Get vowel length for rule explanations
+    vowel_length = "long"  # default
+    if vowels:
+        vowel_length = vowels[0].info['type']
+    
+    # Classify syllable type
+    syllable_type = classify_syllable_type(syllable)
+    
+    # Determine tone based on rules
+    tone = "Unknown"
+    rule = None
+    
+    if tone_marks:
+        # Tone marks override other rules
+        if '่' in tone_marks:  # mai ek
+            if consonant_class == 'mid':
+                tone, rule = "Low Tone", 'mid_mai_ek'
+            elif consonant_class == 'high':
+                tone, rule = "Low Tone", 'high_mai_ek'
+            elif consonant_class == 'low':
+                tone, rule = "Falling Tone", 'low_mai_ek'
+                
+        elif '้' in tone_marks:  # mai tho
+            if consonant_class == 'mid':
+                tone, rule = "Falling Tone", 'mid_mai_tho'
+            elif consonant_class == 'high':
+                tone, rule = "Falling Tone", 'high_mai_tho'
+            elif consonant_class == 'low':
+                tone, rule = "High Tone", 'low_mai_tho'
+                
+        elif '๊' in tone_marks:  # mai tri
+            tone, rule = "High Tone", 'mai_tri'
+            
+        elif '๋' in tone_marks:  # mai chattawa
+            tone, rule = "Rising", 'mai_chattawa'
+    else:
+        # No tone marks - use default tone rules
+        
+        # Special case: single consonant with implied vowel gets Low tone
+        if len(syllable) == 1 and has_implied_vowel(syllable):
+            tone, rule = "Low Tone", 'single_implied'
+        # Special case: วัส pattern gets Low tone (ว + ั + ส with implied vowel after ส)
+        elif syllable == 'วัส':
+            tone, rule = "Low Tone", 'wat'
+        elif consonant_class == 'mid':
+            if syllable_type == 'live':
+                tone, rule = "Mid Tone", 'mid_live'
+            else:  # dead
+                tone, rule = "Low Tone", 'mid_dead'
+                
+        elif consonant_class == 'high':
+            if syllable_type == 'live':
+                tone, rule = "Rising Tone", 'high_live'
+            else:  # dead
+                tone, rule = "Low Tone", 'high_dead'
+                
+        elif consonant_class == 'low':
+            if syllable_type == 'live':
+                tone, rule = "Mid Tone", 'low_live'
+            else:  # dead
+                if vowel_length == 'short':
+                    tone, rule = "High Tone", 'low_dead_short'
+                else:  # long vowel
+                    tone, rule = "Falling Tone", 'low_dead_long'
+    
+    return SyllableAnalysis(
+        syllable, tone, consonant_class, vowel_length, syllable_type, rule,
+        consonant=initial_consonant, ho_hip_leading=is_ho_hip_leading, vowel=primary_vowel,
+        tone_marks=tone_marks
+    )
+
+def determine_tone_with_tltk_hybrid(word, context=None):
+    """Use tltk for syllable segmentation but our original logic for tone analysis."""
+    if not word:
+        return ToneResult("No word provided", message="Please enter a Thai word.")
+    
+    # Clean the word - remove non-Thai characters (keep only Thai characters and spaces)
+    import re
+    thai_pattern = re.compile(r'[\u0E00-\u0E7F\s]')
+    cleaned_word = ''.join(thai_pattern.findall(word)).strip()
+    
+    if not cleaned_word:
+        return ToneResult("Unknown", message="No Thai characters found in the word.")
+    
+    context = get_analysis_context(cleaned_word, context)
+    
+    try:
+        # Use tltk for accurate syllable segmentation
+        tltk_syllables = context.reading_syllables
+        
+        if len(tltk_syllables) == 1:
+            # Single syllable - use our original analysis with the original word
+            analysis = analyze_syllable(cleaned_word)
+            return ToneResult(analysis.tone, syllable=analysis)
+        else:
+            # Multiple syllables - use tltk syllables but analyze original word segments
+            syllable_analyses = []
+            
+            # For multi-syllable words, we need to map tltk syllables back to original word
+            # For now, use tltk syllables but analyze each as if it were the original word
+            for i, tltk_syllable in enumerate(tltk_syllables):
+                # Use our original analysis for each syllable
+                analysis = analyze_syllable(tltk_syllable)
+                analysis.position = i + 1
+                syllable_analyses.append(analysis)
+            
+            # The combined explanation is rendered from the syllables' tones when read
+            return ToneResult("Multi-syllable", syllables=syllable_analyses)
+            
+    except Exception as e:
+        logger.warning("tltk reading failed for '%s': %s", cleaned_word, e)
+        # Fall back to original method
+        return determine_tone_original(cleaned_word, context)
+
+def determine_tone_original(word, context=None):
+    """Original tone determination method (fallback)."""
+    # Split into syllables
+    syllables = split_into_syllables(word, context)
+    
+    if len(syllables) == 1:
+        # Single syllable - return as before
+        analysis = analyze_syllable(syllables[0])
+        return ToneResult(analysis.tone, syllable=analysis)
+    else:
+        # Multiple syllables - analyze each one
+        syllable_analyses = []
+        
+        for i, syllable in enumerate(syllables):
+            analysis = analyze_syllable(syllable)
+            analysis.position = i + 1
+            syllable_analyses.append(analysis)
+        
+        return ToneResult("Multi-syllable", syllables=syllable_analyses)
+
+def determine_tone(word, context=None):
+    """Determine the tone(s) of a Thai word based on tone rules, as a ToneResult.
+
+    ``context`` is an optional WordAnalysisContext for the word, letting the
+    caller share tltk output with the romanization, IPA and reading stages.
+    """
+    # Use hybrid tltk method by default
+    return determine_tone_with_tltk_hybrid(word, context)
+
+# Analysis stages
+# ===============
+#
+# A word's stages (tone, romanization, IPA, reading) only share the tltk
+# context, so they can run concurrently, each with its own deadline. Until
+# tltk's models are loaded the stages wait for them without a deadline.
+
+STAGE_TIMEOUT = float(os.environ.get('STAGE_TIMEOUT', 10))
+
+def run_stages(stages, executor=None):
+    """Run independent stages and return ({name: result}, [names that timed out]).
+
+    ``stages`` maps a name to ``(function, timeout, fallback)``. With an
+    executor the stages run concurrently and a stage still running after its
+    timeout (counted from submission) yields ``fallback``; without one they
+    run in order in the calling thread. Timeouts only apply once tltk is
+    loaded. Exceptions raised by a stage propagate.
+    """
+    if executor is None:
+        return {name: function() for name, (function, _, _) in stages.items()}, []
+    
+    deadlines = tltk_loaded.is_set()
+
+    started = time.monotonic()
+    futures = {name: executor.submit(function) for name, (function, _, _) in stages.items()}
+    results = {}
+    timed_out = []
+    for name, future in futures.items():
+        _, timeout, fallback = stages[name]
+        if not deadlines:
+            results[name] = future.result()
+            continue
+        try:
+            results[name] = future.result(timeout=max(0, started + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            logger.warning("Stage '%s' timed out after %ss", name, timeout)
+            results[name] = fallback
+            timed_out.append(name)
+    return results, timed_out
+
+class StageTimings:
+    """Wall-clock durations of a request's stages, in the order they were first recorded.
+
+    Stages may record from executor threads. Repeated stages add up, and
+    concurrent stages overlap, so the durations need not sum to 'total'.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._durations = {}  # name -> seconds
+        self._descriptions = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, description=None):
+        with self._lock:
+            self._durations[name] = self._durations.get(name, 0.0) + seconds
+            if description:
+                self._descriptions[name] = description
+
+    @contextlib.contextmanager
+    def measure(self, name, description=None):
+        """Time the body of a ``with`` block as stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, description)
+
+    def wrap(self, name, function):
+        """Return ``function`` timed as stage ``name``, for running on an executor."""
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            with self.measure(name):
+                return function(*args, **kwargs)
+        return timed
+
+    def as_dict(self):
+        """Return {stage: milliseconds}, plus the 'total' so far."""
+        with self._lock:
+            timings = {name: round(seconds * 1000, 3) for name, seconds in self._durations.items()}
+        timings['total'] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
+
+    def header(self):
+        """Format the timings as a Server-Timing header value."""
+        with self._lock:
+            descriptions = dict(self._descriptions)
+        metrics = []
+        for name, milliseconds in self.as_dict().items():
+            metric = f"{name};dur={milliseconds:.1f}"
+            if name in descriptions:
+                metric += f';desc="{descriptions[name]}"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+def timed_stage(timings, name, function):
+    """Return ``function`` timed as stage ``name`` when ``timings`` is given, else unchanged."""
+    return function if timings is None else timings.wrap(name, function)
+
+def analyze_thai_word(thai_word, executor=None, timings=None):
+    """Run the offline analysis pipeline (tone, romanization, IPA, reading) for a Thai word.
+
+    Returns a WordAnalysis.
+
+    Pass an executor to run the stages concurrently (see run_stages); an
+    analysis with stages that timed out lists them under 'timed_out_stages'.
+    Pass a StageTimings to record how long each stage took.
+    """
+    # One context per word so tltk's g2p runs once for all stages
+    context = WordAnalysisContext(thai_word)
+    stages, timed_out = run_stages({
+        'tone': (timed_stage(timings, 'tone', functools.partial(determine_tone, thai_word, context)),
+                 STAGE_TIMEOUT, ToneResult('Unknown', message='Tone analysis timed out.')),
+        'romanized': (timed_stage(timings, 'romanized', functools.partial(get_romanization, thai_word, context)),
+                      STAGE_TIMEOUT, "Unable to romanize"),
+        'phonetic_ipa': (timed_stage(timings, 'phonetic_ipa', functools.partial(get_phonetic_ipa, thai_word, context)),
+                         STAGE_TIMEOUT, "Unable to generate IPA"),
+        'phonetic_reading': (timed_stage(timings, 'phonetic_reading',
+                                         functools.partial(get_phonetic_reading, thai_word, context)),
+                             STAGE_TIMEOUT, "Unable to generate reading")
+    }, executor)
+    result = stages['tone']
+    romanized = stages['romanized']
+    
+    # Use romanization to help with syllable analysis
+    romanization_analysis = timed_stage(timings, 'romanization_analysis', analyze_romanization_for_syllables)(
+        thai_word, romanized
+    )
+    
+    # Override romanization syllable count with actual syllable count from Thai analysis
+    if result.is_multi_syllable:
+        romanization_analysis.syllable_count = len(result.syllables)
+    
+    return WordAnalysis(
+        word=thai_word,
+        result=result,
+        romanized=romanized,
+        phonetic_ipa=stages['phonetic_ipa'],
+        phonetic_reading=stages['phonetic_reading'],
+        romanization_analysis=romanization_analysis,
+        timed_out_stages=timed_out or None
+    )
+
+# Analysis cache
+# ==============
+#
+# Everything analyze_thai_word() returns is deterministic for a given word and
+# rule set, so full analyses are kept in a bounded in-process LRU cache.
+# Translation is not cached here because it depends on the network.
+
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', 10000))
+ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+class AnalysisCache:
+    """Thread-safe LRU cache bounded by entry count and by approximate size in bytes."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size in bytes)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.cache_lookup('analysis', False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.cache_lookup('analysis', True)
+            # Records are not modified once built; callers add fields with with_fields()
+            return entry[0]
+
+    def put(self, key, value):
+        """Store ``value`` under ``key``, evicting least recently used entries as needed."""
+        if not self.enabled:
+            return
+        size = len(key.encode('utf-8')) + len(to_json(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the rule tables change."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
+
+analysis_cache = AnalysisCache(ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_MAX_BYTES)
+
+def normalize_word(word):
+    """Normalize a word for use as a cache key."""
+    return unicodedata.normalize('NFC', word.strip())
+
+def library_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+# The romanization, IPA and phonetic reading come from these libraries
+ANALYSIS_LIBRARY_VERSIONS = {name: library_version(name) for name in ('pythainlp', 'tltk')}
+# The records decide which fields an analysis serializes to
+RECORDS_FINGERPRINT = file_fingerprint(analysis_records.__file__)
+
+def analysis_version():
+    """Return a short hash of everything an analysis depends on besides the word.
+
+    That is the rules, the syllable exceptions as currently loaded, the
+    result records and the library versions, so the version changes
+    whenever the analysis of a word, or its JSON, could.
+    """
+    syllable_exceptions.maybe_reload()
+    payload = json.dumps({
+        'rules': RULES_FINGERPRINT,
+        'records': RECORDS_FINGERPRINT,
+        'syllable_exceptions': syllable_exceptions.fingerprint,
+        'libraries': ANALYSIS_LIBRARY_VERSIONS
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def get_word_analysis(thai_word, executor=None, timings=None):
+    """Return analyze_thai_word() for a Thai word, using the analysis cache."""
+    key = normalize_word(thai_word)
+    analysis = analysis_cache.get(key)
+    if timings is not None:
+        timings.add('analysis_cache', 0.0, 'hit' if analysis is not None else 'miss')
+    if analysis is None:
+        analysis = analyze_thai_word(key, executor, timings)
+        # Partial analyses are not cached, so the next request retries the slow stage
+        if analysis.timed_out_stages is None:
+            analysis_cache.put(key, analysis)
+    return analysis
+
+def invalidate_analysis_cache():
+    """Invalidation hook: call whenever the rule tables or exception lists change."""
+    analysis_cache.invalidate()
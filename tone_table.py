@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Precomputed tone table.
+analyze_syllable() depends only on the syllable, and Thai has a finite set
+of syllable shapes (initial or cluster, vowel, final, tone mark). The build
+step writes every shape with the rule engine's codes (tone, syllable type,
+consonant class, vowel length, rule) and explanation into one binary file.
+Workers memory-map the file and look a syllable up with one hash probe
+instead of running the rules.
+
+    python tone_table.py                  # build TONE_TABLE_PATH (.cache/tone_table.bin)
+    python tone_table.py -o tone_table.bin
+    python tone_table.py --lookup ก่าง
+
+The file records a fingerprint of the rules it was built from; a table
+built from other rules is ignored, so the runtime falls back to the rule
+engine until the table is rebuilt.
+
+File layout (little-endian):
+
+    magic       8 bytes  b'THTONE02'
+    metadata    u32 length, then JSON (fingerprint, the names behind each code, counts)
+    slots       u32 count (a power of two), then u32 entry offsets (0 = empty),
+                addressed by crc32(key) with linear probing
+    entries     u8 key length, key (UTF-8), u32 result offset
+    results     u8 tone, u8 syllable type, u8 consonant class, u8 vowel length, u8 rule,
+                u16 explanation length, explanation (UTF-8)
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+MAGIC = b'THTONE02'
+
+_LENGTH = struct.Struct('<I')
+_OFFSET = struct.Struct('<I')
+_KEY_LENGTH = struct.Struct('<B')
+_RESULT = struct.Struct('<BBBBBH')
+
+# Codes stored per result, in order; each is an index into a list of names in the metadata
+CODES = ['tones', 'syllable_types', 'consonant_classes', 'vowel_lengths', 'rules']
+
+class ToneTableError(Exception):
+    """Raised for a missing, malformed or unreadable tone table file."""
+
+# Syllable shapes
+# ===============
+#
+# Initials are every modern consonant, the clusters and ห-led sonorants the
+# rules recognize, and อย. Vowel templates put the initial at C, the tone
+# mark at T (after any vowel written above the initial) and the final at F.
+
+TONE_MARK_OPTIONS = ['', '่', '้', '๊', '๋']
+
+CLUSTER_INITIALS = ['กร', 'กล', 'ขร', 'ขล', 'คร', 'คล', 'ตร', 'ปร', 'ปล', 'พร', 'พล']
+HO_LED_INITIALS = ['หง', 'หญ', 'หน', 'หม', 'หย', 'หร', 'หล', 'หว']
+O_LED_INITIALS = ['อย']
+
+FINAL_CONSONANTS = [
+    'ก', 'ข', 'ค', 'ฆ',                                    # k
+    'ง',                                                  # ng
+    'จ', 'ช', 'ซ', 'ฌ', 'ฎ', 'ฏ', 'ฐ', 'ฑ', 'ฒ', 'ด', 'ต',  # t
+    'ถ', 'ท', 'ธ', 'ศ', 'ษ', 'ส',
+    'น', 'ญ', 'ณ', 'ร', 'ล', 'ฬ',                          # n
+    'ม', 'ย', 'ว',
+    'บ', 'ป', 'พ', 'ฟ', 'ภ',                               # p
+]
+
+OPEN_TEMPLATES = [
+    'CT', 'CTะ', 'CTา', 'CิT', 'CีT', 'CึT', 'CืTอ', 'CุT', 'CูT', 'CTำ', 'CTอ',
+    'เCTะ', 'เCT', 'แCTะ', 'แCT', 'โCTะ', 'โCT', 'เCTาะ', 'เCTอ', 'เCTา',
+    'เCีTยะ', 'เCีTย', 'เCืTอะ', 'เCืTอ', 'CัTวะ', 'CัTว', 'ไCT', 'ใCT',
+]
+
+CLOSED_TEMPLATES = [
+    'CัTF', 'CTาF', 'CิTF', 'CีTF', 'CึTF', 'CืTF', 'CุTF', 'CูTF', 'CTF', 'CTอF', 'CTวF',
+    'เCTF', 'แCTF', 'โCTF', 'เCิTF', 'เCีTยF', 'เCืTอF',
+]
+
+# Short e and ae before a final are written with mai han-akat, which a tone mark replaces
+HAN_AKAT_TEMPLATES = ['เC็F', 'แC็F']
+
+def initial_consonants():
+    """Return the single initial consonants: every consonant with a class, except obsolete and vowel letters."""
+    import tone_analysis
+    excluded = {'ฅ', 'ฤ', 'ฦ'}
+    return [char for chars in tone_analysis.CONSONANT_CLASSES.values() for char in chars if char not in excluded]
+
+def syllable_shapes():
+    """Yield every syllable shape the table covers, each once."""
+    initials = initial_consonants() + CLUSTER_INITIALS + HO_LED_INITIALS + O_LED_INITIALS
+    seen = set()
+
+    def fill(template, initial, tone_mark, final=''):
+        return template.replace('C', initial).replace('T', tone_mark).replace('F', final)
+
+    for initial in initials:
+        shapes = []
+        for tone_mark in TONE_MARK_OPTIONS:
+            shapes.extend(fill(template, initial, tone_mark) for template in OPEN_TEMPLATES)
+            for final in FINAL_CONSONANTS:
+                shapes.extend(fill(template, initial, tone_mark, final) for template in CLOSED_TEMPLATES)
+        for final in FINAL_CONSONANTS:
+            shapes.extend(fill(template, initial, '', final) for template in HAN_AKAT_TEMPLATES)
+        for shape in shapes:
+            if shape not in seen:
+                seen.add(shape)
+                yield shape
+
+# Building
+# ========
+
+def compute_entries(shapes):
+    """Run the rule engine over ``shapes`` and return ({shape: (*codes, explanation)}, skipped).
+
+    Shapes the rules raise on are skipped, so the runtime keeps raising for them.
+    """
+    import tone_analysis
+    entries = {}
+    skipped = 0
+    for shape in shapes:
+        try:
+            analysis = tone_analysis.analyze_syllable_rules(shape)
+            explanation = analysis.explanation
+        except Exception:
+            skipped += 1
+            continue
+        entries[shape] = (analysis.tone, analysis.syllable_type, analysis.consonant_class, analysis.vowel_length,
+                          analysis.rule, explanation)
+    return entries, skipped
+
+def compile_table(entries, output, fingerprint):
+    """Write ``entries`` to a tone table file at ``output`` and return its size in bytes.
+
+    The file is written to a temporary name and renamed into place, so
+    workers that have the previous version mapped keep reading it safely.
+    """
+    # Names in first-seen order; codes such as the rule can be None
+    names = {code: list(dict.fromkeys(result[i] for result in entries.values())) for i, code in enumerate(CODES)}
+    metadata = json.dumps({
+        'fingerprint': fingerprint,
+        **names,
+        'entries': len(entries),
+        'built_at': time.time()
+    }, ensure_ascii=False).encode('utf-8')
+
+    slot_count = 1
+    while slot_count < len(entries) * 2:
+        slot_count *= 2
+    header = MAGIC + _LENGTH.pack(len(metadata)) + metadata + _LENGTH.pack(slot_count)
+    entries_start = len(header) + _OFFSET.size * slot_count
+
+    # Many shapes share a result (finals of the same sound), so each result is stored once
+    result_offsets = {}
+    results = bytearray()
+    for result in entries.values():
+        if result not in result_offsets:
+            *codes, explanation = result
+            explanation = explanation.encode('utf-8')
+            if len(explanation) > 0xFFFF:
+                raise ToneTableError(f"Explanation too long: {explanation[:40]!r}")
+            result_offsets[result] = len(results)
+            indexes = [names[code].index(value) for code, value in zip(CODES, codes)]
+            results += _RESULT.pack(*indexes, len(explanation)) + explanation
+
+    keys = [key.encode('utf-8') for key in entries]
+    if any(len(key) > 0xFF for key in keys):
+        raise ToneTableError("Syllable too long for the table")
+    results_start = entries_start + sum(_KEY_LENGTH.size + len(key) + _OFFSET.size for key in keys)
+
+    slots = [0] * slot_count
+    entry_records = bytearray()
+    for key, result in zip(keys, entries.values()):
+        offset = entries_start + len(entry_records)
+        entry_records += _KEY_LENGTH.pack(len(key)) + key + _OFFSET.pack(results_start + result_offsets[result])
+        slot = zlib.crc32(key) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = offset
+
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(header)
+            tmp_file.write(struct.pack(f'<{slot_count}I', *slots))
+            tmp_file.write(entry_records)
+            tmp_file.write(results)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return os.path.getsize(output)
+
+def build(output):
+    """Enumerate the syllable shapes, run the rules over them and write the table.
+
+    Returns (entries written, shapes skipped, file size in bytes).
+    """
+    import tone_analysis
+    entries, skipped = compute_entries(syllable_shapes())
+    size = compile_table(entries, output, tone_analysis.RULES_FINGERPRINT)
+    return len(entries), skipped, size
+
+# Reading
+# =======
+
+class ToneTable:
+    """Read-only view of a tone table file, searched in place through mmap."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'rb') as table_file:
+                self._map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise ToneTableError(f"Cannot open tone table {path}: {e}")
+
+        try:
+            if self._map[:len(MAGIC)] != MAGIC:
+                raise ValueError('bad magic')
+            metadata_length = _LENGTH.unpack_from(self._map, len(MAGIC))[0]
+            metadata_start = len(MAGIC) + _LENGTH.size
+            self.metadata = json.loads(self._map[metadata_start:metadata_start + metadata_length].decode('utf-8'))
+            slots_start = metadata_start + metadata_length
+            self._slot_count = _LENGTH.unpack_from(self._map, slots_start)[0]
+            self._slots_start = slots_start + _LENGTH.size
+        except (ValueError, struct.error) as e:
+            raise ToneTableError(f"{path} is not a tone table file ({e})")
+        self.fingerprint = self.metadata.get('fingerprint')
+        try:
+            self._names = [self.metadata[code] for code in CODES]
+        except KeyError as e:
+            raise ToneTableError(f"{path} has no {e} in its metadata")
+        self._mask = self._slot_count - 1
+
+    def __len__(self):
+        return self.metadata['entries']
+
+    def lookup(self, syllable, explanation=True):
+        """Return (tone, syllable type, consonant class, vowel length, rule, explanation) for ``syllable``.
+
+        Returns None if the syllable is not in the table. With
+        ``explanation=False`` the explanation is not decoded and is None.
+        """
+        try:
+            key = syllable.encode('utf-8')
+        except (AttributeError, UnicodeEncodeError):
+            return None
+        slot = zlib.crc32(key) & self._mask
+        try:
+            return self._probe(key, slot, explanation)
+        except ValueError:
+            # The table was closed by a rebuild during the lookup; the caller runs the rules instead
+            return None
+
+    def _probe(self, key, slot, explanation):
+        while True:
+            offset = _OFFSET.unpack_from(self._map, self._slots_start + slot * _OFFSET.size)[0]
+            if not offset:
+                return None
+            key_length = self._map[offset]
+            key_start = offset + _KEY_LENGTH.size
+            if key_length == len(key) and self._map[key_start:key_start + key_length] == key:
+                result = _OFFSET.unpack_from(self._map, key_start + key_length)[0]
+                *codes, explanation_length = _RESULT.unpack_from(self._map, result)
+                entry = [names[code] for names, code in zip(self._names, codes)]
+                if explanation:
+                    explanation_start = result + _RESULT.size
+                    entry.append(self._map[explanation_start:explanation_start + explanation_length].decode('utf-8'))
+                else:
+                    entry.append(None)
+                return tuple(entry)
+            slot = (slot + 1) & self._mask
+
+    def close(self):
+        """Unmap the file; lookups from then on return None."""
+        self._map.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the precomputed tone table.')
+    parser.add_argument('-o', '--output', default=None,
+                        help='tone table file (default: TONE_TABLE_PATH or .cache/tone_table.bin)')
+    parser.add_argument('--lookup', metavar='SYLLABLE',
+                        help='look a syllable up in the built table instead of building it')
+    args = parser.parse_args()
+
+    import tone_analysis
+    output = args.output or tone_analysis.TONE_TABLE_PATH
+
+    try:
+        if args.lookup:
+            table = ToneTable(output)
+            if table.fingerprint != tone_analysis.RULES_FINGERPRINT:
+                print("⚠️ The table was built from different rules; rebuild it with python tone_table.py")
+            entry = table.lookup(args.lookup)
+            if entry is None:
+                print(f"'{args.lookup}' is not in the tone table")
+                sys.exit(1)
+            tone, syllable_type, consonant_class, vowel_length, rule, explanation = entry
+            print(f"{tone} ({consonant_class} class, {vowel_length} vowel, {syllable_type}, rule {rule})\n{explanation}")
+            sys.exit(0)
+
+        start = time.perf_counter()
+        count, skipped, size = build(output)
+        print(f"✅ Built {output} in {time.perf_counter() - start:.1f}s")
+        print(f"   {count} syllables, {size / (1024 * 1024):.1f} MB; {skipped} shapes skipped (the rules raise on them)")
+    except ToneTableError as e:
+        print(f"❌ {e}")
+        sys.exit(1)